@@ -0,0 +1,149 @@
+"""
+试用期 / 解锁码访问控制。访问状态放在签名令牌里（HMAC-SHA256），每次重跑只做一次 HMAC 校验，不查库也不加锁。
+
+令牌 = "<kind>.<issued>.<expires>.<mac>"（Unix 秒）：
+    trial   首次访问时签发，有效 free_seconds 秒
+    unlock  输入正确的解锁码后签发，有效 access_hours 小时
+签名密钥由服务端密钥和解锁码共同派生，更换解锁码后已签发的令牌全部失效。
+streamlit_app 把令牌放在会话状态和 URL 参数 ?access= 中，刷新页面或收藏链接后仍然有效；
+过期的令牌不会换发新的试用令牌，只能解锁。
+
+服务端密钥取 PORTFOLIO_ACCESS_SECRET；未设置时生成随机密钥写入 DATA_DIR/.access_secret，
+同一台机器上的副本共用。多台机器部署时应为所有副本设置同一个 PORTFOLIO_ACCESS_SECRET。
+
+解锁尝试按客户端地址限频（streamlit_app 取连接的对端地址，或 PORTFOLIO_CLIENT_IP_HEADER 指定的代理头），
+新开会话 / 标签页不会重置次数；经过同一个代理或 NAT 的用户共用一份次数。
+
+限制：令牌只保存在浏览器端，去掉 URL 参数即重新开始试用；需要严格限制时应在前置代理上识别用户。
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import portfolio_data
+
+SECRET_FILE = os.path.join(portfolio_data.DATA_DIR, ".access_secret")
+MAX_ATTEMPTS = 5        # 每个客户端在 ATTEMPT_WINDOW 秒内最多尝试解锁的次数
+ATTEMPT_WINDOW = 60
+MAX_TRACKED_CLIENTS = 10000
+
+Access = namedtuple("Access", ["kind", "issued", "expires", "token"])
+
+
+def load_secret(path=SECRET_FILE):
+    """PORTFOLIO_ACCESS_SECRET，或本机共用的随机密钥文件（不存在时创建，仅所有者可读）"""
+    secret = os.environ.get("PORTFOLIO_ACCESS_SECRET")
+    if secret:
+        return secret.encode("utf-8")
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path, "rb") as f:
+            return f.read().strip()
+    secret = secrets.token_hex(32).encode("ascii")
+    with os.fdopen(fd, "wb") as f:
+        f.write(secret)
+    return secret
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+class AccessGate:
+    def __init__(self, secret, unlock_code, free_seconds=60, access_hours=24):
+        self._key = hmac.new(secret, b"unlock-code:" + unlock_code.encode("utf-8"), hashlib.sha256).digest()
+        self._code = unlock_code.encode("utf-8")
+        self.free_seconds = free_seconds
+        self.access_hours = access_hours
+        self._attempts = OrderedDict()  # 客户端 -> 最近的解锁尝试时间
+        self._lock = threading.Lock()
+        self.trials = 0
+        self.unlocks = 0
+        self.unlock_failures = 0
+        self.invalid_tokens = 0
+        self.locked = 0
+
+    # ------------------------------------------------------------------ 令牌
+    def _mac(self, payload):
+        return _b64(hmac.new(self._key, payload.encode("ascii"), hashlib.sha256).digest()[:16])
+
+    def sign(self, kind, issued, expires):
+        payload = f"{kind}.{int(issued)}.{int(expires)}"
+        return Access(kind, int(issued), int(expires), f"{payload}.{self._mac(payload)}")
+
+    def verify(self, token):
+        """校验签名；格式错误或签名不符返回 None（不检查是否过期）"""
+        if not token or token.count(".") != 3:
+            return None
+        payload, _, mac = token.rpartition(".")
+        if not hmac.compare_digest(mac, self._mac(payload)):
+            return None
+        kind, issued, expires = payload.split(".")
+        if kind not in ("trial", "unlock") or not issued.isdigit() or not expires.isdigit():
+            return None
+        return Access(kind, int(issued), int(expires), token)
+
+    def check(self, token, now=None):
+        """
+        当前访问状态：有效令牌原样返回（包括已过期的），没有或无效时签发新的试用令牌。
+        返回 (Access, 剩余秒数)；剩余秒数 <= 0 表示需要解锁
+        """
+        now = time.time() if now is None else now
+        access = self.verify(token)
+        if access is None:
+            with self._lock:
+                self.trials += 1
+                if token:
+                    self.invalid_tokens += 1
+            access = self.sign("trial", now, now + self.free_seconds)
+        remaining = access.expires - now
+        if remaining <= 0:
+            with self._lock:
+                self.locked += 1
+        return access, remaining
+
+    def expired(self, token, now=None):
+        """fragment 单独重跑时的快速检查：令牌无效或已过期"""
+        access = self.verify(token)
+        return access is None or access.expires <= (time.time() if now is None else now)
+
+    # ------------------------------------------------------------------ 解锁
+    def unlock(self, code, client, now=None):
+        """
+        返回 (Access, None)；失败时 (None, "wrong" | "too_many")。
+        client 为客户端标识（如 IP 地址），按它限制尝试频率：不能用会话 id，否则新开会话即可重置次数
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            recent = [ts for ts in self._attempts.pop(client, ()) if ts > now - ATTEMPT_WINDOW]
+            if len(recent) >= MAX_ATTEMPTS:
+                self._attempts[client] = recent
+                self.unlock_failures += 1
+                return None, "too_many"
+            self._attempts[client] = recent + [now]
+            while len(self._attempts) > MAX_TRACKED_CLIENTS:
+                self._attempts.popitem(last=False)
+        if not hmac.compare_digest((code or "").strip().encode("utf-8"), self._code):
+            with self._lock:
+                self.unlock_failures += 1
+            return None, "wrong"
+        with self._lock:
+            self.unlocks += 1
+            self._attempts.pop(client, None)
+        return self.sign("unlock", now, now + self.access_hours * 3600), None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "trials": self.trials,
+                "unlocks": self.unlocks,
+                "unlock_failures": self.unlock_failures,
+                "invalid_tokens": self.invalid_tokens,
+                "locked_reruns": self.locked,
+            }
@@ -0,0 +1,97 @@
+"""
+服务端准入控制：限制同时进行的高开销构建（图表缓存未命中时的 px.* 构图 + 序列化），超出的请求排队，
+排队超时或队列已满时由调用方改用缓存中已有的结果。流量高峰时页面降级，而不是让所有重跑同时抢占 CPU。
+
+    admission = AdmissionController(max_active=2, max_waiting=32, wait_seconds=3.0)
+    try:
+        fig = admission.run(build)        # 拿到名额才执行
+    except Overloaded:
+        admission.fallback("stale")       # 调用方降级（如返回最近缓存的视图）后记录
+
+缓存命中不经过这里：只有真正需要构建时才占用名额。
+stats() 由 streamlit_app 作为 gauge 导出：当前执行 / 排队数，累计准入、排队、超时、拒绝与各类降级次数。
+"""
+import threading
+import time
+
+
+class Overloaded(Exception):
+    """等待时间内没有拿到执行名额，或排队人数已满"""
+
+
+class AdmissionController:
+    def __init__(self, max_active=2, max_waiting=32, wait_seconds=3.0, observe_wait=None):
+        """observe_wait(ms) 在每次准入时调用，记录排队等待时间（如写入重跑计时直方图）"""
+        self.max_active = max(1, max_active)
+        self.max_waiting = max_waiting
+        self.wait_seconds = wait_seconds
+        self.observe_wait = observe_wait
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.timed_out = 0
+        self.rejected = 0
+        self.fallbacks = {}
+
+    def acquire(self):
+        """拿到一个执行名额，返回排队等待的毫秒数；失败时抛出 Overloaded"""
+        with self._cond:
+            # 已有人排队时新请求也排到后面，不插队
+            if self.active < self.max_active and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return 0.0
+            if self.waiting >= self.max_waiting:
+                self.rejected += 1
+                raise Overloaded("admission queue full")
+            self.waiting += 1
+            self.queued += 1
+            started = time.monotonic()
+            deadline = started + self.wait_seconds
+            try:
+                while self.active >= self.max_active:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        raise Overloaded(f"no build slot within {self.wait_seconds:g} s")
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+            return (time.monotonic() - started) * 1000
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def run(self, fn):
+        """占用一个名额执行 fn() 并返回其结果"""
+        waited_ms = self.acquire()
+        if self.observe_wait is not None:
+            self.observe_wait(waited_ms)
+        try:
+            return fn()
+        finally:
+            self.release()
+
+    def fallback(self, kind):
+        """记录一次降级（kind 如 "stale" 返回旧视图、"busy" 只显示稍后重试的提示）"""
+        with self._cond:
+            self.fallbacks[kind] = self.fallbacks.get(kind, 0) + 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_active": self.max_active,
+                "active": self.active,
+                "waiting": self.waiting,
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "timed_out": self.timed_out,
+                "rejected": self.rejected,
+                **{f"fallback_{kind}": n for kind, n in sorted(self.fallbacks.items())},
+            }
@@ -0,0 +1,565 @@
+"""
+并发会话压测：在本地启动 streamlit_app.py（可以是多个服务进程），通过真实的 WebSocket 协议 (/_stcore/stream)
+模拟大量同时在线的会话，得到每个容器在部署前的承载能力。
+
+每个服务进程先由一个预热会话打开全部 Tab；之后每个会话先完成首次运行，然后按交互脚本随机重放（动作之间有思考时间）：
+    slider    拖动时间滑块（松开时触发一次重跑）
+    sector    取消 / 恢复勾选一个行业
+    language  切换语言
+    tab       打开另一个 Tab
+    stock     在 Tab 2 选择另一只股票（Tab 2 是 fragment，只重跑 fragment，与浏览器行为一致）
+客户端只解析 ForwardMsg 中的控件 proto（选项、当前值、所属 fragment），像浏览器一样回传全部控件状态。
+
+报告（每个会话数一组）：
+- 重跑延迟（发送 BackMsg -> 收到 script_finished）：总体及各动作的 p50 / p90 / p99 / 最大值，失败数
+- 吞吐：每秒完成的重跑数
+- 每个服务进程的 RSS（/proc 采样）：预热后（负载前）、峰值、结束时，以及每个会话的增量
+- 访问计数文件争用：各进程批量写库的次数 / 失败 / 耗时（应用导出的 gauge），以及库中计数与会话数是否一致
+- 准入控制：各进程构图的准入 / 排队 / 超时 / 拒绝次数和降级为缓存视图的次数（应用导出的 gauge）
+- 服务端 span 分位数（rerun、update_daily_visits 等，来自应用导出的 JSON Lines）
+
+用法：
+    python -m bench.load --sessions 50,200,500
+    python -m bench.load --sessions 100 --servers 4 --tickers 1000 --actions 30 --label pre-deploy
+    python -m bench.load --sessions 50 --url ws://staging:8501   # 压测已运行的服务（无 RSS / 计数检查）
+结果写入 bench/results/load-<label>.json
+
+压测客户端本身也要解析图表消息，CPU 核数较少时建议在另一台机器上运行，或用 --url 指向远端服务。
+"""
+import argparse
+import asyncio
+import datetime
+import glob
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+
+from bench.rerun import APP_FILE, REPO_ROOT, RESULTS_DIR, git_revision
+
+ACTION_WEIGHTS = {"slider": 0.25, "sector": 0.2, "language": 0.1, "tab": 0.2, "stock": 0.25}
+RERUN_TIMEOUT = 120.0
+METRICS_INTERVAL = 2.0
+BASE_PORT = 8650
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    arr = np.asarray(values)
+    return {
+        "count": len(arr),
+        "p50_ms": round(float(np.percentile(arr, 50)), 2),
+        "p90_ms": round(float(np.percentile(arr, 90)), 2),
+        "p99_ms": round(float(np.percentile(arr, 99)), 2),
+        "max_ms": round(float(arr.max()), 2),
+    }
+
+
+# -----------------------------------------------------------------------------
+# 服务进程
+# -----------------------------------------------------------------------------
+def serve_worker(port, data_dir):
+    """服务子进程：合成数据需要先登记行业映射（与 bench.rerun 相同），再以 streamlit run 启动应用"""
+    if data_dir:
+        import pandas as pd
+
+        from bench import synthetic
+        synthetic.register_sectors(pd.read_csv(os.path.join(data_dir, "holdings.csv"), usecols=['Ticker'])['Ticker'].unique())
+    from streamlit.web import cli
+    sys.argv = [
+        "streamlit", "run", APP_FILE, "--server.port", str(port), "--server.headless", "true",
+        "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false",
+    ]
+    cli.main()
+
+
+def start_servers(n_servers, data_dir, cwd, base_port):
+    """在同一个工作目录下启动 n_servers 个进程（共用访问计数文件），等待健康检查通过"""
+    env = dict(
+        # 压测会话远超试用期，关闭试用期 / 解锁码；准入控制保持生产配置
+        os.environ, PYTHONPATH=REPO_ROOT, PORTFOLIO_REFRESH_SECONDS="0", PORTFOLIO_UNLOCK_CODE="",
+        PORTFOLIO_METRICS_FILE=os.path.join(cwd, "rerun_metrics.{pid}.jsonl"),
+        PORTFOLIO_METRICS_INTERVAL=str(METRICS_INTERVAL),
+    )
+    if data_dir:
+        env["PORTFOLIO_DATA_DIR"] = data_dir
+    servers = []
+    for i in range(n_servers):
+        port = base_port + i
+        cmd = [sys.executable, "-m", "bench.load", "--serve-worker", str(port)]
+        if data_dir:
+            cmd += ["--data-dir", data_dir]
+        with open(os.path.join(cwd, f"server-{port}.log"), "w") as log:
+            servers.append((subprocess.Popen(cmd, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT), port))
+    deadline = time.time() + 120
+    for proc, port in servers:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"server on port {port} exited; see {cwd}/server-{port}.log")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=2) as resp:
+                    if resp.status == 200:
+                        break
+            except OSError:
+                pass
+            if time.time() > deadline:
+                raise RuntimeError(f"server on port {port} did not become healthy")
+            time.sleep(0.25)
+    return servers
+
+
+def stop_servers(servers):
+    for proc, _ in servers:
+        proc.terminate()
+    for proc, _ in servers:
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def rss_mb(pid):
+    """进程常驻内存 (MB)；非 Linux 时返回 None"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+async def sample_rss(pids, samples, stop, interval=0.5):
+    while not stop.is_set():
+        for pid in pids:
+            value = rss_mb(pid)
+            if value is not None:
+                samples.setdefault(pid, []).append(value)
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def server_metrics(cwd):
+    """每个服务进程最后一次导出的 span 汇总与 gauge（应用按 PORTFOLIO_METRICS_FILE 写出）"""
+    metrics = {}
+    for path in sorted(glob.glob(os.path.join(cwd, "rerun_metrics.*.jsonl"))):
+        with open(path, encoding="utf-8") as f:
+            lines = [line for line in f if line.strip()]
+        if lines:
+            last = json.loads(lines[-1])
+            metrics[str(last["pid"])] = last
+    return metrics
+
+
+def counted_visits(cwd):
+    """服务进程退出（各自落盘）后，共享计数库中今天的访问数"""
+    path = os.path.join(cwd, "visit_stats.db")
+    if not os.path.exists(path):
+        return None
+    with sqlite3.connect(path) as conn:
+        row = conn.execute(
+            "SELECT count FROM daily_visits WHERE day = ?", (datetime.date.today().isoformat(),)
+        ).fetchone()
+    return row[0] if row else 0
+
+
+# -----------------------------------------------------------------------------
+# 模拟会话
+# -----------------------------------------------------------------------------
+def _labels(key):
+    from i18n import LANG
+    return {texts[key] for texts in LANG.values()}
+
+
+class Session:
+    """一个模拟的浏览器会话：记录当前页面上的控件 proto、控件所属的 fragment 和 Tab 容器"""
+
+    def __init__(self, url, rng, think):
+        self.url = url
+        self.rng = rng
+        self.think = think
+        self.widgets = {}        # 控件 id -> (类型, proto)
+        self.fragments = {}      # 控件 id -> fragment id（不在 fragment 中为 ""）
+        self.states = {}         # 控件 id -> 最近一次回传的 WidgetState（浏览器同样保留全部控件的值）
+        self.tab_container = ""  # st.tabs 的控件 id（其状态为当前 Tab 的标签）
+        self.tab_labels = {}     # delta path -> Tab 标签
+        self.active_tab = None
+        self.page_hash = ""
+        self.finished = None
+        self.exceptions = 0
+        self.results = []        # (动作, 毫秒, 是否成功)
+        self.ws = None
+
+    # ------------------------------------------------------------------ 协议
+    async def _receive(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        async for data in self.ws:
+            msg = ForwardMsg.FromString(data)
+            kind = msg.WhichOneof("type")
+            if kind == "delta":
+                self._on_delta(msg)
+            elif kind == "new_session":
+                self.page_hash = msg.new_session.page_script_hash
+            elif kind == "script_finished":
+                # 提前结束（脚本内再次触发重跑）不算完成，继续等待
+                if msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN and self.finished and not self.finished.done():
+                    self.finished.set_result(msg.script_finished)
+
+    def _on_delta(self, msg):
+        delta = msg.delta
+        kind = delta.WhichOneof("type")
+        if kind == "new_element":
+            element = delta.new_element
+            element_type = element.WhichOneof("type")
+            if element_type == "exception":
+                self.exceptions += 1
+                return
+            proto = getattr(element, element_type)
+            widget_id = getattr(proto, "id", "") if element_type != "plotly_chart" else ""
+            if widget_id:
+                self.widgets[widget_id] = (element_type, proto)
+                self.fragments[widget_id] = delta.fragment_id
+        elif kind == "add_block":
+            block = delta.add_block
+            block_type = block.WhichOneof("type")
+            if block_type == "tab_container":
+                self.tab_container = block.id
+            elif block_type == "tab":
+                self.tab_labels[tuple(msg.metadata.delta_path)] = block.tab.label
+
+    async def rerun(self, action, fragment_id=""):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        back = BackMsg()
+        state = back.rerun_script
+        state.page_script_hash = self.page_hash
+        for widget_id, widget_state in self.states.items():
+            state.widget_states.widgets.append(widget_state)
+        if fragment_id:
+            state.fragment_id = fragment_id
+        else:
+            # 完整重跑：页面上的控件全部重新发送
+            self.widgets, self.fragments, self.tab_labels = {}, {}, {}
+        self.exceptions = 0
+        self.finished = asyncio.get_running_loop().create_future()
+        t0 = time.perf_counter()
+        await self.ws.send(back.SerializeToString())
+        try:
+            status = await asyncio.wait_for(self.finished, RERUN_TIMEOUT)
+            ok = status != ForwardMsg.FINISHED_WITH_COMPILE_ERROR and not self.exceptions
+        except asyncio.TimeoutError:
+            ok = False
+        self.results.append((action, (time.perf_counter() - t0) * 1000, ok))
+        # 已不在页面上的控件（如切换语言后选项变化、控件 id 随之变化）不再回传
+        live = set(self.widgets) | {self.tab_container}
+        self.states = {wid: ws for wid, ws in self.states.items() if wid in live}
+        tabs = [label for _, label in sorted(self.tab_labels.items())]
+        if tabs and self.active_tab not in tabs:
+            self.active_tab = tabs[0]
+        return ok
+
+    # ------------------------------------------------------------------ 控件
+    def _find(self, element_type, labels):
+        for widget_id, (kind, proto) in self.widgets.items():
+            if kind == element_type and proto.label in labels:
+                return widget_id, proto
+        return None, None
+
+    def _set(self, widget_id, **value):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        widget_state = WidgetState(id=widget_id)
+        for field, v in value.items():
+            if field == "string_array_value":
+                widget_state.string_array_value.data[:] = v
+            elif field == "double_array_value":
+                widget_state.double_array_value.data[:] = v
+            else:
+                setattr(widget_state, field, v)
+        self.states[widget_id] = widget_state
+
+    def _current_options(self, widget_id, proto, many):
+        """控件当前的值（已回传过的值优先，否则为 proto 中的值 / 默认值）"""
+        if widget_id in self.states:
+            ws = self.states[widget_id]
+            return list(ws.string_array_value.data) if many else ws.string_value
+        if many:
+            return list(proto.raw_values) if proto.set_value else [proto.options[i] for i in proto.default]
+        if proto.set_value:
+            return proto.raw_value
+        return proto.options[proto.default] if len(proto.options) else None
+
+    async def act(self, action):
+        tabs = [label for _, label in sorted(self.tab_labels.items())]
+        if action == "slider":
+            widget_id, proto = self._find("slider", _labels("time_slider"))
+            step = proto.step or 1
+            n_steps = int((proto.max - proto.min) // step)
+            lo, hi = sorted(self.rng.sample(range(n_steps + 1), 2)) if n_steps > 0 else (0, 0)
+            self._set(widget_id, double_array_value=[proto.min + lo * step, proto.min + hi * step])
+            return await self.rerun(action)
+        if action == "sector":
+            widget_id, proto = self._find("multiselect", _labels("sector_filter"))
+            selected = self._current_options(widget_id, proto, many=True)
+            sector = self.rng.choice(list(proto.options))
+            if sector in selected and len(selected) > 1:
+                selected.remove(sector)
+            elif sector not in selected:
+                selected.append(sector)
+            self._set(widget_id, string_array_value=selected)
+            return await self.rerun(action)
+        if action == "language":
+            widget_id, proto = self._find("selectbox", {"🌐 Language / 语言"})
+            current = self._current_options(widget_id, proto, many=False)
+            self._set(widget_id, string_value=next(opt for opt in proto.options if opt != current))
+            return await self.rerun(action)
+        if action == "tab":
+            self.active_tab = self.rng.choice([label for label in tabs if label != self.active_tab] or tabs)
+            self._set(self.tab_container, string_value=self.active_tab)
+            return await self.rerun(action)
+        if action == "stock":
+            if len(tabs) > 1 and self.active_tab != tabs[1]:
+                self.active_tab = tabs[1]
+                self._set(self.tab_container, string_value=self.active_tab)
+                if not await self.rerun("tab"):
+                    return False
+            widget_id, proto = self._find("selectbox", _labels("tab2_select_company"))
+            if widget_id is None or len(proto.options) < 2:
+                return True
+            current = self._current_options(widget_id, proto, many=False)
+            self._set(widget_id, string_value=self.rng.choice([opt for opt in proto.options if opt != current]))
+            return await self.rerun(action, fragment_id=self.fragments.get(widget_id, ""))
+        raise ValueError(action)
+
+    async def warm_up(self):
+        """预热：首次运行并依次打开每个 Tab（数据集、图表骨架等进程级资源在计量前就绪）"""
+        from websockets.asyncio.client import connect
+
+        async with connect(self.url, subprotocols=["streamlit"], max_size=None, open_timeout=60) as ws:
+            self.ws = ws
+            receiver = asyncio.create_task(self._receive())
+            try:
+                await self.rerun("initial")
+                for label in [label for _, label in sorted(self.tab_labels.items())][1:]:
+                    self.active_tab = label
+                    self._set(self.tab_container, string_value=label)
+                    await self.rerun("tab")
+            finally:
+                receiver.cancel()
+
+    async def run(self, n_actions, start_delay):
+        from websockets.asyncio.client import connect
+
+        await asyncio.sleep(start_delay)
+        async with connect(self.url, subprotocols=["streamlit"], max_size=None, open_timeout=60) as ws:
+            self.ws = ws
+            receiver = asyncio.create_task(self._receive())
+            try:
+                if not await self.rerun("initial"):
+                    return
+                actions, weights = zip(*ACTION_WEIGHTS.items())
+                for action in self.rng.choices(actions, weights, k=n_actions):
+                    await asyncio.sleep(self.rng.uniform(*self.think))
+                    if not await self.act(action):
+                        return
+            finally:
+                receiver.cancel()
+
+
+async def warm_up(urls, seed):
+    await asyncio.gather(*(Session(url, random.Random(seed), (0, 0)).warm_up() for url in urls))
+
+
+async def run_sessions(urls, n_sessions, n_actions, think, ramp, seed, pids):
+    sessions = [Session(urls[i % len(urls)], random.Random(seed + i), think) for i in range(n_sessions)]
+    rss_samples, stop = {}, asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(pids, rss_samples, stop))
+    t0 = time.perf_counter()
+    outcomes = await asyncio.gather(
+        *(s.run(n_actions, ramp * i / max(1, n_sessions)) for i, s in enumerate(sessions)), return_exceptions=True
+    )
+    wall = time.perf_counter() - t0
+    stop.set()
+    await sampler
+    failures = [repr(o) for o in outcomes if isinstance(o, BaseException)]
+    return sessions, wall, rss_samples, failures
+
+
+# -----------------------------------------------------------------------------
+# 一组会话数的压测
+# -----------------------------------------------------------------------------
+def run_level(args, n_sessions, data_dir):
+    with tempfile.TemporaryDirectory() as cwd:
+        servers = [] if args.url else start_servers(args.servers, data_dir, cwd, args.port)
+        urls = [args.url.rstrip("/") + "/_stcore/stream"] if args.url else [
+            f"ws://127.0.0.1:{port}/_stcore/stream" for _, port in servers
+        ]
+        pids = [proc.pid for proc, _ in servers]
+        asyncio.run(warm_up(urls, args.seed))
+        # 基线取预热之后：每会话增量只包含会话自身，不含进程级共享的数据与缓存
+        rss_start = {pid: rss_mb(pid) for pid in pids}
+        try:
+            sessions, wall, rss_samples, failures = asyncio.run(run_sessions(
+                urls, n_sessions, args.actions, args.think, args.ramp, args.seed, pids
+            ))
+            rss_end = {pid: rss_mb(pid) for pid in pids}
+            if servers:
+                time.sleep(METRICS_INTERVAL * 1.5)  # 等待最后一次指标导出
+            metrics = server_metrics(cwd)
+        finally:
+            stop_servers(servers)
+        visits = counted_visits(cwd) if servers else None
+
+    results = [r for s in sessions for r in s.results]
+    ok = [(action, ms) for action, ms, success in results if success]
+    by_action = {}
+    for action, ms in ok:
+        by_action.setdefault(action, []).append(ms)
+    started = sum(1 for s in sessions if s.results and s.results[0][2])
+    per_server = max(1, n_sessions // max(1, len(pids)))
+    rss = {}
+    for pid in pids:
+        peak = max(rss_samples.get(pid, [0]) + [rss_end[pid] or 0])
+        rss[str(pid)] = {
+            "start_mb": round(rss_start[pid] or 0, 1),
+            "peak_mb": round(peak, 1),
+            "end_mb": round(rss_end[pid] or 0, 1),
+            "per_session_mb": round((peak - (rss_start[pid] or 0)) / per_server, 3),
+        }
+    server_side = {
+        pid: {
+            "spans": {name: stat for name, stat in last["spans"].items()
+                      if name in ("rerun", "update_daily_visits", "load_data", "filter", "session_memory",
+                                  "admission.wait")},
+            "gauges": last.get("gauges", {}),
+        }
+        for pid, last in metrics.items()
+    }
+    return {
+        "sessions": n_sessions,
+        "servers": len(pids) or None,
+        "actions_per_session": args.actions,
+        "wall_s": round(wall, 2),
+        "reruns": len(ok),
+        "errors": len(results) - len(ok) + len(failures),
+        "session_failures": failures[:10],
+        "throughput_per_s": round(len(ok) / wall, 2) if wall else 0.0,
+        "latency": percentiles([ms for _, ms in ok]),
+        "latency_by_action": {action: percentiles(v) for action, v in sorted(by_action.items())},
+        "rss": rss,
+        # 预热会话（每个服务进程一个）同样计入访问数
+        "visit_counter": {"sessions_started": started, "recorded": None if visits is None else visits - len(urls),
+                          "lost": None if visits is None else started + len(urls) - visits},
+        "server": server_side,
+    }
+
+
+def print_level(level):
+    print(f"\n== {level['sessions']} sessions × {level['servers'] or 'remote'} server(s), "
+          f"{level['actions_per_session']} actions each")
+    print(f"reruns {level['reruns']} (errors {level['errors']})   throughput {level['throughput_per_s']}/s   "
+          f"wall {level['wall_s']} s")
+    print(f"  {'latency ms':14s} {'count':>7s} {'p50':>9s} {'p90':>9s} {'p99':>9s} {'max':>9s}")
+    for name, stat in [("all", level["latency"])] + list(level["latency_by_action"].items()):
+        if stat["count"]:
+            print(f"  {name:14s} {stat['count']:7d} {stat['p50_ms']:9.1f} {stat['p90_ms']:9.1f} "
+                  f"{stat['p99_ms']:9.1f} {stat['max_ms']:9.1f}")
+    for pid, r in level["rss"].items():
+        print(f"  rss pid {pid}: warm {r['start_mb']} MB, peak {r['peak_mb']} MB, end {r['end_mb']} MB "
+              f"({r['per_session_mb']} MB/session)")
+    vc = level["visit_counter"]
+    if vc["recorded"] is not None:
+        print(f"  visit counter: recorded {vc['recorded']} / {vc['sessions_started']} sessions (lost {vc['lost']})")
+    for pid, server in level["server"].items():
+        counter = server["gauges"].get("streamlit_visit_counter", {})
+        rerun = server["spans"].get("rerun", {})
+        print(f"  server {pid}: rerun p99 {rerun.get('p99_ms', 0):.1f} ms; counter flushes {counter.get('flushes')}, "
+              f"failures {counter.get('flush_failures')}, max {counter.get('flush_ms_max', 0):.1f} ms")
+        admission = server["gauges"].get("streamlit_admission", {})
+        if admission:
+            print(f"  server {pid}: builds admitted {admission.get('admitted')}, queued {admission.get('queued')}, "
+                  f"timed out {admission.get('timed_out')}, rejected {admission.get('rejected')}, "
+                  f"stale {admission.get('fallback_stale', 0)}, busy {admission.get('fallback_busy', 0)}")
+    for failure in level["session_failures"]:
+        print(f"  session failed: {failure}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent websocket sessions against a local Streamlit server")
+    parser.add_argument("--sessions", default="50,200,500", help="comma-separated concurrent session counts")
+    parser.add_argument("--servers", type=int, default=1, help="server processes sharing one working directory")
+    parser.add_argument("--actions", type=int, default=20, help="interactions per session after the first run")
+    parser.add_argument("--think", default="0.5,2.0", help="think time range between actions (seconds)")
+    parser.add_argument("--ramp", type=float, default=10.0, help="seconds over which sessions connect")
+    parser.add_argument("--tickers", type=int, default=None, help="synthetic ticker count (default: repository data)")
+    parser.add_argument("--quarters", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=BASE_PORT)
+    parser.add_argument("--url", default=None, help="target an already running server instead (ws://host:port)")
+    parser.add_argument("--label", default=None, help="result file name (default: timestamp)")
+    parser.add_argument("--serve-worker", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_worker:
+        serve_worker(args.serve_worker, args.data_dir)
+        return
+
+    args.think = tuple(float(x) for x in args.think.split(","))
+    levels = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        if args.tickers:
+            import portfolio_data
+            from bench import synthetic
+            csv_path = os.path.join(data_dir, "holdings.csv")
+            df = synthetic.write_holdings(csv_path, args.tickers, args.quarters, args.seed)
+            # 先在本进程生成快照，多个服务进程启动时不会同时重建
+            synthetic.register_sectors(df['Ticker'].unique())
+            portfolio_data.build_snapshot(csv_path, os.path.join(data_dir, "holdings.arrow"))
+            print(f"{args.tickers} tickers × {args.quarters} quarters: {len(df)} rows", flush=True)
+        for n_sessions in [int(x) for x in args.sessions.split(",")]:
+            level = run_level(args, n_sessions, data_dir if args.tickers else None)
+            print_level(level)
+            levels.append(level)
+
+    import streamlit
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "streamlit": streamlit.__version__,
+            "cpu_count": os.cpu_count(),
+            "tickers": args.tickers,
+            "quarters": args.quarters if args.tickers else None,
+            "think_s": list(args.think),
+            "ramp_s": args.ramp,
+            "seed": args.seed,
+            "url": args.url,
+        },
+        "levels": levels,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    label = args.label or datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    out_path = os.path.join(RESULTS_DIR, f"load-{label}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nresults written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
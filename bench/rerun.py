@@ -0,0 +1,365 @@
+"""
+单次重跑 (rerun) 的分阶段基准测试，使用合成数据按股票数量放大。
+
+两部分：
+1. stages  —— 直接调用与 streamlit_app 相同的构建函数，分别计时：
+   load_data（含从共享缓存恢复快照）、语言列映射、筛选、各 Tab 的图表构建 + JSON 序列化、时间轴回放帧、浏览器端筛选载荷、to_html、访问计数
+2. apptest —— 子进程内用 streamlit.testing 的 AppTest 无界面驱动 streamlit_app.py，
+   计时冷启动、热重跑、切换 Tab / 语言 / 时间范围 / 行业 / 个股
+
+用法：
+    python -m bench.rerun                                   # 默认规模 10,100,1000,10000 × 100 季度
+    python -m bench.rerun --tickers 10,100 --quarters 40 --label quick
+    python -m bench.rerun --compare bench/results/old.json  # 与上一版本结果对比
+结果写入 bench/results/<label>.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_FILE = os.path.join(REPO_ROOT, "streamlit_app.py")
+RESULTS_DIR = os.path.join(REPO_ROOT, "bench", "results")
+REGRESSION_RATIO = 1.25
+
+
+def timed(fn, repeat=3):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return result, {"median_ms": round(statistics.median(samples), 3), "min_ms": round(min(samples), 3), "repeat": repeat}
+
+
+def legacy_language_mapping(df):
+    """旧实现：每次重跑复制整表并逐行 apply 生成 Logo_Name"""
+    df = df.copy()
+    df['Sector'] = df['Sector_En']
+    df['Full_Name'] = df['Full_Name_En']
+    df['Logo_Name'] = df.apply(lambda row: f"{row['Full_Name']} ({row['Ticker']})", axis=1)
+    return df
+
+
+# -----------------------------------------------------------------------------
+# 1. 分阶段计时
+# -----------------------------------------------------------------------------
+def run_stages(data_dir, repeat):
+    import plotly.io as pio
+
+    import charts
+    import portfolio_data
+    import reference_table
+    import shared_cache
+    from figure_cache import orjson
+    from figure_templates import FigureTemplates
+    from i18n import LANG
+    from portfolio_changes import PortfolioChanges
+    from portfolio_dataset import PortfolioDataset
+    from visit_counter import VisitCounter
+
+    csv_path = os.path.join(data_dir, "holdings.csv")
+    snapshot = os.path.join(data_dir, "holdings.arrow")
+    t = LANG["English"]
+    engine = "orjson" if orjson else "json"
+    stages = {}
+
+    _, stages["load_data.build_snapshot"] = timed(lambda: portfolio_data.build_snapshot(csv_path, snapshot), 1)
+    df, stages["load_data.open_snapshot"] = timed(lambda: portfolio_data.open_snapshot(snapshot), repeat)
+    dataset, stages["load_data.dataset"] = timed(lambda: PortfolioDataset(df), 1)
+    _, stages["load_data.changes"] = timed(lambda: PortfolioChanges(dataset.cube), 1)
+    # 新副本从共享缓存取快照字节写回本地，再 mmap 打开并构建数据集（对比 build_snapshot + open_snapshot + dataset）
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = shared_cache.DiskCache(os.path.join(tmp, "cache"))
+        with open(snapshot, "rb") as f:
+            cache.put("snapshot:bench", f.read())
+        restored = os.path.join(tmp, "holdings.arrow")
+
+        def restore():
+            with open(restored, "wb") as f:
+                f.write(cache.get("snapshot:bench"))
+            return PortfolioDataset(portfolio_data.open_snapshot(restored))
+
+        _, stages["load_data.shared_cache"] = timed(restore, 1)
+        stages["load_data.shared_cache"]["bytes"] = cache.stats()["bytes"]
+    cube = dataset.cube
+
+    _, stages["lang_mapping.legacy_apply"] = timed(lambda: legacy_language_mapping(df), 1)
+    _, stages["lang_mapping"] = timed(lambda: dataset.view("en"), repeat)
+
+    # 典型筛选：后 3/4 时间段，去掉一个行业，高亮最新季度前两大持仓
+    start, end = cube.dates[len(cube.dates) // 4], cube.dates[-1]
+    labels = sorted(set(cube.sector_labels["en"][cube.ticker_sector]))
+    selected = labels[1:] if len(labels) > 1 else labels
+
+    def do_filter():
+        i0, i1 = cube.date_index_range(start, end)
+        sel = cube.sector_selection(selected, "en")
+        return dataset.filter("en", i0, i1, sel), i0, i1, sel
+
+    (filtered_df, i0, i1, sel), stages["filter"] = timed(do_filter, repeat)
+    latest = filtered_df[filtered_df['Date'] == filtered_df['Date'].max()]
+    top = latest.sort_values('Value_Billions', ascending=False)
+    highlight_names = list(top['Logo_Name'].iloc[:2])
+    highlighted_df = filtered_df[filtered_df['Logo_Name'].isin(highlight_names)]
+    _, stages["filter.highlight"] = timed(
+        lambda: filtered_df[filtered_df['Full_Name'].isin(list(top['Full_Name'].iloc[:2]))], repeat
+    )
+
+    # Tab 1 / Tab 3 的图表骨架：每个 数据集 × 语言 生成一次
+    def build_templates():
+        templates = FigureTemplates(dataset, "en", t)
+        for name in ("_area", "_bar", "_sector", "_pie"):
+            getattr(templates, name)
+        return templates
+
+    templates, stages["templates.build"] = timed(build_templates, 1)
+
+    def tab1():
+        chart_df = charts.holdings_chart_frame(
+            dataset, "en", i0, i1, sel, filtered_df, t["others_label"], keep_tickers=highlighted_df['Ticker'].unique()
+        )
+        return [templates.holdings_area(chart_df, highlight_names), templates.holdings_bar(chart_df, highlight_names)]
+
+    stock_name = top['Full_Name'].iloc[0]
+    stock_data = filtered_df[filtered_df['Full_Name'] == stock_name].sort_values('Date')
+    compare_data = filtered_df[filtered_df['Logo_Name'].isin(highlight_names)]
+
+    def tab2():
+        return [
+            charts.stock_value_line(stock_data, stock_name, t),
+            charts.stock_shares_line(stock_data, stock_name, t),
+            charts.compare_lines(compare_data, t),
+        ]
+
+    def tab3():
+        sector_data = cube.sector_frame(i0, i1, sel, "en")
+        latest_date = pd.Timestamp(cube.dates[i1 - 1])
+        return [
+            templates.sector_area(sector_data),
+            templates.sector_pie(sector_data[sector_data['Date'] == latest_date], latest_date),
+        ]
+
+    ticker_changes = dataset.changes.ticker_frame(str(stock_data['Ticker'].iloc[0]), i0, i1)
+
+    def tab5():
+        quarter_changes = dataset.changes.quarter_frame(i0, i1, sel[cube.ticker_sector])
+        return [
+            charts.flow_bars(quarter_changes, t),
+            charts.turnover_lines(quarter_changes, t),
+            charts.stock_change_bars(ticker_changes, stock_name, t),
+        ]
+
+    # 时间轴回放：全部季度的动画帧，每个 数据集 × 语言 生成一次
+    def timeline():
+        return [templates.holdings_timeline(cube, dataset.logo_names["en"]), templates.sector_timeline(cube)]
+
+    payload_bytes = {}
+    for name, build in (("tab1", tab1), ("tab2", tab2), ("tab3", tab3), ("tab5", tab5), ("timeline", timeline)):
+        figs, stages[f"{name}.figures"] = timed(build, repeat)
+        jsons, stages[f"{name}.to_json"] = timed(
+            lambda: [pio.to_json(fig, validate=False, engine=engine) for fig in figs], repeat
+        )
+        payload_bytes[name] = sum(len(j) for j in jsons)
+        stages[f"{name}.figures"]["traces"] = sum(len(fig.data) for fig in figs)
+
+    # 浏览器端筛选：每个 数据集 × 语言 编码一次的二进制载荷（之后的筛选不再经过服务端）
+    import client_filter
+    client_payload, stages["client.payload"] = timed(lambda: client_filter.build_payload(dataset, "en", t, templates), 1)
+    payload_bytes["client"] = len(client_payload)
+
+    # 公司搜索（侧边栏 / Tab 2 的 typeahead）：一次典型查询
+    _, stages["search"] = timed(lambda: dataset.search.search("ba", "en", dataset.ticker_mask(i0, i1, sel)), repeat)
+
+    # Tab 4 只发送当前页（默认页大小）的行和样式
+    mask = dataset.ticker_mask(i0, i1, sel)
+    page, stages["tab4.page"] = timed(lambda: dataset.reference.page("en", mask), repeat)
+    payload_bytes["tab4"] = len(reference_table.table_html(page[1], t))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        counter = VisitCounter(os.path.join(tmp, "visits.db"), flush_interval=3600)
+
+        def visit():
+            counter.record_visit()
+            return counter.count()
+
+        _, stages["visit_counter.rerun"] = timed(visit, repeat * 10)
+        _, stages["visit_counter.flush"] = timed(counter.flush, repeat)
+        counter.close()
+
+    return {"rows": len(df), "tickers": len(cube.tickers), "quarters": len(cube.dates),
+            "stages": stages, "payload_bytes": payload_bytes}
+
+
+# -----------------------------------------------------------------------------
+# 2. AppTest 端到端计时（子进程中运行，环境变量指向合成数据目录）
+# -----------------------------------------------------------------------------
+def apptest_worker(data_dir, seed):
+    from streamlit.testing.v1 import AppTest
+
+    from bench import synthetic
+
+    tickers = pd.read_csv(os.path.join(data_dir, "holdings.csv"), usecols=['Ticker'])['Ticker'].unique()
+    synthetic.register_sectors(tickers)
+
+    timings = {}
+    at = AppTest.from_file(APP_FILE, default_timeout=900)
+
+    def step(name, action):
+        t0 = time.perf_counter()
+        action()
+        timings[name] = round((time.perf_counter() - t0) * 1000, 3)
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception}")
+
+    step("cold_run", at.run)
+    step("warm_rerun", at.run)
+    step("language_switch", lambda: at.sidebar.selectbox[0].set_value("English").run())
+    for i, label in enumerate([tab.label for tab in at.tabs]):
+        def open_tab(label=label):
+            at.session_state["active_tab"] = label
+            at.run()
+        step(f"tab{i + 1}_open", open_tab)
+    at.session_state["active_tab"] = at.tabs[0].label
+    at.run()
+    slider = at.sidebar.slider[0]
+    low, high = slider.value
+    step("time_slider", lambda: slider.set_value((low + (high - low) / 2, high)).run())
+    sectors = at.sidebar.multiselect[0]
+    step("sector_toggle", lambda: sectors.set_value(list(sectors.value)[1:]).run())
+    at.session_state["active_tab"] = at.tabs[1].label
+    at.run()
+    if len(at.main.selectbox):
+        stock = at.main.selectbox[0]
+
+        def pick_stock(label=at.tabs[1].label):
+            # AppTest 会把 Tab 状态随其他控件一起重置，需重新指定当前 Tab
+            stock.set_value(stock.options[-1])
+            at.session_state["active_tab"] = label
+            at.run()
+        step("tab2_stock_pick", pick_stock)
+    print(json.dumps(timings))
+
+
+def run_apptest(data_dir, seed):
+    # 大规模时整个脚本会超过试用期，关闭试用期 / 解锁码
+    env = dict(os.environ, PORTFOLIO_DATA_DIR=data_dir, PYTHONPATH=REPO_ROOT, PORTFOLIO_UNLOCK_CODE="")
+    with tempfile.TemporaryDirectory() as cwd:
+        proc = subprocess.run(
+            [sys.executable, "-m", "bench.rerun", "--apptest-worker", data_dir, "--seed", str(seed)],
+            cwd=cwd, env=env, capture_output=True, text=True,
+        )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# -----------------------------------------------------------------------------
+# 结果与对比
+# -----------------------------------------------------------------------------
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(current, previous):
+    """逐阶段对比中位数耗时，超过 REGRESSION_RATIO 的标记为回退"""
+    old_by_scale = {(s["tickers"], s["quarters"]): s for s in previous["scales"]}
+    regressions = 0
+    for scale in current["scales"]:
+        old = old_by_scale.get((scale["tickers"], scale["quarters"]))
+        if old is None:
+            continue
+        print(f"\n== {scale['tickers']} tickers × {scale['quarters']} quarters")
+        pairs = [(k, v["median_ms"], old["stages"].get(k, {}).get("median_ms")) for k, v in scale["stages"].items()]
+        pairs += [(f"apptest.{k}", v, old.get("apptest", {}).get(k))
+                  for k, v in scale.get("apptest", {}).items() if isinstance(v, (int, float))]
+        for name, new_ms, old_ms in pairs:
+            if not old_ms:
+                continue
+            ratio = new_ms / old_ms
+            flag = "  REGRESSION" if ratio > REGRESSION_RATIO else ""
+            regressions += bool(flag)
+            print(f"{name:34s} {old_ms:12.2f} -> {new_ms:12.2f} ms  x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage rerun benchmark on synthetic datasets")
+    parser.add_argument("--tickers", default="10,100,1000,10000", help="comma-separated ticker counts")
+    parser.add_argument("--quarters", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default=None, help="result file name (default: timestamp)")
+    parser.add_argument("--skip-apptest", action="store_true")
+    parser.add_argument("--compare", default=None, help="previous result JSON to compare against")
+    parser.add_argument("--apptest-worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.apptest_worker:
+        apptest_worker(args.apptest_worker, args.seed)
+        return
+
+    from bench import synthetic
+
+    scales = []
+    for n_tickers in [int(x) for x in args.tickers.split(",")]:
+        with tempfile.TemporaryDirectory() as data_dir:
+            df = synthetic.write_holdings(os.path.join(data_dir, "holdings.csv"), n_tickers, args.quarters, args.seed)
+            synthetic.register_sectors(df['Ticker'].unique())
+            print(f"{n_tickers} tickers × {args.quarters} quarters: {len(df)} rows", flush=True)
+            result = run_stages(data_dir, args.repeat)
+            if not args.skip_apptest:
+                result["apptest"] = run_apptest(data_dir, args.seed)
+            scales.append(result)
+            for name, stat in result["stages"].items():
+                print(f"  {name:34s} {stat['median_ms']:12.2f} ms")
+            for name, ms in result.get("apptest", {}).items():
+                print(f"  apptest.{name:26s} {ms:>12} ms" if isinstance(ms, (int, float)) else f"  apptest {name}: {ms}")
+
+    import plotly
+    import streamlit
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "plotly": plotly.__version__,
+            "streamlit": streamlit.__version__,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "scales": scales,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    label = args.label or datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    out_path = os.path.join(RESULTS_DIR, f"{label}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nresults written to {out_path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+合成持仓数据：按当前 holdings.csv 的结构放大到任意股票数 / 季度数。
+
+- 季度连续，截止到 2025 Q3 向前推 n_quarters 个季度
+- 前几十只使用真实 Ticker（有中英文名称和行业），其余为 SYN00001 这样的合成代码
+- 每只股票有一段连续持有期，市值按对数随机游走变化，组合占比按季度归一化
+"""
+import zlib
+
+import numpy as np
+import pandas as pd
+
+import portfolio_data
+
+LAST_QUARTER = (2025, 3)
+
+
+def quarter_labels(n_quarters):
+    year, q = LAST_QUARTER
+    labels = []
+    for _ in range(n_quarters):
+        labels.append(f"{year} Q{q}")
+        year, q = (year, q - 1) if q > 1 else (year - 1, 4)
+    return labels[::-1]
+
+
+def synthetic_tickers(n_tickers):
+    real = list(portfolio_data.full_name_map)[:n_tickers]
+    return real + [f"SYN{i:05d}" for i in range(n_tickers - len(real))]
+
+
+def synthetic_sectors(tickers):
+    """为合成代码分配行业（按代码哈希，结果与进程无关；真实 Ticker 沿用现有映射）"""
+    keys = [k for k in portfolio_data.sector_map if k != 'Others']
+    return {tk: keys[zlib.crc32(tk.encode()) % len(keys)] for tk in tickers if tk not in portfolio_data.ticker_sector_map}
+
+
+def register_sectors(tickers):
+    """把合成代码的行业写入进程内映射，构建快照时即可得到分散的行业分布"""
+    portfolio_data.ticker_sector_map.update(synthetic_sectors(tickers))
+
+
+def synthetic_holdings(n_tickers, n_quarters, mean_holding_fraction=0.25, seed=0):
+    rng = np.random.default_rng(seed)
+    tickers = np.array(synthetic_tickers(n_tickers), dtype=object)
+    quarters = np.array(quarter_labels(n_quarters), dtype=object)
+
+    # 持有期：起点均匀分布，时长为几何分布（平均约 mean_holding_fraction × 总季度数）
+    start = rng.integers(0, n_quarters, size=n_tickers)
+    duration = rng.geometric(1.0 / max(1.0, mean_holding_fraction * n_quarters), size=n_tickers)
+    q = np.arange(n_quarters)[:, None]
+    held = (q >= start) & (q < start + duration)
+
+    base_value = rng.lognormal(mean=0.0, sigma=1.5, size=n_tickers)
+    drift = np.cumsum(rng.normal(0.0, 0.12, size=(n_quarters, n_tickers)), axis=0)
+    value = np.where(held, base_value * np.exp(drift), 0.0)
+    price = rng.lognormal(mean=4.0, sigma=0.8, size=n_tickers) * np.exp(drift * 0.8)
+    shares = np.where(held, value * 1e3 / price, 0.0)
+    totals = value.sum(axis=1, keepdims=True)
+    percent = np.divide(value * 100, totals, out=np.zeros_like(value), where=totals > 0)
+
+    q_idx, t_idx = np.nonzero(held)
+    df = pd.DataFrame({
+        'Quarter': quarters[q_idx],
+        'Ticker': tickers[t_idx],
+        'Shares_Millions': shares[q_idx, t_idx].round(3),
+        'Value_Billions': value[q_idx, t_idx].round(4),
+        'Percent_Portfolio': percent[q_idx, t_idx].round(4),
+    })
+    return df[portfolio_data.HOLDING_COLUMNS]
+
+
+def write_holdings(path, n_tickers, n_quarters, seed=0):
+    df = synthetic_holdings(n_tickers, n_quarters, seed=seed)
+    df.to_csv(path, index=False)
+    return df
@@ -0,0 +1,205 @@
+"""
+图表构建（纯函数，不依赖 Streamlit 运行时）：界面、基准测试和离线导出共用。
+
+每个函数接收已经筛选好的数据和当前语言的文本字典 t，返回 go.Figure。
+"""
+import pandas as pd
+import plotly.express as px
+
+WEBGL_POINT_THRESHOLD = 1000  # 折线图数据点超过该值时使用 WebGL (Scattergl)
+LARGE_UNIVERSE_TICKERS = 40   # 筛选范围内股票数超过该值时，Tab 1 改为 Top-N + "其他"
+TOP_N_HOLDINGS = 15           # 每个季度保留的前 N 大持仓（系列总数上限为 2N）
+
+
+def line_render_mode(n_points):
+    # 数据点较多时改用 WebGL (Scattergl)，浏览器端渲染开销不随点数线性增长
+    return "webgl" if n_points > WEBGL_POINT_THRESHOLD else "svg"
+
+
+# --- Tab 1: 组合构成 ---
+def holdings_chart_frame(dataset, lang_key, q_start, q_end, sector_selection, filtered_df, others_label, keep_tickers=()):
+    """大股票池：每季度前 N 大持仓单独成系列，长尾向量化合并为 "其他"，图表体积与股票数量无关"""
+    if dataset.universe_size(q_start, q_end, sector_selection) > LARGE_UNIVERSE_TICKERS:
+        return dataset.top_n_frame(
+            lang_key, q_start, q_end, sector_selection, TOP_N_HOLDINGS, others_label, keep_tickers=keep_tickers
+        )
+    return filtered_df
+
+
+def holdings_area(chart_df, t, highlight_names=()):
+    fig_area = px.area(
+        chart_df,
+        x="Date",
+        y="Value_Billions",
+        color="Logo_Name",
+        title=t["tab1_chart1_title"],
+        labels={"Value_Billions": t["tab1_chart1_yaxis"]},
+        template="plotly_white",
+        hover_data={"Date": "|%Y-%m-%d"}
+    )
+
+    if len(highlight_names):
+        for trace in fig_area.data:
+            if trace.name in highlight_names:
+                trace.line.width = 3
+                trace.fill = 'tonextx'
+    fig_area.update_layout(showlegend=True, height=500)
+    return fig_area
+
+
+def holdings_bar(chart_df, t, highlight_names=()):
+    fig_bar = px.bar(
+        chart_df,
+        x="Quarter",
+        y="Percent_Portfolio",
+        color="Logo_Name",
+        title=t["tab1_chart2_title"],
+        barmode="relative",
+        template="plotly_white"
+    )
+
+    if len(highlight_names):
+        for trace in fig_bar.data:
+            if trace.name in highlight_names:
+                trace.marker.opacity = 1
+            else:
+                trace.marker.opacity = 0.5
+    fig_bar.update_layout(xaxis={'categoryorder':'category ascending'}, height=500)
+    return fig_bar
+
+
+# --- Tab 2: 个股分析 ---
+def stock_value_line(stock_data, name, t):
+    fig_stock_val = px.line(
+        stock_data, x='Date', y='Value_Billions', markers=True,
+        render_mode=line_render_mode(len(stock_data)),
+        title=t["tab2_chart1_title"].format(name=name),
+        color_discrete_sequence=['#2E86C1']
+    )
+    fig_stock_val.update_yaxes(rangemode="tozero")
+    return fig_stock_val
+
+
+def stock_shares_line(stock_data, name, t):
+    fig_stock_share = px.line(
+        stock_data, x='Date', y='Shares_Millions', markers=True,
+        render_mode=line_render_mode(len(stock_data)),
+        title=t["tab2_chart2_title"].format(name=name),
+        color_discrete_sequence=['#E74C3C']
+    )
+    fig_stock_share.update_yaxes(rangemode="tozero")
+    return fig_stock_share
+
+
+def stock_change_bars(ticker_changes, name, t):
+    """逐期持股变化柱状图，颜色区分新建仓 / 增持 / 减持 / 清仓"""
+    chart_df = ticker_changes.assign(Action=[t[f"action_{a}"] for a in ticker_changes['Action']])
+    return px.bar(
+        chart_df, x='Date', y='Share_Delta_Millions', color='Action',
+        title=t["tab2_chart3_title"].format(name=name),
+        hover_data={'Flow_Billions': ':.2f', 'Share_Change_Pct': ':.1f', 'Date': '|%Y-%m-%d'},
+        labels={'Share_Delta_Millions': t["col_share_delta"], 'Action': t["col_action"],
+                'Flow_Billions': t["col_flow"], 'Share_Change_Pct': t["col_share_change_pct"]},
+        color_discrete_map={t["action_new"]: '#1E8449', t["action_add"]: '#58D68D',
+                            t["action_trim"]: '#F1948A', t["action_exit"]: '#C0392B', t["action_hold"]: '#AAB7B8'},
+        template="plotly_white",
+    )
+
+
+def compare_lines(compare_data, t):
+    return px.line(
+        compare_data, x="Date", y="Value_Billions", color="Logo_Name",
+        title=t["tab2_compare_title"], markers=True,
+        render_mode=line_render_mode(len(compare_data))
+    )
+
+
+# --- Tab 3: 行业变迁 ---
+def sector_area(sector_data, t):
+    return px.area(
+        sector_data, x="Date", y="Value_Billions", color="Sector",
+        title=t["tab3_chart1_title"],
+        template="plotly_white",
+    )
+
+
+def sector_pie(latest_sector_data, latest_date, t):
+    return px.pie(
+        latest_sector_data, values='Value_Billions', names='Sector',
+        title=t["tab3_chart2_title"].format(date=latest_date.strftime("%Y Q%q")),
+        hole=0.4
+    )
+
+
+# --- Tab 5: 持仓变动 ---
+def flow_bars(quarter_changes, t):
+    """每期估计买入（正）与卖出（负）柱状图，叠加净额折线"""
+    flows = pd.concat([
+        pd.DataFrame({'Date': quarter_changes['Date'], 'Flow': quarter_changes['Buys_Billions'], 'Type': t["tab5_buys"]}),
+        pd.DataFrame({'Date': quarter_changes['Date'], 'Flow': -quarter_changes['Sells_Billions'], 'Type': t["tab5_sells"]}),
+    ])
+    fig = px.bar(
+        flows, x='Date', y='Flow', color='Type', barmode='relative',
+        title=t["tab5_chart1_title"], labels={'Flow': t["col_flow"], 'Type': ''},
+        color_discrete_map={t["tab5_buys"]: '#27AE60', t["tab5_sells"]: '#E74C3C'},
+        template="plotly_white",
+    )
+    fig.add_scatter(
+        x=quarter_changes['Date'], y=quarter_changes['Net_Flow_Billions'], name=t["tab5_net"],
+        mode='lines+markers', line={'color': '#2C3E50'}
+    )
+    return fig
+
+
+def turnover_lines(quarter_changes, t):
+    """换手率、前 5 大占比与 HHI (×100) 随时间变化"""
+    lines = pd.DataFrame({
+        'Date': quarter_changes['Date'],
+        t["tab5_turnover"]: quarter_changes['Turnover_Pct'],
+        t["tab5_top5"]: quarter_changes['Top5_Share_Pct'],
+        t["tab5_hhi"]: quarter_changes['HHI'] * 100,
+    }).melt(id_vars='Date', var_name='Metric', value_name='Percent')
+    return px.line(
+        lines, x='Date', y='Percent', color='Metric', markers=True,
+        title=t["tab5_chart2_title"], labels={'Metric': ''},
+        render_mode=line_render_mode(len(lines)), template="plotly_white",
+    )
+
+
+def activity_table(activity, t):
+    """某季度的持仓变动明细（列名与操作按当前语言）"""
+    table = activity.assign(Action=[t[f"action_{a}"] for a in activity['Action']]).round(
+        {'Share_Delta_Millions': 2, 'Share_Change_Pct': 1, 'Flow_Billions': 2}
+    )
+    return table.rename(columns={
+        'Ticker': t["col_ticker"], 'Name': t["col_company"], 'Action': t["col_action"],
+        'Share_Delta_Millions': t["col_share_delta"], 'Share_Change_Pct': t["col_share_change_pct"],
+        'Flow_Billions': t["col_flow"],
+    })
+
+
+# --- Tab 6: 机构持仓重叠 ---
+OVERLAP_TOP_N = 20
+
+
+def overlap_bars(shared, name_a, name_b, quarter, t, top_n=OVERLAP_TOP_N):
+    """共同持仓在两个组合中的权重（按较小权重取前 top_n）"""
+    top = shared.head(top_n)
+    bars = pd.concat([
+        pd.DataFrame({'Name': top['Name'], 'Weight': top['Weight_A_Pct'], 'Filer': name_a}),
+        pd.DataFrame({'Name': top['Name'], 'Weight': top['Weight_B_Pct'], 'Filer': name_b}),
+    ])
+    return px.bar(
+        bars, x='Name', y='Weight', color='Filer', barmode='group',
+        title=t["tab6_chart_title"].format(quarter=quarter),
+        labels={'Name': '', 'Filer': '', 'Weight': '%'}, template="plotly_white",
+    )
+
+
+def overlap_table(shared, name_a, name_b, t):
+    table = shared.round({'Weight_A_Pct': 2, 'Weight_B_Pct': 2, 'Value_A_Billions': 3, 'Value_B_Billions': 3})
+    return table.rename(columns={
+        'Ticker': t["col_ticker"], 'Name': t["col_company"],
+        'Weight_A_Pct': t["col_weight"].format(filer=name_a), 'Weight_B_Pct': t["col_weight"].format(filer=name_b),
+        'Value_A_Billions': t["col_value"].format(filer=name_a), 'Value_B_Billions': t["col_value"].format(filer=name_b),
+    })
@@ -0,0 +1,299 @@
+// 浏览器端筛选组件（st.components.v2）：解码 client_filter.py 生成的二进制载荷，
+// 在浏览器中完成时间范围 / 行业 / 高亮筛选，并用 Plotly 重绘 Tab 1 / Tab 3 的图表。
+// 解码后的数据集和筛选条件按 数据集版本 × 语言 保存在模块中，Tab 1 / Tab 3 的两个实例共用。
+
+const datasets = new Map();
+const filters = new Map();
+
+// plotly.js 不从 CDN 加载（离线部署）：由服务端的加载组件（client_filter.LOADER_JS）以内联脚本注入
+function loadPlotly() {
+  if (window.Plotly) return Promise.resolve(window.Plotly);
+  return new Promise((resolve) => {
+    window.addEventListener("pf-plotly-ready", () => resolve(window.Plotly), { once: true });
+  });
+}
+
+const TYPED = { u1: Uint8Array, u2: Uint16Array, u4: Uint32Array, f4: Float32Array };
+
+function decode(data) {
+  const bytes = data instanceof ArrayBuffer ? new Uint8Array(data) : new Uint8Array(data.buffer, data.byteOffset, data.byteLength);
+  const headLength = new DataView(bytes.buffer, bytes.byteOffset, 4).getUint32(0, true);
+  const header = JSON.parse(new TextDecoder().decode(bytes.subarray(4, 4 + headLength)));
+  const key = `${header.version}|${header.lang}`;
+  if (!datasets.has(key)) {
+    // 数组部分复制到新的 ArrayBuffer，保证各类型数组的字节偏移对齐
+    const buffer = bytes.slice(4 + headLength).buffer;
+    const arrays = {};
+    for (const [name, [offset, dtype, length]] of Object.entries(header.arrays)) {
+      arrays[name] = new TYPED[dtype](buffer, offset, length);
+    }
+    datasets.set(key, { ...header, ...arrays, key });
+  }
+  return datasets.get(key);
+}
+
+function defaultFilters(ds) {
+  return { q0: 0, q1: ds.quarters.length - 1, sectors: new Set(ds.sector_order), highlight: new Set() };
+}
+
+// ---------------------------------------------------------------- 筛选与聚合
+
+// 筛选后的行：[行号, 季度] 列表（长表按季度连续存放，时间筛选即切片）
+function selectedRows(ds, f) {
+  const rows = [];
+  for (let q = f.q0; q <= f.q1; q++) {
+    for (let r = ds.row_offsets[q]; r < ds.row_offsets[q + 1]; r++) {
+      if (f.sectors.has(ds.ticker_sector[ds.row_ticker[r]])) rows.push([r, q]);
+    }
+  }
+  return rows;
+}
+
+// 与服务端一致：股票数超过 large_universe 时，每季度前 top_n 大持仓单独成系列（最多 2 × top_n，
+// 按区间市值合计保留），高亮的股票始终保留，其余合并为 "其他"
+function keptTickers(ds, f, rows) {
+  const universe = new Set(rows.map(([r]) => ds.row_ticker[r]));
+  if (universe.size <= ds.large_universe) return universe;
+  const keep = new Set();
+  const seen = new Map();
+  const total = new Map();
+  for (const [r, q] of rows) {
+    const tk = ds.row_ticker[r];
+    total.set(tk, (total.get(tk) || 0) + ds.value[r]);
+    const n = seen.get(q) || 0;
+    if (n < ds.top_n) { keep.add(tk); seen.set(q, n + 1); }
+  }
+  let kept = [...keep];
+  if (kept.length > 2 * ds.top_n) {
+    kept = kept.sort((a, b) => total.get(b) - total.get(a)).slice(0, 2 * ds.top_n);
+  }
+  const result = new Set(kept);
+  for (const tk of f.highlight) if (universe.has(tk)) result.add(tk);
+  return result;
+}
+
+function holdingSeries(ds, f) {
+  const rows = selectedRows(ds, f);
+  const keep = keptTickers(ds, f, rows);
+  const series = new Map();
+  const others = new Map();
+  for (const [r, q] of rows) {
+    const tk = ds.row_ticker[r];
+    if (keep.has(tk)) {
+      if (!series.has(tk)) series.set(tk, { q: [], value: [], weight: [] });
+      const s = series.get(tk);
+      s.q.push(q); s.value.push(ds.value[r]); s.weight.push(ds.weight[r]);
+    } else {
+      const o = others.get(q) || { value: 0, weight: 0 };
+      o.value += ds.value[r]; o.weight += ds.weight[r];
+      others.set(q, o);
+    }
+  }
+  const result = [...series].map(([tk, s]) => ({ ticker: tk, name: ds.names[tk], color: ds.colors[tk], ...s }));
+  if (others.size) {
+    const qs = [...others.keys()].sort((a, b) => a - b);
+    result.push({
+      ticker: null, name: ds.others.label, color: ds.others.color, q: qs,
+      value: qs.map((q) => others.get(q).value), weight: qs.map((q) => others.get(q).weight),
+    });
+  }
+  return result;
+}
+
+function sectorSeries(ds, f) {
+  const n = ds.sectors.length;
+  const sums = new Map();
+  for (const [r, q] of selectedRows(ds, f)) {
+    if (!sums.has(q)) sums.set(q, new Float64Array(n).fill(NaN));
+    const row = sums.get(q), s = ds.ticker_sector[ds.row_ticker[r]];
+    row[s] = (Number.isNaN(row[s]) ? 0 : row[s]) + ds.value[r];
+  }
+  const qs = [...sums.keys()].sort((a, b) => a - b);
+  const series = ds.sector_order.filter((s) => f.sectors.has(s)).map((s) => {
+    const points = qs.filter((q) => !Number.isNaN(sums.get(q)[s]));
+    return { sector: s, q: points, value: points.map((q) => sums.get(q)[s]) };
+  }).filter((s) => s.q.length);
+  const latest = qs.length ? qs[qs.length - 1] : null;
+  return { series, latest, latestValues: latest === null ? null : sums.get(latest) };
+}
+
+// ---------------------------------------------------------------- 图表
+
+function holdingFigures(ds, f) {
+  const series = holdingSeries(ds, f);
+  const highlight = new Set([...f.highlight].map((tk) => ds.names[tk]));
+  const area = ds.charts.area, bar = ds.charts.bar;
+  const areaData = series.map((s) => {
+    const trace = {
+      ...area.trace, name: s.name, legendgroup: s.name, meta: s.ticker,
+      x: s.q.map((q) => ds.dates[q]), y: s.value, line: { color: s.color },
+    };
+    if (highlight.has(s.name)) { trace.line.width = 3; trace.fill = "tonextx"; }
+    return trace;
+  });
+  const barData = series.map((s) => ({
+    ...bar.trace, name: s.name, legendgroup: s.name, meta: s.ticker,
+    x: s.q.map((q) => ds.quarters[q]), y: s.weight,
+    marker: { color: s.color, opacity: highlight.size ? (highlight.has(s.name) ? 1 : 0.5) : undefined },
+  }));
+  return [{ data: areaData, layout: area.layout }, { data: barData, layout: bar.layout }];
+}
+
+function sectorFigures(ds, f) {
+  const { series, latest, latestValues } = sectorSeries(ds, f);
+  const sector = ds.charts.sector, pie = ds.charts.pie;
+  const areaData = series.map((s) => ({
+    ...sector.trace, name: ds.sectors[s.sector], legendgroup: ds.sectors[s.sector],
+    x: s.q.map((q) => ds.dates[q]), y: s.value, line: { color: ds.sector_colors[s.sector] },
+  }));
+  const figures = [{ data: areaData, layout: sector.layout }];
+  if (latest !== null) {
+    const present = series.filter((s) => !Number.isNaN(latestValues[s.sector])).map((s) => s.sector);
+    const title = ds.text.tab3_chart2_title.replace("{date}", ds.quarters[latest]);
+    figures.push({
+      data: [{
+        ...pie.trace, labels: present.map((s) => ds.sectors[s]), values: present.map((s) => latestValues[s]),
+        marker: { colors: present.map((s) => ds.sector_colors[s]) },
+      }],
+      layout: { ...pie.layout, title: { ...pie.layout.title, text: title } },
+    });
+  }
+  return figures;
+}
+
+// ---------------------------------------------------------------- 控件
+
+function element(tag, attrs = {}, children = []) {
+  const el = document.createElement(tag);
+  for (const [k, v] of Object.entries(attrs)) {
+    if (k === "text") el.textContent = v; else el.setAttribute(k, v);
+  }
+  for (const child of children) el.appendChild(child);
+  return el;
+}
+
+function quarterSelect(ds, value) {
+  const select = element("select");
+  ds.quarters.forEach((label, q) => select.appendChild(element("option", { value: q, text: label })));
+  select.value = String(value);
+  return select;
+}
+
+function buildControls(ds, f, onChange, onApply) {
+  const text = ds.text;
+  const start = quarterSelect(ds, f.q0), end = quarterSelect(ds, f.q1);
+  const onRange = () => {
+    f.q0 = Math.min(+start.value, +end.value);
+    f.q1 = Math.max(+start.value, +end.value);
+    onChange();
+  };
+  start.onchange = onRange;
+  end.onchange = onRange;
+
+  const sectors = element("div", { class: "pf-sectors" });
+  for (const s of ds.sector_order) {
+    const box = element("input", { type: "checkbox" });
+    box.checked = f.sectors.has(s);
+    box.onchange = () => { box.checked ? f.sectors.add(s) : f.sectors.delete(s); onChange(); };
+    sectors.appendChild(element("label", {}, [box, document.createTextNode(" " + ds.sectors[s])]));
+  }
+
+  // 高亮：在全部股票中按代码 / 名称搜索（datalist），已选的显示为可点击移除的标签
+  const listId = `pf-tickers-${ds.version}-${ds.lang}`;
+  const datalist = element("datalist", { id: listId });
+  ds.names.forEach((name) => datalist.appendChild(element("option", { value: name })));
+  const search = element("input", { list: listId, placeholder: text.search_placeholder });
+  const chips = element("div", { class: "pf-chips" });
+  const nameToTicker = new Map(ds.names.map((name, tk) => [name, tk]));
+  const renderChips = () => {
+    chips.replaceChildren(...[...f.highlight].map((tk) => {
+      const chip = element("span", { text: ds.names[tk] + " ×" });
+      chip.onclick = () => { f.highlight.delete(tk); renderChips(); onChange(); };
+      return chip;
+    }));
+  };
+  search.onchange = () => {
+    const tk = nameToTicker.get(search.value);
+    if (tk !== undefined) { f.highlight.add(tk); search.value = ""; renderChips(); onChange(); }
+  };
+  renderChips();
+
+  const apply = element("button", { type: "button", text: text.client_apply });
+  apply.onclick = onApply;
+
+  return element("div", { class: "pf-controls" }, [
+    element("div", {}, [element("label", { text: text.time_slider }), start, document.createTextNode(" – "), end]),
+    element("div", {}, [element("label", { text: text.stock_filter }), search, datalist, chips]),
+    element("div", {}, [apply]),
+    element("div", { style: "flex-basis: 100%" }, [element("label", { text: text.sector_filter }), sectors]),
+  ]);
+}
+
+// ---------------------------------------------------------------- 入口
+
+export default function (component) {
+  const { data, parentElement, setTriggerValue } = component;
+  const root = parentElement.querySelector(".pf-root");
+  if (!root || !data) return;
+  const view = root.dataset.view;
+
+  const ds = decode(data);
+  if (!filters.has(ds.key)) filters.set(ds.key, defaultFilters(ds));
+  const f = filters.get(ds.key);
+
+  // 界面中的 f.q1 为闭区间（最后一个选中的季度），回传时 + 1 转为 Python 端的开区间 [q0, q1)
+  const sendFilters = (ticker) => setTriggerValue("filters", {
+    q0: f.q0, q1: f.q1 + 1, sectors: [...f.sectors].sort((a, b) => a - b),
+    ticker: ticker === undefined || ticker === null ? null : ds.tickers[ticker],
+  });
+
+  const titles = view === "holdings" ? [ds.text.tab1_sub1, ds.text.tab1_sub2] : [ds.text.tab3_sub1, null];
+  const plots = titles.map(() => element("div"));
+  const body = [];
+  titles.forEach((title, i) => {
+    if (title) body.push(element("div", { class: "pf-subheader", text: title }));
+    body.push(plots[i]);
+  });
+  const empty = element("div", { class: "pf-hint", text: ds.text.warning_no_data });
+  const hint = element("div", { class: "pf-hint", text: view === "holdings" ? ds.text.client_click_hint : "" });
+  const loading = element("div", { class: "pf-hint", text: ds.text.client_loading });
+
+  let Plotly = null;
+  const redraw = () => {
+    if (!Plotly) return;
+    const figures = view === "holdings" ? holdingFigures(ds, f) : sectorFigures(ds, f);
+    const hasData = figures[0].data.length > 0;
+    empty.style.display = hasData ? "" : "none";
+    plots.forEach((div, i) => {
+      const fig = figures[i];
+      if (fig && hasData) {
+        div.style.display = "";
+        Plotly.react(div, fig.data, fig.layout, { responsive: true, displaylogo: false });
+      } else {
+        div.style.display = "none";
+      }
+    });
+  };
+
+  root.replaceChildren(buildControls(ds, f, redraw, () => sendFilters(null)), hint, loading, empty, ...plots);
+
+  let disposed = false;
+  loadPlotly().then((lib) => {
+    if (disposed) return;
+    Plotly = lib;
+    loading.remove();
+    redraw();
+    // 点击某只股票：连同当前筛选条件回传，服务端打开 Tab 2 个股分析
+    if (view === "holdings") {
+      plots.forEach((div) => div.on("plotly_click", (event) => {
+        const ticker = event.points[0]?.data?.meta;
+        if (ticker !== null && ticker !== undefined) sendFilters(ticker);
+      }));
+    }
+  }).catch((err) => { loading.textContent = String(err); });
+
+  return () => {
+    disposed = true;
+    if (Plotly) plots.forEach((div) => Plotly.purge(div));
+  };
+}
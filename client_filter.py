@@ -0,0 +1,144 @@
+"""
+浏览器端筛选：把数据集编码成一个紧凑的二进制载荷，每个会话只发送一次，时间范围 / 行业 / 高亮筛选
+和 Tab 1 / Tab 3 图表的更新都在浏览器中完成（client_filter.js，st.components.v2 组件）。
+
+载荷格式（小端序）：
+    uint32 头部长度 n | n 字节 UTF-8 JSON 头部 | 补齐到 8 字节 | 各类型数组（每个按 8 字节对齐）
+头部包含季度、股票（代码 / 显示名 / 颜色）、行业（名称 / 颜色 / 图表中的顺序）、图表骨架和界面文字，
+以及 arrays = {名称: [偏移, 类型, 长度]}。数组为长表的列，按季度连续存放、同季度按市值降序：
+    row_offsets  u4  季度 q 的行是 [row_offsets[q], row_offsets[q + 1])
+    row_ticker   u2/u4  股票编码
+    value        f4  市值（十亿美元）
+    weight       f4  占组合比例（%）
+    ticker_sector u1  每只股票的行业编码
+
+plotly.js 取自已安装的 plotly 包（离线部署不访问 CDN）：LOADER_JS 是一个不可见的加载组件，
+以 plotlyjs() 的字节作为数据、注入为内联脚本；消息内容固定，Streamlit 的消息缓存使每个会话只传输一次。
+
+只有需要服务端分析的操作回到 Python：点击某只股票（打开 Tab 2 个股分析）或把当前筛选条件应用到其他 Tab，
+组件通过触发值 filters = {q0, q1, sectors, ticker} 回传，q1 为开区间。
+"""
+import json
+import os
+
+import numpy as np
+import plotly.offline
+from plotly.utils import PlotlyJSONEncoder
+
+import charts
+
+ALIGN = 8
+UI_KEYS = (
+    "time_slider", "sector_filter", "stock_filter", "search_placeholder", "others_label", "warning_no_data",
+    "tab1_sub1", "tab1_sub2", "tab3_sub1", "tab3_chart2_title", "client_apply", "client_click_hint", "client_loading",
+)
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "client_filter.js"), encoding="utf-8") as f:
+    JS = f.read()
+
+LOADER_JS = """
+export default function (component) {
+  if (window.Plotly || window.__pfPlotlyInjected) return;
+  window.__pfPlotlyInjected = true;
+  const data = component.data;
+  const script = document.createElement("script");
+  script.textContent = new TextDecoder().decode(data instanceof ArrayBuffer ? new Uint8Array(data) : data);
+  document.head.appendChild(script);
+  window.dispatchEvent(new Event("pf-plotly-ready"));
+}
+"""
+
+CSS = """
+.pf-controls { display: flex; flex-wrap: wrap; gap: 0.75rem 1.5rem; align-items: flex-end; margin-bottom: 0.5rem; }
+.pf-controls label { display: block; font-size: 0.8rem; color: #64748b; margin-bottom: 0.2rem; }
+.pf-controls select, .pf-controls input { font: inherit; padding: 0.2rem 0.4rem; border: 1px solid #cbd5e1; border-radius: 0.4rem; }
+.pf-sectors { display: flex; flex-wrap: wrap; gap: 0.2rem 0.8rem; max-width: 100%; }
+.pf-sectors label { display: inline; color: inherit; font-size: 0.85rem; }
+.pf-chips span { display: inline-block; margin: 0.2rem 0.3rem 0 0; padding: 0.05rem 0.5rem; border-radius: 1rem;
+                 background: #e2e8f0; font-size: 0.8rem; cursor: pointer; }
+.pf-controls button { font: inherit; padding: 0.25rem 0.8rem; border: 1px solid #cbd5e1; border-radius: 0.4rem;
+                      background: white; cursor: pointer; }
+.pf-hint { font-size: 0.8rem; color: #94a3b8; }
+.pf-subheader { font-size: 1.4rem; font-weight: 600; margin: 1rem 0 0.25rem; }
+"""
+
+
+def plotlyjs():
+    """已安装的 plotly 包自带的 plotly.js（bytes），与服务端图表使用同一版本"""
+    return plotly.offline.get_plotlyjs().encode('utf-8')
+
+
+def html(view):
+    """组件根节点；view 为 'holdings'（Tab 1）或 'sectors'（Tab 3）"""
+    return f'<div class="pf-root" data-view="{view}"></div>'
+
+
+def _long_columns(cube):
+    """季度 × 股票矩阵 -> 长表列（按季度连续，同季度按市值降序）"""
+    q_idx, t_idx = np.nonzero(cube.held)
+    value = cube.value[q_idx, t_idx]
+    order = np.lexsort((-value, q_idx))
+    q_idx, t_idx = q_idx[order], t_idx[order]
+    offsets = np.searchsorted(q_idx, np.arange(len(cube.dates) + 1)).astype('<u4')
+    ticker_dtype = '<u2' if len(cube.tickers) < 2 ** 16 else '<u4'
+    return {
+        'row_offsets': offsets,
+        'row_ticker': t_idx.astype(ticker_dtype),
+        'value': value[order].astype('<f4'),
+        'weight': cube.weight[q_idx, t_idx].astype('<f4'),
+        'ticker_sector': cube.ticker_sector.astype('u1'),
+    }
+
+
+def build_payload(dataset, lang_key, t, templates):
+    """某个数据集在某种语言下的二进制载荷（bytes，所有会话共享）"""
+    cube = dataset.cube
+    logo_names = dataset.logo_names[lang_key]
+    holding_colors = templates.holding_colors()
+    sector_colors = templates.sector_colors()
+    labels = list(cube.sector_labels[lang_key])
+    columns = _long_columns(cube)
+
+    arrays, blobs, offset = {}, [], 0
+    for name, arr in columns.items():
+        data = arr.tobytes()
+        arrays[name] = [offset, arr.dtype.str.lstrip('<|'), len(arr)]
+        blobs.append(data + b'\0' * (-len(data) % ALIGN))
+        offset += len(blobs[-1])
+
+    header = {
+        'version': dataset.version,
+        'lang': lang_key,
+        'quarters': list(cube.quarters),
+        'dates': [str(d)[:10] for d in cube.dates],
+        'tickers': list(cube.tickers),
+        'names': list(logo_names),
+        'colors': [holding_colors.get(name, '#94a3b8') for name in logo_names],
+        'others': {'label': t["others_label"], 'color': holding_colors.get(t["others_label"], '#94a3b8')},
+        'sectors': labels,
+        'sector_colors': [sector_colors.get(label, '#94a3b8') for label in labels],
+        'sector_order': [labels.index(name) for name in sector_colors],
+        'top_n': charts.TOP_N_HOLDINGS,
+        'large_universe': charts.LARGE_UNIVERSE_TICKERS,
+        'charts': templates.client_spec(),
+        'text': {key: t[key] for key in UI_KEYS},
+        'arrays': arrays,
+    }
+    head = json.dumps(header, cls=PlotlyJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    head += b' ' * (-(len(head) + 4) % ALIGN)
+    return len(head).to_bytes(4, 'little') + head + b''.join(blobs)
+
+
+def server_filters(saved, cube):
+    """组件最近一次回传的筛选条件 -> 服务端 Tab 使用的 (q_start, q_end, 行业布尔向量)；没有或越界时为全部"""
+    n_quarters, n_sectors = len(cube.dates), len(cube.sector_keys)
+    q0, q1, sectors = 0, n_quarters, None
+    if saved:
+        q0 = min(max(int(saved.get('q0', 0)), 0), n_quarters - 1)
+        q1 = min(max(int(saved.get('q1', n_quarters)), q0 + 1), n_quarters)
+        sectors = [s for s in saved.get('sectors', ()) if 0 <= s < n_sectors]
+    sector_sel = np.ones(n_sectors, dtype=bool)
+    if sectors is not None:
+        sector_sel[:] = False
+        sector_sel[sectors] = True
+    return q0, q1, sector_sel
@@ -0,0 +1,311 @@
+"""
+日线价格历史与每日盯市估值：13F 只给出季末持仓，两次披露之间用 持股数 × 每日收盘价 重建组合市值。
+
+价格文件 data/prices.arrow：Arrow IPC 宽表（Date 列 + 每只股票一列收盘价，美元，缺失为 NaN），
+内存映射读取，每一列直接引用映射页。元数据 version / parent 记录版本链：只追加新交易日时
+parent 为上一版本，已有的估值只需计算新增的交易日。
+
+估值规则：
+- 每个交易日沿用最近一次已披露（季末日期 <= 当日）的持股数，直到下一次披露
+- 收盘价缺失时沿用该股票此前最近的收盘价；从未有价格时用当季 13F 隐含价格（市值 / 持股数）
+- 季度 × 股票 的持股矩阵按交易日下标展开，分块（CHUNK_DAYS 个交易日）向量化计算，
+  行业汇总为与行业 one-hot 矩阵的乘积，不逐日循环
+- 保存每块起点之前的已填充收盘价，个股每日曲线从最近的块起点开始计算，不逐只股票回溯整段历史
+
+导入价格（长表 CSV：Date,Ticker,Close；可多个文件，新交易日追加，已有日期的价格被覆盖）：
+    python daily_prices.py import prices_2025.csv [...]
+"""
+import argparse
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import portfolio_data
+
+PRICES_FILE = os.path.join(portfolio_data.DATA_DIR, "prices.arrow")
+CHUNK_DAYS = 256          # 每块处理的交易日数（块内为 交易日 × 股票 的稠密矩阵）
+MAX_POINTS = 1000         # 图表中每条序列最多的点数，超过时按固定步长抽样（保留最后一天）
+MAX_VALUATIONS = 4        # 每个进程缓存的估值（数据集 × 价格版本）数量
+
+
+# -----------------------------------------------------------------------------
+# 价格文件
+# -----------------------------------------------------------------------------
+def read_price_csv(paths):
+    frames = [pd.read_csv(path, usecols=['Date', 'Ticker', 'Close']) for path in paths]
+    prices = pd.concat(frames, ignore_index=True)
+    prices['Date'] = pd.to_datetime(prices['Date']).dt.normalize()
+    return prices.drop_duplicates(['Date', 'Ticker'], keep='last')
+
+
+def import_prices(paths, dest=PRICES_FILE):
+    """合并长表 CSV 到宽表价格文件；只新增更晚的交易日时记录 parent（估值增量计算）。返回 (新增交易日数, 是否为追加)"""
+    new = read_price_csv(paths).pivot(index='Date', columns='Ticker', values='Close')
+    parent = ""
+    if os.path.exists(dest):
+        with pa.memory_map(dest, "r") as source:
+            old_table = pa.ipc.open_file(source).read_all()
+            old = old_table.to_pandas().set_index('Date')
+        appended = new.index.min() > old.index.max()
+        if appended:
+            parent = (old_table.schema.metadata or {}).get(b"version", b"").decode()
+        merged = pd.concat([old, new]) if appended else new.combine_first(old)
+        added = len(merged) - len(old)
+    else:
+        merged, appended, added = new, False, len(new)
+
+    merged = merged.sort_index().reindex(columns=sorted(merged.columns)).astype(np.float64)
+    # 每列一个连续缓冲区；缺失价格保存为 NaN 而不是 null，读取时可零拷贝转为 NumPy
+    table = pa.table({
+        'Date': pa.array(merged.index.to_numpy(dtype='datetime64[ns]')),
+        **{ticker: pa.array(merged[ticker].to_numpy()) for ticker in merged.columns},
+    })
+    portfolio_data._write_table(table, dest, {"version": uuid.uuid4().hex, "parent": parent})
+    return added, appended
+
+
+class PriceHistory:
+    def __init__(self, path=PRICES_FILE):
+        self.path = path
+        source = pa.memory_map(path, "r")
+        table = pa.ipc.open_file(source).read_all()
+        meta = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()}
+        self.version = meta.get("version", "")
+        self.parent = meta.get("parent", "")
+        self.dates = table.column('Date').to_numpy().astype('datetime64[ns]')
+        self.tickers = [name for name in table.column_names if name != 'Date']
+        # 每只股票的收盘价：直接引用内存映射页的只读 NumPy 视图
+        self._columns = {name: table.column(name).to_numpy() for name in self.tickers}
+
+    def close(self, ticker):
+        """单只股票的收盘价；文件中没有该股票时返回 None"""
+        return self._columns.get(ticker)
+
+    def close_matrix(self, tickers, d0, d1):
+        """[d0, d1) 交易日 × tickers 的收盘价矩阵（缺失股票整列为 NaN）"""
+        matrix = np.full((d1 - d0, len(tickers)), np.nan)
+        for j, ticker in enumerate(tickers):
+            column = self.close(ticker)
+            if column is not None:
+                matrix[:, j] = column[d0:d1]
+        return matrix
+
+
+def _ffill(matrix, carry):
+    """沿交易日向下填充 NaN；块首之前的最近价格为 carry（按股票）"""
+    rows = np.where(np.isnan(matrix), -1, np.arange(len(matrix))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = matrix[np.maximum(rows, 0), np.arange(matrix.shape[1])]
+    return np.where(rows < 0, carry, filled)
+
+
+def _stride(n, max_points=MAX_POINTS):
+    """抽样下标：步长使点数不超过 max_points，始终包含最后一个点"""
+    step = max(1, -(-n // max_points))
+    idx = np.arange(0, n, step)
+    if n and idx[-1] != n - 1:
+        idx = np.append(idx, n - 1)
+    return idx
+
+
+# -----------------------------------------------------------------------------
+# 每日估值
+# -----------------------------------------------------------------------------
+class DailyValuation:
+    """一个数据集 (HoldingsCube) × 一个价格版本 的每日市值；构建后只读，所有会话共享"""
+
+    def __init__(self, cube, prices, previous=None):
+        self.cube = cube
+        self.prices = prices
+        self.version = prices.version
+        # 第一次披露之前没有持仓（但更早的价格仍参与向下填充）
+        first = int(np.searchsorted(prices.dates, cube.dates[0]))
+        start = previous.first + len(previous.days) if previous is not None else 0
+        self.first = first
+
+        # 13F 隐含价格（美元）：当季 市值 / 持股数，用于从未有收盘价的股票
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self._implied = np.where(cube.shares > 0, cube.value / cube.shares * 1000, 0.0)
+        onehot = np.zeros((len(cube.tickers), len(cube.sector_keys)))
+        onehot[np.arange(len(cube.tickers)), cube.ticker_sector] = 1.0
+
+        carry = previous.last_price if previous is not None else np.full(len(cube.tickers), np.nan)
+        q_parts, sector_parts, checkpoints, carries = [], [], [], []
+        for d0 in range(start, len(prices.dates), CHUNK_DAYS):
+            d1 = min(d0 + CHUNK_DAYS, len(prices.dates))
+            q_idx = np.searchsorted(cube.dates, prices.dates[d0:d1], side='right') - 1
+            checkpoints.append(d0)
+            carries.append(carry)
+            close = _ffill(prices.close_matrix(cube.tickers, d0, d1), carry)
+            carry = close[-1]
+            held = q_idx >= 0
+            if held.any():
+                q_parts.append(q_idx[held].astype(np.int32))
+                sector_parts.append(self._mark(q_idx[held], close[held]) @ onehot)
+
+        q_new = np.concatenate(q_parts) if q_parts else np.zeros(0, dtype=np.int32)
+        sector_new = np.vstack(sector_parts) if sector_parts else np.zeros((0, len(cube.sector_keys)))
+        checkpoints = np.array(checkpoints, dtype=np.int64)
+        carries = np.vstack(carries) if carries else np.zeros((0, len(cube.tickers)))
+        if previous is not None:
+            q_new = np.concatenate([previous.q_idx, q_new])
+            sector_new = np.vstack([previous.sector_value, sector_new])
+            checkpoints = np.concatenate([previous.checkpoints, checkpoints])
+            carries = np.vstack([previous.carries, carries])
+        self.days = prices.dates[first:]
+        self.q_idx = q_new                  # 每个交易日对应的披露季度下标
+        self.sector_value = sector_new      # 交易日 × 行业 市值（十亿美元）
+        self.last_price = carry             # 最后一个交易日的（已填充）收盘价，追加交易日时接续
+        # 每块起点（价格文件交易日下标）之前的已填充收盘价：个股曲线从最近的块起点开始向下填充
+        self.checkpoints = checkpoints
+        self.carries = carries
+        for arr in (self.q_idx, self.sector_value, self.last_price, self.checkpoints, self.carries):
+            arr.flags.writeable = False
+
+    def _mark(self, q_idx, close, cols=slice(None)):
+        """持股数（百万股）× 收盘价（美元）-> 市值（十亿美元）；缺价时用当季隐含价格"""
+        price = np.where(np.isnan(close), self._implied[q_idx][:, cols], close)
+        return self.cube.shares[q_idx][:, cols] * price / 1000
+
+    def extended(self, prices):
+        """价格文件只追加了新交易日：沿用已有结果，只计算新增部分"""
+        return DailyValuation(self.cube, prices, previous=self)
+
+    # ------------------------------------------------------------------ 图表数据
+    def day_range(self, i0, i1):
+        """季度区间 [i0, i1) -> 交易日区间：每个季度的持仓一直持续到下一次披露（最后一季到价格数据末尾）"""
+        d0 = int(np.searchsorted(self.q_idx, i0, side='left'))
+        d1 = int(np.searchsorted(self.q_idx, i1, side='left'))
+        return d0, d1
+
+    def sampled_days(self, i0, i1):
+        """图表用的交易日下标：按步长抽样，并始终包含每次披露后的第一个交易日（曲线经过 13F 数据点）"""
+        d0, d1 = self.day_range(i0, i1)
+        filings = d0 + np.flatnonzero(np.diff(self.q_idx[d0:d1], prepend=-1))
+        return np.union1d(_stride(d1 - d0) + d0, filings)
+
+    def sector_frame(self, i0, i1, sector_sel, lang_key):
+        """与 HoldingsCube.sector_frame 相同的列 (Date, Quarter, Sector, Value_Billions)，按交易日"""
+        days = self.sampled_days(i0, i1)
+        held = self.cube.sector_held[self.q_idx[days]] & sector_sel
+        d_idx, s_idx = np.nonzero(held)
+        return pd.DataFrame({
+            'Date': self.days[days[d_idx]],
+            'Quarter': self.cube.quarters[self.q_idx[days[d_idx]]],
+            'Sector': self.cube.sector_labels[lang_key][s_idx],
+            'Value_Billions': self.sector_value[days[d_idx], s_idx],
+        }).sort_values(['Date', 'Sector'], ignore_index=True)
+
+    def holdings_frame(self, chart_df, logo_names, i0, i1, sector_sel, others_label):
+        """
+        Tab 1 面积图的每日版本：沿用季度图选出的系列（chart_df 中的 Ticker，可能含 "其他"），
+        每只股票的每日市值只对这些列计算；"其他" = 所选行业每日合计 - 单独列出的股票
+        """
+        cube = self.cube
+        days = self.sampled_days(i0, i1)
+        pos = {tk: j for j, tk in enumerate(cube.tickers)}
+        tickers = [tk for tk in pd.unique(chart_df['Ticker']) if tk in pos]
+        cols = np.array([pos[tk] for tk in tickers], dtype=np.int64)
+
+        q_idx = self.q_idx[days]
+        if len(days):
+            # 抽样前在日线上向下填充（抽到缺价日时取此前最近的价格）：只从抽样区间之前最近的块起点开始，
+            # 块起点之前的价格由构建时保存的 carries 接续，不回溯整段历史
+            lo, hi = self.first + days[0], self.first + days[-1] + 1
+            k = int(np.searchsorted(self.checkpoints, lo, side='right')) - 1
+            d0 = int(self.checkpoints[k])
+            close = _ffill(self.prices.close_matrix(tickers, d0, hi), self.carries[k, cols])
+            close = close[days + self.first - d0]
+        else:
+            close = np.zeros((0, len(cols)))
+        value = self._mark(q_idx, close, cols) if len(cols) else np.zeros((len(days), 0))
+        held = cube.held[q_idx][:, cols]
+
+        d_idx, t_idx = np.nonzero(held)
+        frame = pd.DataFrame({
+            'Date': self.days[days[d_idx]],
+            'Ticker': np.asarray(tickers, dtype=object)[t_idx],
+            'Logo_Name': logo_names[cols[t_idx]],
+            'Value_Billions': value[d_idx, t_idx],
+        })
+        if others_label in set(chart_df['Ticker']):
+            others = self.sector_value[days][:, sector_sel].sum(axis=1) - np.where(held, value, 0.0).sum(axis=1)
+            frame = pd.concat([frame, pd.DataFrame({
+                'Date': self.days[days], 'Ticker': others_label, 'Logo_Name': others_label,
+                'Value_Billions': np.maximum(others, 0.0),
+            })])
+        return frame.sort_values('Date', kind='stable', ignore_index=True)
+
+
+class DailyMarks:
+    """
+    进程级共享的估值缓存：价格文件变化（mtime / 大小）时重新打开；
+    新版本的 parent 正是已有估值的价格版本时只追加计算新交易日，否则整体重建
+    """
+
+    def __init__(self, path=PRICES_FILE, max_entries=MAX_VALUATIONS):
+        self.path = path
+        self.max_entries = max_entries
+        self._prices = None
+        self._signature = None
+        self._valuations = OrderedDict()
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.extends = 0
+
+    def available(self):
+        return os.path.exists(self.path)
+
+    def _current_prices(self):
+        st = os.stat(self.path)
+        signature = (st.st_mtime_ns, st.st_size)
+        if signature != self._signature:
+            self._prices = PriceHistory(self.path)
+            self._signature = signature
+        return self._prices
+
+    def get(self, dataset):
+        """数据集的每日估值；没有价格文件时返回 None"""
+        if not self.available():
+            return None
+        with self._lock:
+            prices = self._current_prices()
+            valuation = self._valuations.get(dataset.version)
+            if valuation is None or valuation.version != prices.version:
+                if valuation is not None and valuation.version == prices.parent and valuation.cube is dataset.cube:
+                    valuation = valuation.extended(prices)
+                    self.extends += 1
+                else:
+                    valuation = DailyValuation(dataset.cube, prices)
+                    self.builds += 1
+                self._valuations[dataset.version] = valuation
+            self._valuations.move_to_end(dataset.version)
+            while len(self._valuations) > self.max_entries:
+                self._valuations.popitem(last=False)
+            return valuation
+
+    def stats(self):
+        return {
+            "prices_version": self._prices.version if self._prices is not None else None,
+            "days": len(self._prices.dates) if self._prices is not None else 0,
+            "cached": len(self._valuations),
+            "builds": self.builds,
+            "extends": self.extends,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import daily close prices (Date,Ticker,Close CSV) into data/prices.arrow")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import")
+    imp.add_argument("csv", nargs="+")
+    imp.add_argument("--dest", default=PRICES_FILE)
+    args = parser.parse_args()
+
+    added, appended = import_prices(args.csv, args.dest)
+    print(f"{args.dest}: {added} new trading day(s){' (appended)' if appended else ''}")
@@ -0,0 +1,108 @@
+"""
+增量刷新：后台线程轮询数据目录，新季度到达时只导入、派生、聚合新增的季度，
+在线会话继续使用旧数据集，直到新数据集原子替换进来。
+
+- 13F 源目录（data/13f/，其他机构为 data/13f/<id>/）出现新文件或文件变化
+  -> ingest_13f.ingest（只处理变化的季度）合并进该机构的 holdings.csv
+- 已加载机构的 holdings.csv 变化 -> FilerStore.refresh：比较每个季度的内容摘要，
+  末尾季度新增 / 修订时只追加（快照前缀、矩阵行、前缀和、变动分析均沿用），否则整体重建
+- 图表缓存只清除季度区间覆盖变化季度的条目（FigureCache.invalidate_from）
+"""
+import atexit
+import logging
+import os
+import threading
+
+import ingest_13f
+from filer_store import DEFAULT_FILER
+
+logger = logging.getLogger(__name__)
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+
+def _dir_signature(src_dir):
+    """目录中 13F 源文件的 (文件名, mtime, 大小)（数据集目录按其中的各个文件）；目录不存在时为空"""
+    return tuple(
+        (os.path.relpath(path, src_dir),) + (_signature(path) or ())
+        for _, source in sorted(ingest_13f.discover_sources(src_dir).items())
+        for path in ingest_13f.source_files(source)
+    ) if os.path.isdir(src_dir) else ()
+
+
+class DataRefresher:
+    def __init__(self, store, figure_cache=None, interval=60.0, source_dir=ingest_13f.SOURCE_DIR):
+        self.store = store
+        self.figure_cache = figure_cache
+        self.interval = interval
+        self.source_dir = source_dir
+        self._source_signatures = {}
+        self._holdings_signatures = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.events = []
+
+        for filer_id in store.filer_ids():
+            self._holdings_signatures[filer_id] = _signature(store.paths(filer_id)[0])
+        if interval:
+            self._thread = threading.Thread(target=self._run, name="data-refresh", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def filer_source_dir(self, filer_id):
+        return self.source_dir if filer_id == DEFAULT_FILER else os.path.join(self.source_dir, filer_id)
+
+    def check(self):
+        """检查一次所有机构；返回本次发生的刷新 [(filer_id, mode, first_changed_quarter), ...]"""
+        with self._lock:
+            done = []
+            for filer_id in self.store.filer_ids():
+                src, _ = self.store.paths(filer_id)
+                self._ingest_new_filings(filer_id, src)
+
+                signature = _signature(src)
+                if signature is None or signature == self._holdings_signatures.get(filer_id):
+                    continue
+                result = self.store.refresh(filer_id)
+                # 刷新成功后才记录签名；失败（抛出异常）时下一轮重试
+                self._holdings_signatures[filer_id] = signature
+                if result is None:
+                    continue
+                mode, first_changed, lineage = result
+                if self.figure_cache is not None:
+                    self.figure_cache.invalidate_from(lineage, first_changed)
+                logger.info("refreshed %s (%s from quarter %d)", filer_id, mode, first_changed)
+                done.append((filer_id, mode, first_changed))
+            self.events = (self.events + done)[-50:]
+            return done
+
+    def _ingest_new_filings(self, filer_id, dest):
+        src_dir = self.filer_source_dir(filer_id)
+        signature = _dir_signature(src_dir)
+        if not signature or signature == self._source_signatures.get(filer_id):
+            return
+        # 已导入的季度按源文件哈希跳过，只有新文件 / 修改过的文件会被重新解析
+        out_dir = ingest_13f.QUARTER_DIR if filer_id == DEFAULT_FILER else os.path.join(ingest_13f.QUARTER_DIR, filer_id)
+        cik = self.store.registry()[filer_id].get("cik")
+        changed = ingest_13f.ingest(src_dir, out_dir=out_dir, workers=1, dest=dest, cik=cik)
+        # 导入成功后才记录签名；源文件有误或 I/O 失败时下一轮重试
+        self._source_signatures[filer_id] = signature
+        if changed:
+            logger.info("ingested %s filing(s) for %s: %s", len(changed), filer_id, ", ".join(changed))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("data refresh failed; will retry")
+
+    def close(self):
+        self._stop.set()
+
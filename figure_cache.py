@@ -0,0 +1,195 @@
+"""
+进程级 LRU 图表缓存：按规范化后的筛选状态缓存序列化后的 Plotly 图表 JSON。
+安装 orjson 时用它序列化（NumPy 数组直接编码为二进制数据块，不逐个元素转换）并解析。
+
+所有会话共享同一个实例（由 streamlit_app 通过 st.cache_resource 创建），
+相同视图的重复请求直接复用已生成的 JSON，跳过 px.* 构图。
+
+条目可附带作用域 scope = (lineage, q_start, q_end)：数据追加或修订了某个季度之后，
+invalidate_from() 只清除季度区间覆盖该季度的条目。
+
+传入 shared（见 shared_cache.py）时作为第二级缓存：本进程未命中先查共享缓存，再构图；
+共享键必须包含数据集版本哈希（内容由键完全决定，不需要按季度清除）。
+
+同一个键同时未命中时只构建一次（single-flight）：第一个请求构图，其余请求等它完成后直接复用结果，
+构图失败（含 admission.Overloaded）时把同一个异常交给等待者。
+
+条目还可附带分组 group（如同一图表在同一数据集 / 语言下的所有视图），
+latest(group) 从按分组维护的最近使用顺序中直接取出，不扫描全部条目。
+"""
+import json
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+
+import shared_cache
+
+try:
+    import orjson
+except ImportError:  # 可选依赖：未安装时使用标准库 json
+    orjson = None
+
+
+class _Flight:
+    """一次进行中的构图：完成后 event 置位，result 为图表 JSON 或 error 为构图时的异常"""
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class FigureCache:
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, shared=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._scopes = {}
+        self._group_of = {}
+        self._groups = {}
+        self._flights = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared_hits = 0
+        self.coalesced = 0
+
+    def get(self, key):
+        with self._lock:
+            fig_json = self._entries.get(key)
+            if fig_json is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._touch(key)
+            self.hits += 1
+            return fig_json
+
+    def _touch(self, key):
+        group = self._group_of.get(key)
+        if group is not None:
+            self._groups[group].move_to_end(key)
+
+    def _forget(self, key):
+        # 调用方持有 self._lock；条目移除时同步清理作用域与分组索引
+        self._scopes.pop(key, None)
+        group = self._group_of.pop(key, None)
+        if group is not None:
+            keys = self._groups[group]
+            del keys[key]
+            if not keys:
+                del self._groups[group]
+
+    def put(self, key, fig_json, scope=None, group=None):
+        size = len(fig_json)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+                self._forget(key)
+            self._entries[key] = fig_json
+            if scope is not None:
+                self._scopes[key] = scope
+            if group is not None:
+                self._group_of[key] = group
+                self._groups.setdefault(group, OrderedDict())[key] = None
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._forget(evicted_key)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def get_or_build(self, key, build, scope=None, shared_key=None, group=None):
+        """
+        命中则返回缓存的图表 dict；未命中时调用 build() 生成 go.Figure 并写入缓存。
+        同一个键已有请求在构图时等待其结果，不重复构图。
+        shared_key 为共享缓存中的键（需包含数据集版本），不传则只用进程内缓存；group 见 latest()
+        """
+        fig_json = self.get(key)
+        if fig_json is None:
+            with self._lock:
+                # 未命中之后、登记之前可能刚有别的请求构图完成
+                fig_json = self._entries.get(key)
+                flight = self._flights.get(key) if fig_json is None else None
+                leader = fig_json is None and flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+                elif flight is not None:
+                    self.coalesced += 1
+            if leader:
+                try:
+                    fig_json = flight.result = self._load_or_build(key, build, scope, shared_key, group)
+                except BaseException as e:
+                    flight.error = e
+                    raise
+                finally:
+                    with self._lock:
+                        del self._flights[key]
+                    flight.event.set()
+            elif flight is not None:
+                flight.event.wait()
+                if flight.error is not None:
+                    raise flight.error
+                fig_json = flight.result
+        return orjson.loads(fig_json) if orjson else json.loads(fig_json)
+
+    def _load_or_build(self, key, build, scope, shared_key, group):
+        shared_id = shared_cache.make_key("figure", *shared_key) if self.shared and shared_key else None
+        data = self.shared.get(shared_id) if shared_id else None
+        if data is not None:
+            fig_json = data.decode("utf-8")
+            with self._lock:
+                self.shared_hits += 1
+        else:
+            # 图表已由 px 校验或由骨架填充生成，序列化时不再重复校验
+            fig_json = pio.to_json(build(), validate=False, engine="orjson" if orjson else "json")
+            if shared_id:
+                self.shared.put(shared_id, fig_json.encode("utf-8"))
+        self.put(key, fig_json, scope, group)
+        return fig_json
+
+    def latest(self, group):
+        """分组 group 中最近使用的条目（构图名额已满时代替尚未构建的视图）；没有则返回 None"""
+        with self._lock:
+            keys = self._groups.get(group)
+            fig_json = self._entries[next(reversed(keys))] if keys else None
+        if fig_json is None:
+            return None
+        return orjson.loads(fig_json) if orjson else json.loads(fig_json)
+
+    def invalidate(self, predicate=None):
+        """清除满足 predicate(key) 的条目；不传则全部清除。返回清除数量"""
+        with self._lock:
+            keys = [k for k in self._entries if predicate is None or predicate(k)]
+            for k in keys:
+                self._bytes -= len(self._entries.pop(k))
+                self._forget(k)
+            return len(keys)
+
+    def invalidate_from(self, lineage, first_quarter=0):
+        """清除 lineage 下季度区间 [q_start, q_end) 覆盖第 first_quarter 个及之后季度的条目"""
+        with self._lock:
+            stale = {k for k, (lin, _, q_end) in self._scopes.items() if lin == lineage and q_end > first_quarter}
+        return self.invalidate(lambda k: k in stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "shared_hits": self.shared_hits,
+                "coalesced": self.coalesced,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
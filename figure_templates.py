@@ -0,0 +1,196 @@
+"""
+图表骨架复用：Tab 1 / Tab 3 的图表每个 数据集 × 语言 只经过一次 px.*（分组、校验、布局），
+之后每次重跑只把筛选结果的 NumPy 数组填进预先生成的 trace 字典，再设置高亮的线宽 / 透明度，
+以 go.Figure(..., _validate=False) 包装，跳过 Plotly 的逐属性校验。
+
+- 骨架由 charts.py 中同名的 px 函数在只有一个类别的小表上生成，再按 px 的规则（名称、图例分组、悬停模板、
+  按颜色序列循环分配颜色）复制出每个类别的 trace，样式与直接调用 px 完全一致；上千只股票也只调用一次 px
+- 每只股票 / 每个行业的颜色固定（按全量数据中的出现顺序分配），不随筛选变化
+- 遇到骨架中没有的类别时回退到 charts.py 的 px 实现
+- 时间轴回放的动画图表（见 timeline_frames.py）沿用同样的股票 / 行业颜色和模板
+"""
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+import charts
+import timeline_frames
+
+
+def fast_figure(fig_dict):
+    """已知合法的图表 dict -> go.Figure，不做校验（缓存命中 / 骨架填充的热路径）"""
+    return go.Figure(fig_dict, _validate=False)
+
+
+def _groups(frame, color_col, x_col, y_col):
+    """按类别首次出现的顺序分组（与 px 的 trace 顺序一致），返回 [(类别, x 数组, y 数组)]"""
+    codes, names = pd.factorize(frame[color_col], sort=False)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.cumsum(np.bincount(codes, minlength=len(names)))[:-1]
+    x = np.array_split(frame[x_col].to_numpy()[order], bounds)
+    y = np.array_split(frame[y_col].to_numpy()[order], bounds)
+    return list(zip(names, x, y))
+
+
+def _skeleton(fig, names):
+    """
+    px 对单个类别 names[0] 生成的图表 -> (layout dict, {类别: 去掉数据数组的 trace dict})。
+    其余类别复制这个 trace，与 px 一样依次使用模板颜色序列 (colorway) 中的颜色
+    """
+    fig_dict = fig.to_plotly_json()
+    proto = {k: v for k, v in fig_dict['data'][0].items() if k not in ('x', 'y', 'labels', 'values')}
+    colorway = fig.layout.template.layout.colorway
+    color_attr = 'line' if 'color' in proto.get('line', {}) else 'marker'
+    # 悬停模板以 "<列标签>=<类别>" 开头
+    label = proto['hovertemplate'][:proto['hovertemplate'].index('=') + 1]
+    rest = proto['hovertemplate'][len(label) + len(str(names[0])):]
+    traces = {}
+    for i, name in enumerate(names):
+        traces[name] = dict(
+            proto, name=name, legendgroup=name, hovertemplate=label + str(name) + rest,
+            **{color_attr: dict(proto[color_attr], color=colorway[i % len(colorway)])},
+        )
+    return fig_dict['layout'], traces
+
+
+class FigureTemplates:
+    def __init__(self, dataset, lang_key, t):
+        """
+        某个数据集在某种语言下的图表骨架（所有会话共享，只读）；每种图表在第一次使用时生成。
+        只保留生成骨架所需的类别名称和首个季度，不引用数据集本身：进程级缓存中的骨架不会让
+        FilerStore 已淘汰的数据集继续占用内存
+        """
+        self.lang_key = lang_key
+        self.t = t
+        cube = dataset.cube
+        # 股票：按全量长表中的出现顺序分配颜色（与未筛选的默认视图一致），"其他" 排在最后
+        self._holding_names = list(pd.unique(dataset.view(lang_key)['Logo_Name'].to_numpy())) + [t["others_label"]]
+        # 行业：同样按全量数据中的出现顺序，从未持有过的行业排在最后
+        labels = cube.sector_labels[lang_key]
+        frame = cube.sector_frame(0, len(cube.dates), np.ones(len(labels), dtype=bool), lang_key)
+        names = list(pd.unique(frame['Sector'].to_numpy()))
+        self._sector_names = names + [label for label in labels if label not in names]
+        self._first_date = cube.dates[0]
+        self._first_quarter = cube.quarters[0]
+
+    def _sample(self, color_col, names):
+        return pd.DataFrame({
+            'Date': np.full(len(names), self._first_date),
+            'Quarter': np.full(len(names), self._first_quarter, dtype=object),
+            'Value_Billions': np.ones(len(names)),
+            'Percent_Portfolio': np.ones(len(names)),
+            color_col: names,
+        })
+
+    @cached_property
+    def _area(self):
+        names = self._holding_names
+        return _skeleton(charts.holdings_area(self._sample('Logo_Name', names[:1]), self.t), names)
+
+    @cached_property
+    def _bar(self):
+        names = self._holding_names
+        return _skeleton(charts.holdings_bar(self._sample('Logo_Name', names[:1]), self.t), names)
+
+    @cached_property
+    def _sector(self):
+        names = self._sector_names
+        return _skeleton(charts.sector_area(self._sample('Sector', names[:1]), self.t), names)
+
+    @cached_property
+    def _pie(self):
+        sample = self._sample('Sector', self._sector_names)
+        fig_dict = charts.sector_pie(sample, pd.Timestamp(self._first_date), self.t).to_plotly_json()
+        pie_trace = {k: v for k, v in fig_dict['data'][0].items() if k not in ('labels', 'values')}
+        # 饼图颜色按行业固定（与面积图相同的行业颜色）
+        colors = {name: trace['line']['color'] for name, trace in self._sector[1].items()}
+        return fig_dict['layout'], pie_trace, colors
+
+    # ------------------------------------------------------------------ Tab 1
+    def holdings_area(self, chart_df, highlight_names=()):
+        layout, traces = self._area
+        groups = _groups(chart_df, 'Logo_Name', 'Date', 'Value_Billions')
+        if any(name not in traces for name, _, _ in groups):
+            return charts.holdings_area(chart_df, self.t, highlight_names)
+        data = []
+        for name, x, y in groups:
+            trace = dict(traces[name], x=x, y=y)
+            if name in highlight_names:
+                trace['line'] = dict(trace['line'], width=3)
+                trace['fill'] = 'tonextx'
+            data.append(trace)
+        return fast_figure({'data': data, 'layout': layout})
+
+    def holdings_bar(self, chart_df, highlight_names=()):
+        layout, traces = self._bar
+        groups = _groups(chart_df, 'Logo_Name', 'Quarter', 'Percent_Portfolio')
+        if any(name not in traces for name, _, _ in groups):
+            return charts.holdings_bar(chart_df, self.t, highlight_names)
+        data = []
+        for name, x, y in groups:
+            trace = dict(traces[name], x=x, y=y)
+            if len(highlight_names):
+                trace['marker'] = dict(trace['marker'], opacity=1 if name in highlight_names else 0.5)
+            data.append(trace)
+        return fast_figure({'data': data, 'layout': layout})
+
+    # ------------------------------------------------------------------ Tab 3
+    def sector_area(self, sector_data):
+        layout, traces = self._sector
+        groups = _groups(sector_data, 'Sector', 'Date', 'Value_Billions')
+        if any(name not in traces for name, _, _ in groups):
+            return charts.sector_area(sector_data, self.t)
+        return fast_figure({'data': [dict(traces[name], x=x, y=y) for name, x, y in groups], 'layout': layout})
+
+    def sector_pie(self, latest_sector_data, latest_date):
+        layout, pie_trace, colors = self._pie
+        labels = latest_sector_data['Sector'].to_numpy()
+        if any(label not in colors for label in labels):
+            return charts.sector_pie(latest_sector_data, latest_date, self.t)
+        trace = dict(
+            pie_trace, labels=labels, values=latest_sector_data['Value_Billions'].to_numpy(),
+            marker={'colors': [colors[label] for label in labels]},
+        )
+        title = self.t["tab3_chart2_title"].format(date=latest_date.strftime("%Y Q%q"))
+        layout = dict(layout, title=dict(layout['title'], text=title))
+        return fast_figure({'data': [trace], 'layout': layout})
+
+    # ------------------------------------------------------------------ 时间轴回放
+    def holdings_timeline(self, cube, logo_names):
+        """cube / logo_names 为生成本骨架的数据集的矩阵和当前语言的显示名称"""
+        return fast_figure(timeline_frames.holdings_timeline(
+            cube, logo_names, self.holding_colors(),
+            {'template': self._area[0]['template']}, self.t, charts.TOP_N_HOLDINGS,
+        ))
+
+    def sector_timeline(self, cube):
+        return fast_figure(timeline_frames.sector_timeline(
+            cube, self._sector_names, self.lang_key, self.sector_colors(),
+            {'template': self._sector[0]['template']}, self.t
+        ))
+
+    # ------------------------------------------------------------------ 浏览器端筛选
+    def client_spec(self):
+        """
+        浏览器端筛选组件（见 client_filter.py）使用的骨架：每种图表的 layout 和一个 trace 原型。
+        原型去掉了类别名称和颜色，悬停模板中的类别名改为 %{fullData.name}，由浏览器按系列填入
+        """
+        spec = {}
+        for chart, (layout, traces) in (('area', self._area), ('bar', self._bar), ('sector', self._sector)):
+            name, trace = next(iter(traces.items()))
+            hover = trace['hovertemplate'].replace('=' + str(name), '=%{fullData.name}', 1)
+            proto = {k: v for k, v in trace.items() if k not in ('name', 'legendgroup', 'line', 'marker')}
+            spec[chart] = {'layout': layout, 'trace': dict(proto, hovertemplate=hover)}
+        layout, pie_trace, _ = self._pie
+        spec['pie'] = {'layout': layout, 'trace': pie_trace}
+        return spec
+
+    def holding_colors(self):
+        """Logo_Name -> 颜色（与 Tab 1 图表一致）"""
+        return {name: trace['line']['color'] for name, trace in self._area[1].items()}
+
+    def sector_colors(self):
+        """行业名称 -> 颜色（与 Tab 3 图表一致；按全量数据中的出现顺序）"""
+        return {name: trace['line']['color'] for name, trace in self._sector[1].items()}
@@ -0,0 +1,335 @@
+"""
+多机构 (13F filer) 持仓存储：filer -> quarter -> positions
+
+目录结构（均在 DATA_DIR 下）：
+    filers.json                      机构注册表：id -> {name: {en, zh}, cik, holdings}
+    holdings.csv / holdings.arrow    默认机构（伯克希尔）
+    filers/<id>/holdings.csv         其他机构的持仓（python ingest_13f.py --filer <id> 生成并注册）
+    filers/<id>/holdings.arrow       对应的列式快照；行按季度连续存放，季度 -> 行区间见 HoldingsCube.row_offsets
+
+选择某个机构只内存映射它自己的快照，不在全局大表上筛选。
+已加载的机构数据集放在按内存大小限制的 LRU 中（上限默认 1 GB），超出时淘汰最久未用的机构，
+上千个机构也只常驻最近访问的那一部分。
+
+传入 shared_cache（见 shared_cache.py）时，快照文件 (Arrow) 按 (源数据哈希, Logo 资源包哈希) 写入共享缓存；
+其他副本或重启后的进程取回快照写到本地、校验元数据中的哈希后照常内存映射，不再解析 CSV 和派生列。
+共享缓存中只存放数据（Arrow），不存放可执行的序列化对象。
+"""
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import portfolio_data
+import shared_cache
+from portfolio_dataset import PortfolioDataset
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_FILE = os.path.join(portfolio_data.DATA_DIR, "filers.json")
+FILERS_DIR = os.path.join(portfolio_data.DATA_DIR, "filers")
+DEFAULT_FILER = "berkshire"
+DEFAULT_REGISTRY = {
+    DEFAULT_FILER: {
+        "name": {"en": "Berkshire Hathaway", "zh": "伯克希尔·哈撒韦"},
+        "cik": "0001067983",
+        "holdings": "holdings.csv",
+    }
+}
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+
+def load_registry(path=REGISTRY_FILE):
+    """注册表 (按 id 排序，默认机构在最前)；文件不存在时只有默认机构"""
+    registry = dict(DEFAULT_REGISTRY)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            registry.update(json.load(f))
+    return OrderedDict(sorted(registry.items(), key=lambda kv: (kv[0] != DEFAULT_FILER, kv[0])))
+
+
+def register_filer(filer_id, name_en=None, name_zh=None, cik=None, path=REGISTRY_FILE):
+    """新增或更新注册表条目（未提供的字段保持原值）；持仓源数据约定在 filers/<id>/holdings.csv"""
+    registry = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            registry = json.load(f)
+    entry = registry.get(filer_id, {})
+    name = entry.get("name", {})
+    name_en = name_en or name.get("en") or filer_id
+    registry[filer_id] = {
+        "name": {"en": name_en, "zh": name_zh or name.get("zh") or name_en},
+        "cik": cik if cik is not None else entry.get("cik", ""),
+        "holdings": entry.get("holdings", os.path.join("filers", filer_id, "holdings.csv")),
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(registry, f, indent=2, sort_keys=True, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def filer_holdings_path(filer_id):
+    return os.path.join(FILERS_DIR, filer_id, "holdings.csv")
+
+
+class FilerStore:
+    def __init__(self, registry_path=REGISTRY_FILE, max_bytes=DEFAULT_MAX_BYTES, shared=None):
+        self.registry_path = registry_path
+        self.data_dir = os.path.dirname(registry_path)
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self._registry = None
+        self._registry_mtime = None
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self.loads = 0
+        self.evictions = 0
+        self.shared_loads = 0
+
+    # ------------------------------------------------------------------ 注册表
+    def registry(self):
+        """注册表文件变化时自动重新读取（新导入的机构无需重启即可出现）"""
+        mtime = os.path.getmtime(self.registry_path) if os.path.exists(self.registry_path) else None
+        if self._registry is None or mtime != self._registry_mtime:
+            self._registry = load_registry(self.registry_path)
+            self._registry_mtime = mtime
+        return self._registry
+
+    def filer_ids(self):
+        return list(self.registry())
+
+    def filer_name(self, filer_id, lang_key):
+        return self.registry()[filer_id]["name"][lang_key]
+
+    def paths(self, filer_id):
+        src = os.path.join(self.data_dir, self.registry()[filer_id]["holdings"])
+        return src, portfolio_data.snapshot_path_for(src)
+
+    # ------------------------------------------------------------------ 数据集 (内存受限 LRU)
+    def dataset(self, filer_id):
+        with self._lock:
+            entry = self._entries.get(filer_id)
+            if entry is not None:
+                self._entries.move_to_end(filer_id)
+                return entry[0]
+            build_lock = self._build_locks.setdefault(filer_id, threading.Lock())
+
+        # 同一机构只构建一次；不同机构可以并发构建
+        with build_lock:
+            with self._lock:
+                entry = self._entries.get(filer_id)
+                if entry is not None:
+                    return entry[0]
+            dataset = self._load(filer_id)
+            self._put(filer_id, dataset)
+            return dataset
+
+    def _load(self, filer_id):
+        src, dest = self.paths(filer_id)
+        if self.shared is None:
+            portfolio_data.ensure_snapshot(src, dest)
+        else:
+            self._restore_snapshot(src, dest)
+        digest = portfolio_data.snapshot_metadata(dest).get("source_sha256", "")
+        return PortfolioDataset(portfolio_data.open_snapshot(dest), version=f"{filer_id}:{digest}")
+
+    def _restore_snapshot(self, src, dest):
+        """
+        保证 dest 是最新的快照：本地已是最新则直接使用，否则取共享缓存中的快照（元数据中的源数据 / Logo 哈希
+        必须与当前一致），都没有才从源数据构建并写入共享缓存
+        """
+        digest = portfolio_data.file_digest(src)
+        logo_hash = portfolio_data.load_logo_bundle()["hash"]
+        if self._snapshot_matches(dest, digest, logo_hash):
+            return
+        key = shared_cache.make_key("snapshot", digest, logo_hash)
+        data = self.shared.get(key)
+        if data is not None:
+            tmp_path = f"{dest}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            if self._snapshot_matches(tmp_path, digest, logo_hash):
+                os.replace(tmp_path, dest)
+                with self._lock:
+                    self.shared_loads += 1
+                return
+            os.remove(tmp_path)
+            logger.warning("discarding shared snapshot entry that does not match %s", src)
+        portfolio_data.build_snapshot(src, dest)
+        self._publish_snapshot(dest, digest, logo_hash)
+
+    @staticmethod
+    def _snapshot_matches(path, digest, logo_hash):
+        try:
+            meta = portfolio_data.snapshot_metadata(path)
+        except (OSError, ValueError):
+            return False
+        return meta.get("source_sha256") == digest and meta.get("logo_bundle") == logo_hash
+
+    def _publish_snapshot(self, dest, digest, logo_hash=None):
+        if logo_hash is None:
+            logo_hash = portfolio_data.load_logo_bundle()["hash"]
+        with open(dest, "rb") as f:
+            self.shared.put(shared_cache.make_key("snapshot", digest, logo_hash), f.read())
+
+    def refresh(self, filer_id):
+        """
+        源数据变化后更新已加载的机构数据集（未加载的机构下次访问时自然读取新数据）。
+        返回 (mode, first_changed, old_lineage)：mode 为 "extend"（只追加 / 重算末尾季度）或 "rebuild"，
+        first_changed 为第一个变化的季度下标；没有变化时返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(filer_id)
+            build_lock = self._build_locks.setdefault(filer_id, threading.Lock())
+        if entry is None:
+            return None
+        with build_lock:
+            old = entry[0]
+            src, dest = self.paths(filer_id)
+            raw = portfolio_data.read_holdings(src)
+            plan = plan_refresh(old, raw)
+            if plan is None:
+                return None
+            keep, new_quarters = plan
+            digest = portfolio_data.file_digest(src)
+            # 本地快照已被其他副本更新（共用数据目录）时无法按行区间追加，改为整体重建
+            if keep and not self._holds_snapshot(old, dest):
+                keep = 0
+            if keep == 0:
+                portfolio_data.build_snapshot(src, dest)
+                dataset = PortfolioDataset(portfolio_data.open_snapshot(dest), version=f"{filer_id}:{digest}")
+                mode = "rebuild"
+            else:
+                # 只为新季度派生列；旧快照前缀按行区间直接保留
+                df_new = portfolio_data.derive_columns(
+                    raw[raw['Quarter'].isin(new_quarters)], portfolio_data.load_logo_bundle()
+                )
+                portfolio_data.extend_snapshot(dest, int(old.cube.row_offsets[keep]), df_new, src)
+                dataset = old.extended(portfolio_data.open_snapshot(dest), df_new, keep, f"{filer_id}:{digest}")
+                mode = "extend"
+            with self._lock:
+                current = self._entries.pop(filer_id, None)
+                if current is not None:
+                    self._bytes -= current[1]
+            if self.shared is not None:
+                self._publish_snapshot(dest, digest)
+            self._put(filer_id, dataset)
+            return mode, keep, old.lineage
+
+    @staticmethod
+    def _holds_snapshot(dataset, dest):
+        """本地快照是否正是 dataset 所基于的那一份（行区间可以直接复用）"""
+        try:
+            digest = portfolio_data.snapshot_metadata(dest).get("source_sha256", "")
+        except (OSError, ValueError):
+            return False
+        return dataset.version.endswith(f":{digest}")
+
+    def _put(self, filer_id, dataset):
+        size = dataset.shared_bytes()
+        with self._lock:
+            self.loads += 1
+            self._entries[filer_id] = (dataset, size)
+            self._bytes += size
+            # 至少保留刚加载的这一个
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def invalidate(self, filer_id=None):
+        """丢弃已加载的数据集（源数据更新后调用）；不传则全部丢弃"""
+        with self._lock:
+            ids = [filer_id] if filer_id is not None else list(self._entries)
+            for fid in ids:
+                entry = self._entries.pop(fid, None)
+                if entry is not None:
+                    self._bytes -= entry[1]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "filers": len(self.registry()),
+                "loaded": list(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "shared_loads": self.shared_loads,
+            }
+
+
+def plan_refresh(dataset, raw):
+    """
+    比较每个季度的内容摘要：保留最长的未变化前缀，之后的季度（新增或被修订）全部重新导入。
+    返回 (keep, 需要导入的季度列表)；没有变化返回 None；keep 为 0（如补录了更早的季度）表示需要整体重建
+    """
+    digests = portfolio_data.quarter_digests(raw)
+    quarters = [str(q) for q in dataset.cube.quarters]
+    if digests == dataset.quarter_digests:
+        return None
+    keep = 0
+    while keep < len(quarters) and digests.get(quarters[keep]) == dataset.quarter_digests.get(quarters[keep]):
+        keep += 1
+    kept = set(quarters[:keep])
+    new_quarters = sorted((q for q in digests if q not in kept), key=portfolio_data.parse_quarter)
+    # 新季度必须都晚于保留的前缀，否则季度下标会移动，只能整体重建
+    if keep and new_quarters and portfolio_data.parse_quarter(new_quarters[0]) <= portfolio_data.parse_quarter(quarters[keep - 1]):
+        keep = 0
+    if keep and not new_quarters and keep < len(quarters):
+        keep = 0  # 只删除了末尾季度：数据量小，直接重建
+    return keep, new_quarters
+
+
+# -----------------------------------------------------------------------------
+# 两个机构的持仓重叠
+# -----------------------------------------------------------------------------
+def common_dates(dataset_a, dataset_b):
+    return np.intersect1d(dataset_a.cube.dates, dataset_b.cube.dates)
+
+
+def _weights(cube, date):
+    q = int(np.searchsorted(cube.dates, date))
+    value = cube.value[q]
+    total = value.sum()
+    held = np.flatnonzero(cube.held[q])
+    return held, value[held], value[held] / total if total > 0 else np.zeros(len(held))
+
+
+def portfolio_overlap(dataset_a, dataset_b, date, lang_key):
+    """
+    同一季度两个组合的重叠：共同持有的股票及其在各自组合中的权重。
+    重叠度 = Σ min(权重A, 权重B)，0 表示没有共同持仓，100% 表示两个组合完全相同。
+    返回 (summary dict, DataFrame[Ticker, Name, Weight_A_Pct, Weight_B_Pct, Value_A_Billions, Value_B_Billions])
+    """
+    date = np.datetime64(pd.Timestamp(date))
+    idx_a, value_a, weight_a = _weights(dataset_a.cube, date)
+    idx_b, value_b, weight_b = _weights(dataset_b.cube, date)
+    # cube.tickers 已排序，持仓下标对应的代码也是有序的
+    _, pos_a, pos_b = np.intersect1d(dataset_a.cube.tickers[idx_a], dataset_b.cube.tickers[idx_b],
+                                     assume_unique=True, return_indices=True)
+    shared_weight = np.minimum(weight_a[pos_a], weight_b[pos_b])
+    order = np.argsort(-shared_weight, kind="stable")
+    pos_a, pos_b = pos_a[order], pos_b[order]
+
+    frame = pd.DataFrame({
+        'Ticker': dataset_a.cube.tickers[idx_a[pos_a]],
+        'Name': dataset_a.full_names[lang_key][idx_a[pos_a]],
+        'Weight_A_Pct': weight_a[pos_a] * 100,
+        'Weight_B_Pct': weight_b[pos_b] * 100,
+        'Value_A_Billions': value_a[pos_a],
+        'Value_B_Billions': value_b[pos_b],
+    })
+    summary = {
+        "overlap_pct": float(shared_weight.sum() * 100),
+        "common_positions": len(frame),
+        "positions_a": len(idx_a),
+        "positions_b": len(idx_b),
+    }
+    return summary, frame
@@ -0,0 +1,253 @@
+"""
+多语言文本字典（界面与图表共用，不依赖 Streamlit，离线工具也可导入）
+"""
+
+# 语言字典 - 包含所有需要翻译的文本
+LANG = {
+    "English": {
+        "page_title": "Berkshire Portfolio | 2000-2025",
+        "title": "Berkshire Hathaway Portfolio Evolution",
+        "caption": "A 25-year interactive visualization of Warren Buffett's investment strategy (2000-2025).",
+        "sidebar_header": "⚙️ Controls",
+        "filer_select": "🏦 Filer",
+        "title_filer": "{filer} Portfolio Evolution",
+        "caption_filer": "Quarter-by-quarter 13F holdings of {filer}.",
+        "time_slider": "⏳ Select Time Period",
+        "sector_filter": "🏷️ Filter by Sector",
+        "all_sectors": "All Sectors",
+        "stock_filter": "🔍 Highlight Specific Stocks",
+        "search_placeholder": "Search ticker or company name…",
+        "daily_mode": "📈 Daily mark-to-market",
+        "daily_mode_help": "Hold each 13F position until the next filing and value it at daily closing prices",
+        "daily_caption": "Daily values: reported shares × daily close (positions carried until the next filing; 13F-implied price where no close is available).",
+        "playback_mode": "▶ Timeline playback",
+        "playback_mode_help": "Precompute every quarter once and animate in the browser (no reruns while playing)",
+        "playback_caption": "Timeline playback covers all quarters and sectors; press ▶ or drag the quarter slider below the chart.",
+        "playback_play": "▶ Play",
+        "playback_pause": "⏸ Pause",
+        "playback_quarter": "Quarter: ",
+        "playback_value": "Value ($B)",
+        "playback_holdings_title": "Top 15 Holdings by Value · {quarter}",
+        "playback_sector_title": "Value by Sector · {quarter}",
+        "client_mode": "⚡ Browser-side filtering",
+        "client_mode_help": "Send the dataset to the browser once; time range, sector and highlight filters in Tab 1 / Tab 3 update without server reruns",
+        "client_caption": "Filtered in your browser. Click a stock to open its analysis in Tab 2, or apply the filters to the other tabs.",
+        "client_apply": "Apply filters to other tabs",
+        "client_click_hint": "Click a stock in the charts to analyse it in Tab 2.",
+        "client_loading": "Loading charts…",
+        "gate_trial": "🎁 Free preview · {seconds}s left",
+        "gate_unlocked": "🔓 Full access · {hours:.1f} h left",
+        "gate_unlock_expander": "🔑 Unlock full access",
+        "gate_locked": "The free preview has ended. Enter the access code to unlock {hours} hours of full access.",
+        "gate_code": "Access code",
+        "gate_unlock": "Unlock",
+        "gate_wrong_code": "Incorrect access code.",
+        "gate_too_many": "Too many attempts. Please wait a minute and try again.",
+        "busy_stale": "⏳ The server is busy: showing the most recent cached version of this chart (it may not reflect your latest filters).",
+        "busy_unavailable": "⏳ The server is busy and this chart has not been built yet. Please retry in a moment.",
+        "busy_retry": "Retry",
+        "start_period": "Start Period",
+        "end_period": "End Period",
+        "top_holding": "Top Holding (Filtered)",
+        "top_sector": "Top Sector",
+        "warning_no_latest_data": "No data found for the latest selected period. Adjust filters.",
+        "warning_no_data": "No data found for the selected time and sector filters.",
+        "tab1_title": "📊 Portfolio Composition",
+        "tab2_title": "📈 Stock Deep Dive",
+        "tab3_title": "🧩 Sector Shift",
+        "tab4_title": "📘 Company Reference",
+        "tab5_title": "🔄 Portfolio Changes",
+        "tab6_title": "🤝 Filer Overlap",
+        "tab1_sub1": "Evolution of Top Holdings (Value & Proportion)",
+        "tab1_chart1_title": "Portfolio Value by Stock (Filtered by Time & Sector)",
+        "tab1_chart1_yaxis": "Value ($ Billions)",
+        "tab1_sub2": "Proportional Changes Over Time",
+        "tab1_chart2_title": "Relative Portfolio Weight % (Filtered by Time & Sector)",
+        "tab2_sub1": "Single Stock Analysis",
+        "tab2_select_company": "Select a Company to Analyze",
+        "tab2_no_stocks": "No stocks available for analysis with current filters.",
+        "tab2_chart1_title": "{name}: Market Value History ($B)",
+        "tab2_chart2_title": "{name}: Shares Held History (Millions)",
+        "tab2_divider": "Comparison Tool",
+        "tab2_compare_label": "Compare Holdings (Value)",
+        "tab2_compare_title": "Holdings Value Comparison (Filtered)",
+        "tab2_chart3_title": "{name}: Share Changes Between Filings (Millions)",
+        "tab3_sub1": "Strategic Shift by Sector",
+        "tab3_chart1_title": "Portfolio Value Composition by Sector (Filtered)",
+        "tab3_chart2_title": "Sector Allocation ({date}) (Filtered)",
+        "tab3_no_sector_data": "No sector data available for the latest period with current filters.",
+        "tab4_sub1": "📘 Company Reference (Full Name & Logo)",
+        "tab4_description": "Below are the companies appearing in the filtered data with their information:",
+        "tab4_sort_by": "Sort by",
+        "tab4_sort_sector": "Sector",
+        "tab4_sort_ticker": "Ticker",
+        "tab4_sort_name": "Company name",
+        "tab4_page_size": "Rows per page",
+        "tab4_page": "Page (of {pages})",
+        "tab4_showing": "Showing {start}–{end} of {total} companies",
+        "col_logo_name": "Logo & Name",
+        "col_sector": "Sector",
+        "others_label": "Others",
+        "tab5_sub1": "Buying, Selling & Turnover Between Filings",
+        "tab5_note": "Dollar flows are estimates: share change × average of the two quarter-end prices. Stock splits show up as share jumps.",
+        "tab5_metric_net_flow": "Net Buying ({quarter}, $B)",
+        "tab5_metric_turnover": "Turnover",
+        "tab5_metric_hhi": "Concentration (HHI)",
+        "tab5_metric_new_exited": "New / Exited Positions",
+        "tab5_chart1_title": "Estimated Buys vs Sells per Filing ($B)",
+        "tab5_chart2_title": "Turnover & Concentration (%)",
+        "tab5_buys": "Buys",
+        "tab5_sells": "Sells",
+        "tab5_net": "Net",
+        "tab5_turnover": "Turnover %",
+        "tab5_top5": "Top-5 Share %",
+        "tab5_hhi": "HHI × 100",
+        "tab5_sub2": "Position Activity",
+        "tab5_select_quarter": "Filing Quarter",
+        "tab5_no_activity": "No position changes in this quarter with current filters.",
+        "action_hold": "Hold",
+        "action_new": "New",
+        "action_add": "Add",
+        "action_trim": "Trim",
+        "action_exit": "Exit",
+        "col_ticker": "Ticker",
+        "col_company": "Company",
+        "col_action": "Action",
+        "col_share_delta": "Share Change (M)",
+        "col_share_change_pct": "Share Change %",
+        "col_flow": "Est. Flow ($B)",
+        "tab6_sub1": "Shared Positions Between Two Filers",
+        "tab6_compare_with": "Compare With",
+        "tab6_no_common": "The two filers have no filing quarter in common.",
+        "tab6_no_shared": "No shared positions in this quarter.",
+        "tab6_metric_overlap": "Portfolio Overlap (Σ min weight)",
+        "tab6_metric_common": "Shared / Positions (A · B)",
+        "tab6_chart_title": "Weights of Shared Positions ({quarter})",
+        "col_weight": "{filer} Weight %",
+        "col_value": "{filer} Value ($B)",
+        "footer": "Designed with Streamlit & Plotly | Data based on Berkshire Hathaway 13F Filings (Top Holdings Only)"
+    },
+    "中文": {
+        "page_title": "伯克希尔投资组合 | 2000-2025",
+        "title": "伯克希尔·哈撒韦投资组合演变",
+        "caption": "巴菲特25年投资策略的交互式可视化分析 (2000-2025)",
+        "sidebar_header": "⚙️ 控制面板",
+        "filer_select": "🏦 机构",
+        "title_filer": "{filer}投资组合演变",
+        "caption_filer": "{filer} 13F 持仓的逐季度可视化",
+        "time_slider": "⏳ 选择时间范围",
+        "sector_filter": "🏷️ 按行业筛选",
+        "all_sectors": "全部行业",
+        "stock_filter": "🔍 高亮特定股票",
+        "search_placeholder": "输入代码、中英文名称或拼音…",
+        "daily_mode": "📈 每日盯市",
+        "daily_mode_help": "每个 13F 持仓沿用到下一次披露，按每日收盘价估值",
+        "daily_caption": "每日市值 = 披露持股数 × 当日收盘价（持仓沿用到下一次披露；缺少收盘价时使用 13F 隐含价格）。",
+        "playback_mode": "▶ 时间轴回放",
+        "playback_mode_help": "所有季度只预计算一次，在浏览器中播放动画（播放时不触发重跑）",
+        "playback_caption": "时间轴回放覆盖全部季度和行业；点击 ▶ 或拖动图表下方的季度滑块。",
+        "playback_play": "▶ 播放",
+        "playback_pause": "⏸ 暂停",
+        "playback_quarter": "季度：",
+        "playback_value": "市值 (十亿美元)",
+        "playback_holdings_title": "前十五大持仓市值 · {quarter}",
+        "playback_sector_title": "各行业持仓市值 · {quarter}",
+        "client_mode": "⚡ 浏览器端筛选",
+        "client_mode_help": "数据集只发送一次到浏览器；Tab 1 / Tab 3 的时间范围、行业和高亮筛选不再触发服务端重跑",
+        "client_caption": "筛选在浏览器中完成。点击某只股票可在 Tab 2 查看个股分析，或把筛选条件应用到其他 Tab。",
+        "client_apply": "将筛选条件应用到其他 Tab",
+        "client_click_hint": "点击图表中的股票，在 Tab 2 查看个股分析。",
+        "client_loading": "正在加载图表…",
+        "gate_trial": "🎁 免费试用 · 剩余 {seconds} 秒",
+        "gate_unlocked": "🔓 已解锁 · 剩余 {hours:.1f} 小时",
+        "gate_unlock_expander": "🔑 解锁完整访问",
+        "gate_locked": "免费试用已结束。输入访问密码即可解锁 {hours} 小时的完整访问。",
+        "gate_code": "访问密码",
+        "gate_unlock": "解锁",
+        "gate_wrong_code": "访问密码不正确。",
+        "gate_too_many": "尝试次数过多，请一分钟后再试。",
+        "busy_stale": "⏳ 服务器繁忙：当前显示的是该图表最近一次缓存的版本（可能尚未应用最新的筛选条件）。",
+        "busy_unavailable": "⏳ 服务器繁忙，该图表尚未生成，请稍后重试。",
+        "busy_retry": "重试",
+        "start_period": "开始时间",
+        "end_period": "结束时间",
+        "top_holding": "最大持仓 (已筛选)",
+        "top_sector": "主要行业",
+        "warning_no_latest_data": "所选最新时间段无数据，请调整筛选条件。",
+        "warning_no_data": "所选时间和行业筛选条件下无数据。",
+        "tab1_title": "📊 投资组合构成",
+        "tab2_title": "📈 个股深度分析",
+        "tab3_title": "🧩 行业变迁",
+        "tab4_title": "📘 公司参考",
+        "tab5_title": "🔄 持仓变动",
+        "tab6_title": "🤝 机构持仓重叠",
+        "tab1_sub1": "主要持仓演变 (价值与占比)",
+        "tab1_chart1_title": "股票持仓价值 (按时间和行业筛选)",
+        "tab1_chart1_yaxis": "价值 (十亿美元)",
+        "tab1_sub2": "持仓占比变化趋势",
+        "tab1_chart2_title": "持仓权重占比 % (按时间和行业筛选)",
+        "tab2_sub1": "个股分析",
+        "tab2_select_company": "选择要分析的公司",
+        "tab2_no_stocks": "当前筛选条件下无可分析的股票。",
+        "tab2_chart1_title": "{name}: 市值历史 (十亿美元)",
+        "tab2_chart2_title": "{name}: 持股数量历史 (百万股)",
+        "tab2_divider": "对比分析工具",
+        "tab2_compare_label": "对比持仓价值",
+        "tab2_compare_title": "持仓价值对比 (已筛选)",
+        "tab2_chart3_title": "{name}: 历次披露间持股变化 (百万股)",
+        "tab3_sub1": "行业配置战略变迁",
+        "tab3_chart1_title": "行业持仓价值构成 (已筛选)",
+        "tab3_chart2_title": "行业配置占比 ({date}) (已筛选)",
+        "tab3_no_sector_data": "当前筛选条件下最新时间段无行业数据。",
+        "tab4_sub1": "📘 公司参考 (全名与Logo)",
+        "tab4_description": "以下是筛选后的数据中出现的公司及其信息：",
+        "tab4_sort_by": "排序方式",
+        "tab4_sort_sector": "行业",
+        "tab4_sort_ticker": "股票代码",
+        "tab4_sort_name": "公司名称",
+        "tab4_page_size": "每页行数",
+        "tab4_page": "页码（共 {pages} 页）",
+        "tab4_showing": "显示第 {start}–{end} 家，共 {total} 家公司",
+        "col_logo_name": "Logo & 名称",
+        "col_sector": "行业",
+        "others_label": "其他",
+        "tab5_sub1": "历次披露之间的买入、卖出与换手",
+        "tab5_note": "金额为估算值：持股变化 × 前后两期季末价格均值；拆股会表现为持股数跳变。",
+        "tab5_metric_net_flow": "净买入 ({quarter}, 十亿美元)",
+        "tab5_metric_turnover": "换手率",
+        "tab5_metric_hhi": "集中度 (HHI)",
+        "tab5_metric_new_exited": "新建仓 / 清仓",
+        "tab5_chart1_title": "每期估计买入与卖出 (十亿美元)",
+        "tab5_chart2_title": "换手率与集中度 (%)",
+        "tab5_buys": "买入",
+        "tab5_sells": "卖出",
+        "tab5_net": "净额",
+        "tab5_turnover": "换手率 %",
+        "tab5_top5": "前5大持仓占比 %",
+        "tab5_hhi": "HHI × 100",
+        "tab5_sub2": "持仓变动明细",
+        "tab5_select_quarter": "披露季度",
+        "tab5_no_activity": "当前筛选条件下该季度无持仓变动。",
+        "action_hold": "持有",
+        "action_new": "新建仓",
+        "action_add": "增持",
+        "action_trim": "减持",
+        "action_exit": "清仓",
+        "col_ticker": "代码",
+        "col_company": "公司",
+        "col_action": "操作",
+        "col_share_delta": "持股变化 (百万股)",
+        "col_share_change_pct": "持股变化 %",
+        "col_flow": "估计金额 (十亿美元)",
+        "tab6_sub1": "两个机构的共同持仓",
+        "tab6_compare_with": "对比机构",
+        "tab6_no_common": "两个机构没有共同的披露季度。",
+        "tab6_no_shared": "该季度没有共同持仓。",
+        "tab6_metric_overlap": "组合重叠度 (Σ 较小权重)",
+        "tab6_metric_common": "共同持仓 / 持仓数 (A · B)",
+        "tab6_chart_title": "共同持仓权重对比 ({quarter})",
+        "col_weight": "{filer} 权重 %",
+        "col_value": "{filer} 市值 (十亿美元)",
+        "footer": "使用 Streamlit & Plotly 制作 | 数据基于伯克希尔·哈撒韦 13F 备案文件 (仅主要持仓)"
+    }
+}
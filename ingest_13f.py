@@ -0,0 +1,368 @@
+"""
+13F 信息表离线导入：逐季度流式读取 SEC 13F information table (XML / TSV)，
+CUSIP -> Ticker 映射后输出 load_data() 使用的持仓表结构：
+    Quarter, Ticker, Shares_Millions, Value_Billions, Percent_Portfolio
+
+源文件按报告季度命名放在同一目录，两种形式：
+- 单个机构的信息表：data/13f/2024Q4.xml（EDGAR 上一份 13F-HR 的 information table），
+  或 data/13f/2025Q1.tsv（只含该机构一份申报的 INFOTABLE 摘录）
+- SEC 13F 数据集（Form 13F Data Sets，所有机构的申报）解压后的目录：data/13f/2024Q4/ 下的
+  INFOTABLE.tsv、SUBMISSION.tsv、COVERPAGE.tsv。按 ACCESSION_NUMBER 关联，只保留 CIK 为本机构、
+  报告期在该季度内的 13F-HR（重述型修订替代原申报，新增持仓型修订追加在后）；需要提供 CIK
+  （--cik 或 data/filers.json 中的 cik）
+只重新处理内容发生变化的季度（data/13f/.manifest.json 记录源文件哈希），
+多个季度之间使用进程池并行。
+
+用法：
+    python ingest_13f.py [--src data/13f] [--cusip-map data/cusip_tickers.csv] [--workers N] [--force]
+
+其他机构：源文件放在 data/13f/<id>/，结果写入 data/filers/<id>/holdings.csv 并登记到 data/filers.json
+    python ingest_13f.py --filer pershing --name "Pershing Square" [--name-zh 潘兴广场] [--cik 0001336528]
+"""
+import argparse
+import csv
+import datetime
+import hashlib
+import json
+import logging
+import os
+import re
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+import portfolio_data
+
+logger = logging.getLogger(__name__)
+
+SOURCE_DIR = os.path.join(portfolio_data.DATA_DIR, "13f")
+QUARTER_DIR = os.path.join(portfolio_data.DATA_DIR, "quarters")
+CUSIP_MAP_FILE = os.path.join(portfolio_data.DATA_DIR, "cusip_tickers.csv")
+MANIFEST_NAME = ".manifest.json"
+
+SOURCE_PATTERN = re.compile(r"^(\d{4})[ _-]?Q([1-4])\.(xml|tsv|txt)$", re.IGNORECASE)
+BULK_PATTERN = re.compile(r"^(\d{4})[ _-]?Q([1-4])$", re.IGNORECASE)
+BULK_FILES = ("INFOTABLE.tsv", "SUBMISSION.tsv", "COVERPAGE.tsv")
+
+# 2023-01-03 起 SEC 要求 VALUE 以美元填报（2022 Q4 报告期开始），之前为千美元
+DOLLAR_VALUE_SINCE = (2022, 4)
+
+
+def load_cusip_map(path=CUSIP_MAP_FILE):
+    """CUSIP,Ticker 两列的 CSV；CUSIP 统一为 9 位大写"""
+    mapping = {}
+    if not os.path.exists(path):
+        return mapping
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            cusip = (row.get("CUSIP") or "").strip().upper()
+            ticker = (row.get("Ticker") or "").strip().upper()
+            if cusip and ticker:
+                mapping[cusip] = ticker
+    return mapping
+
+
+def discover_sources(src_dir=SOURCE_DIR):
+    """返回 {'2024 Q4': path, ...}（文件或数据集目录）；同一季度有多个来源时只取排序后的第一个"""
+    sources = {}
+    if not os.path.isdir(src_dir):
+        return sources
+    for name in sorted(os.listdir(src_dir)):
+        path = os.path.join(src_dir, name)
+        m = SOURCE_PATTERN.match(name)
+        if m is None and os.path.isfile(os.path.join(path, BULK_FILES[0])):
+            m = BULK_PATTERN.match(name)
+        if m:
+            sources.setdefault(f"{m.group(1)} Q{m.group(2)}", path)
+    return sources
+
+
+def source_files(path):
+    """组成一个季度来源的文件：单个文件，或数据集目录中存在的 INFOTABLE / SUBMISSION / COVERPAGE"""
+    if not os.path.isdir(path):
+        return [path]
+    return [os.path.join(path, name) for name in BULK_FILES if os.path.exists(os.path.join(path, name))]
+
+
+def source_digest(path, cik=None):
+    """来源内容摘要（manifest 用）；数据集目录还包含 CIK，换机构后重新筛选"""
+    if not os.path.isdir(path):
+        return portfolio_data.file_digest(path)
+    parts = [normalize_cik(cik)] + [portfolio_data.file_digest(f) for f in source_files(path)]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+def normalize_cik(cik):
+    return (cik or "").strip().lstrip("0")
+
+
+def quarter_of(date_text):
+    """SEC 数据集中的日期 '31-DEC-2024' -> '2024 Q4'"""
+    date = datetime.datetime.strptime(date_text.strip(), "%d-%b-%Y")
+    return f"{date.year} Q{(date.month - 1) // 3 + 1}"
+
+
+def _read_tsv(path):
+    """表头大写的 TSV -> 逐行 dict（列名不区分大小写）"""
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        reader = csv.reader(f, delimiter="\t")
+        header = [h.strip().upper() for h in next(reader, [])]
+        for fields in reader:
+            if fields:
+                yield {name: fields[i].strip() if i < len(fields) else "" for i, name in enumerate(header)}
+
+
+def select_accessions(bulk_dir, cik, quarter):
+    """
+    数据集目录中属于该机构、该报告季度的申报编号。按申报日期排序：最后一份原始申报或重述型修订
+    (RESTATEMENT) 为基准，其后的新增持仓型修订 (NEW HOLDINGS) 一并计入
+    """
+    cik = normalize_cik(cik)
+    filings = []
+    for row in _read_tsv(os.path.join(bulk_dir, "SUBMISSION.tsv")):
+        if (normalize_cik(row.get("CIK")) == cik and row.get("SUBMISSIONTYPE", "").upper() in ("13F-HR", "13F-HR/A")
+                and row.get("PERIODOFREPORT") and quarter_of(row["PERIODOFREPORT"]) == quarter):
+            filed = datetime.datetime.strptime(row["FILING_DATE"], "%d-%b-%Y") if row.get("FILING_DATE") else None
+            filings.append((filed or datetime.datetime.min, row["ACCESSION_NUMBER"]))
+    if not filings:
+        return []
+    amendments = {}
+    cover = os.path.join(bulk_dir, "COVERPAGE.tsv")
+    if os.path.exists(cover):
+        wanted = {accession for _, accession in filings}
+        for row in _read_tsv(cover):
+            if row.get("ACCESSION_NUMBER") in wanted and row.get("ISAMENDMENT", "").upper() in ("Y", "TRUE", "1"):
+                amendments[row["ACCESSION_NUMBER"]] = row.get("AMENDMENTTYPE", "").upper()
+    filings.sort()
+    base = max((i for i, (_, accession) in enumerate(filings) if amendments.get(accession) != "NEW HOLDINGS"),
+               default=0)
+    return [filings[base][1]] + [accession for _, accession in filings[base + 1:]
+                                 if amendments.get(accession) == "NEW HOLDINGS"]
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def iter_xml_rows(path):
+    """iterparse 流式读取 <infoTable>，处理完即释放节点，内存与文件大小无关"""
+    context = ET.iterparse(path, events=("start", "end"))
+    _, root = next(context)
+    for event, elem in context:
+        if event != "end" or _local(elem.tag) != "infoTable":
+            continue
+        row = {"shares": 0.0, "value": 0.0, "cusip": "", "issuer": "", "type": "SH", "putcall": ""}
+        for child in elem.iter():
+            tag = _local(child.tag)
+            text = (child.text or "").strip()
+            if tag == "nameOfIssuer":
+                row["issuer"] = text
+            elif tag == "cusip":
+                row["cusip"] = text.upper()
+            elif tag == "value":
+                row["value"] = float(text or 0)
+            elif tag == "sshPrnamt":
+                row["shares"] = float(text or 0)
+            elif tag == "sshPrnamtType":
+                row["type"] = text.upper()
+            elif tag == "putCall":
+                row["putcall"] = text.upper()
+        yield row
+        root.clear()
+
+
+def iter_tsv_rows(path, accessions=None):
+    """
+    INFOTABLE.tsv 格式（列名不区分大小写）。accessions 为 None 时文件应只含一份申报：
+    出现多个 ACCESSION_NUMBER 说明是所有机构的数据集，直接汇总会把其他机构的持仓算进来，报错
+    """
+    seen = set()
+    for row in _read_tsv(path):
+        accession = row.get("ACCESSION_NUMBER", "")
+        if accessions is not None:
+            if accession not in accessions:
+                continue
+        elif accession and accession not in seen:
+            seen.add(accession)
+            if len(seen) > 1:
+                raise ValueError(
+                    f"{path} contains more than one filing; extract a single 13F-HR or place the SEC data set "
+                    "in a <year>Q<n>/ directory with SUBMISSION.tsv so it can be filtered by CIK"
+                )
+        yield {
+            "issuer": row.get("NAMEOFISSUER", ""),
+            "cusip": row.get("CUSIP", "").upper(),
+            "value": float(row.get("VALUE") or 0),
+            "shares": float(row.get("SSHPRNAMT") or 0),
+            "type": row.get("SSHPRNAMTTYPE", "").upper() or "SH",
+            "putcall": row.get("PUTCALL", "").upper(),
+        }
+
+
+def iter_rows(path, quarter=None, cik=None):
+    if os.path.isdir(path):
+        if not normalize_cik(cik):
+            raise ValueError(f"{path} is a multi-filer 13F data set; a filer CIK is required to select its rows")
+        accessions = select_accessions(path, cik, quarter)
+        if not accessions:
+            raise ValueError(f"no 13F-HR for CIK {cik} with a {quarter} report period in {path}")
+        return iter_tsv_rows(os.path.join(path, "INFOTABLE.tsv"), set(accessions))
+    return iter_xml_rows(path) if path.lower().endswith(".xml") else iter_tsv_rows(path)
+
+
+def value_multiplier(quarter):
+    year, q = quarter.split(" Q")
+    return 1.0 if (int(year), int(q)) >= DOLLAR_VALUE_SINCE else 1000.0
+
+
+def aggregate_quarter(quarter, path, cusip_map, cik=None):
+    """单季度聚合：同一 Ticker 的多行（不同子账户）合并；期权头寸只计入总市值。数据集目录需要 cik"""
+    multiplier = value_multiplier(quarter)
+    values, shares = {}, {}
+    total_value = 0.0
+    unmapped = set()
+    for row in iter_rows(path, quarter, cik):
+        dollars = row["value"] * multiplier
+        total_value += dollars
+        if row["putcall"]:
+            continue
+        ticker = cusip_map.get(row["cusip"])
+        if ticker is None:
+            # 未映射的 CUSIP 保留为独立标的，避免丢失持仓
+            ticker = row["cusip"] or row["issuer"]
+            unmapped.add(ticker)
+        values[ticker] = values.get(ticker, 0.0) + dollars
+        if row["type"] == "SH":
+            shares[ticker] = shares.get(ticker, 0.0) + row["shares"]
+
+    rows = []
+    for ticker, dollars in sorted(values.items(), key=lambda kv: -kv[1]):
+        pct = dollars / total_value * 100 if total_value else 0.0
+        rows.append((quarter, ticker, round(shares.get(ticker, 0.0) / 1e6, 4), round(dollars / 1e9, 4), round(pct, 4)))
+    return rows, sorted(unmapped)
+
+
+def _process_quarter(args):
+    quarter, path, cusip_map, out_path, cik = args
+    rows, unmapped = aggregate_quarter(quarter, path, cusip_map, cik)
+    write_rows(out_path, rows)
+    return quarter, len(rows), unmapped
+
+
+def write_rows(path, rows):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(portfolio_data.HOLDING_COLUMNS)
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+
+def quarter_output_path(quarter, out_dir=QUARTER_DIR):
+    return os.path.join(out_dir, quarter.replace(" ", "") + ".csv")
+
+
+def load_manifest(src_dir):
+    path = os.path.join(src_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(src_dir, manifest):
+    path = os.path.join(src_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def merge_holdings(quarters, out_dir=QUARTER_DIR, dest=portfolio_data.HOLDINGS_CSV):
+    """导入的季度覆盖 holdings.csv 中同季度的行，其他季度（手工整理的数据）保持不变"""
+    kept = []
+    if os.path.exists(dest):
+        with open(dest, newline="", encoding="utf-8") as f:
+            kept = [row for row in csv.reader(f)][1:]
+        kept = [row for row in kept if row and row[0] not in quarters]
+    ingested = []
+    for quarter in sorted(quarters, reverse=True):
+        with open(quarter_output_path(quarter, out_dir), newline="", encoding="utf-8") as f:
+            ingested.extend(list(csv.reader(f))[1:])
+    rows = sorted(ingested + kept, key=lambda r: r[0], reverse=True)
+    write_rows(dest, rows)
+    return len(rows)
+
+
+def ingest(src_dir=SOURCE_DIR, cusip_map_path=CUSIP_MAP_FILE, out_dir=QUARTER_DIR, workers=None, force=False,
+           dest=portfolio_data.HOLDINGS_CSV, cik=None):
+    """增量导入；返回本次重新处理的季度列表。cik 用于从 SEC 数据集目录中筛选本机构的申报"""
+    os.makedirs(out_dir, exist_ok=True)
+    sources = discover_sources(src_dir)
+    if not sources:
+        return []
+    cusip_map = load_cusip_map(cusip_map_path)
+    map_digest = portfolio_data.file_digest(cusip_map_path) if os.path.exists(cusip_map_path) else ""
+    manifest = load_manifest(src_dir)
+
+    jobs = []
+    for quarter, path in sources.items():
+        digest = source_digest(path, cik)
+        entry = manifest.get(quarter, {})
+        out_path = quarter_output_path(quarter, out_dir)
+        if (not force and entry.get("sha256") == digest and entry.get("cusip_map") == map_digest
+                and os.path.exists(out_path)):
+            continue
+        manifest[quarter] = {"file": os.path.basename(path), "sha256": digest, "cusip_map": map_digest}
+        jobs.append((quarter, path, cusip_map, out_path, cik))
+
+    if jobs:
+        # workers=1 时在当前进程内处理（在线应用的后台刷新线程不宜 fork）
+        pool = ProcessPoolExecutor(max_workers=workers) if workers != 1 else None
+        try:
+            results = pool.map(_process_quarter, jobs) if pool else map(_process_quarter, jobs)
+            for quarter, n_rows, unmapped in results:
+                if unmapped:
+                    logger.info("%s: %d positions (%d unmapped CUSIPs)", quarter, n_rows, len(unmapped))
+                else:
+                    logger.info("%s: %d positions", quarter, n_rows)
+        finally:
+            if pool:
+                pool.shutdown()
+        save_manifest(src_dir, manifest)
+        merge_holdings(set(sources), out_dir, dest)
+    return [job[0] for job in jobs]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest SEC 13F information tables into data/holdings.csv")
+    parser.add_argument("--src", default=SOURCE_DIR, help="directory with per-quarter 13F sources (2024Q4.xml, 2024Q4.tsv or an SEC data set in 2024Q4/)")
+    parser.add_argument("--cusip-map", default=CUSIP_MAP_FILE, help="CSV with CUSIP,Ticker columns")
+    parser.add_argument("--out", default=QUARTER_DIR, help="directory for per-quarter outputs")
+    parser.add_argument("--dest", default=portfolio_data.HOLDINGS_CSV, help="merged holdings CSV")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size")
+    parser.add_argument("--force", action="store_true", help="reprocess every quarter")
+    parser.add_argument("--filer", default=None, help="filer id; defaults --src/--out/--dest to per-filer paths")
+    parser.add_argument("--name", default=None, help="filer display name (English), stored in data/filers.json")
+    parser.add_argument("--name-zh", default=None, help="filer display name (Chinese)")
+    parser.add_argument("--cik", default=None, help="filer SEC CIK (selects its filings from SEC data set directories)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    import filer_store
+    if args.filer:
+        if args.src == SOURCE_DIR:
+            args.src = os.path.join(SOURCE_DIR, args.filer)
+        if args.out == QUARTER_DIR:
+            args.out = os.path.join(QUARTER_DIR, args.filer)
+        if args.dest == portfolio_data.HOLDINGS_CSV:
+            args.dest = filer_store.filer_holdings_path(args.filer)
+        os.makedirs(os.path.dirname(args.dest), exist_ok=True)
+        filer_store.register_filer(args.filer, args.name, args.name_zh, args.cik)
+
+    cik = args.cik or filer_store.load_registry().get(args.filer or filer_store.DEFAULT_FILER, {}).get("cik")
+    changed = ingest(args.src, args.cusip_map, args.out, args.workers, args.force, args.dest, cik)
+    if changed:
+        portfolio_data.build_snapshot(args.dest, portfolio_data.snapshot_path_for(args.dest))
+        print(f"updated {len(changed)} quarter(s); snapshot rebuilt")
+    else:
+        print("no changed quarters")
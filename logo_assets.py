@@ -0,0 +1,139 @@
+"""
+自托管 Logo：构建时从本地目录读取每只股票的 Logo，打包成一个 data-URI 资源包（附内容哈希），
+页面只注入一段 CSS，表格行引用 CSS 类，不再请求任何第三方地址。
+
+Logo 源文件放在 DATA_DIR/logos/（默认 data/logos/），文件名为 Ticker 或域名，例如 AAPL.png、coca-colacompany.com.svg。
+
+构建资源包：
+    python logo_assets.py build
+
+仓库不附带 Logo 图片，默认检出时所有股票显示首字母徽标。原先页面运行时从 Google Favicon 服务加载的图标
+可以在构建时一次性下载到源目录（按域名命名，见 portfolio_data.logo_domain_map）并重建资源包，之后页面不再访问外部地址：
+    python logo_assets.py fetch
+"""
+import base64
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+import urllib.error
+import urllib.request
+
+import portfolio_data
+
+LOGO_SOURCE_DIR = os.path.join(portfolio_data.DATA_DIR, "logos")
+LOGO_BUNDLE_FILE = os.path.join(portfolio_data.DATA_DIR, "logo_bundle.json")
+
+FAVICON_URL = "https://www.google.com/s2/favicons?domain={domain}&sz={size}"
+
+MIME_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".svg": "image/svg+xml",
+    ".ico": "image/x-icon",
+    ".webp": "image/webp",
+}
+
+
+def css_class(ticker):
+    return "logo-" + re.sub(r"[^A-Za-z0-9_-]", "_", ticker)
+
+
+def build_logo_bundle(src_dir=LOGO_SOURCE_DIR, dest=LOGO_BUNDLE_FILE, domain_map=None):
+    """扫描源目录生成 {ticker: data_uri}；按域名命名的文件通过 domain_map 反查 Ticker"""
+    ticker_by_domain = {domain.lower(): ticker for ticker, domain in (domain_map or {}).items()}
+    logos = {}
+    if os.path.isdir(src_dir):
+        for name in sorted(os.listdir(src_dir)):
+            stem, ext = os.path.splitext(name)
+            mime = MIME_TYPES.get(ext.lower())
+            if mime is None:
+                continue
+            ticker = ticker_by_domain.get(stem.lower(), stem.upper())
+            with open(os.path.join(src_dir, name), "rb") as f:
+                payload = base64.b64encode(f.read()).decode("ascii")
+            # 同一 Ticker 有多个文件时以 Ticker 命名的优先
+            if ticker not in logos or stem.upper() == ticker:
+                logos[ticker] = f"data:{mime};base64,{payload}"
+
+    body = json.dumps(logos, sort_keys=True, separators=(",", ":"))
+    bundle = {"hash": hashlib.sha256(body.encode("utf-8")).hexdigest()[:16], "logos": logos}
+    tmp_path = f"{dest}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(bundle, f, sort_keys=True, separators=(",", ":"))
+    os.replace(tmp_path, dest)
+    return bundle
+
+
+def fetch_logos(domain_map, src_dir=LOGO_SOURCE_DIR, size=64, timeout=10):
+    """
+    构建时下载 domain_map 中各域名的图标到 src_dir/<域名>.png（已有 Ticker 或域名命名的文件则跳过）。
+    返回 (下载数, 失败的域名列表)
+    """
+    os.makedirs(src_dir, exist_ok=True)
+    existing = {os.path.splitext(name)[0].lower() for name in os.listdir(src_dir)}
+    fetched, failed = 0, []
+    for ticker, domain in sorted(domain_map.items()):
+        if ticker.lower() in existing or domain.lower() in existing:
+            continue
+        try:
+            with urllib.request.urlopen(FAVICON_URL.format(domain=domain, size=size), timeout=timeout) as resp:
+                data = resp.read()
+        except (urllib.error.URLError, OSError):
+            failed.append(domain)
+            continue
+        with open(os.path.join(src_dir, f"{domain}.png"), "wb") as f:
+            f.write(data)
+        existing.add(domain.lower())
+        fetched += 1
+    return fetched, failed
+
+
+def load_logo_bundle(path=LOGO_BUNDLE_FILE, domain_map=None):
+    """读取资源包；不存在时先构建"""
+    if not os.path.exists(path):
+        return build_logo_bundle(dest=path, domain_map=domain_map)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def logo_html(ticker, bundle):
+    """表格中的 Logo 占位：有本地 Logo 时引用 CSS 类，否则显示首字母徽标"""
+    if ticker in bundle["logos"]:
+        return f'<span class="ref-logo {css_class(ticker)}" role="img" aria-label="{html.escape(ticker)}"></span>'
+    return f'<span class="ref-logo ref-logo-fallback">{html.escape(ticker[:1])}</span>'
+
+
+def logo_css(bundle, tickers=None):
+    """
+    Logo 样式；首行注释记录资源包哈希，便于核对页面使用的版本。
+    tickers 给定时只输出这些股票的规则（分页表格只发送当前页用到的 Logo）
+    """
+    rules = [
+        f"/* logo bundle {bundle['hash']} */",
+        ".ref-logo {display: inline-block; width: 30px; height: 30px; border-radius: 5px; "
+        "vertical-align: middle; margin-right: 8px; background-size: contain; "
+        "background-repeat: no-repeat; background-position: center;}",
+        ".ref-logo-fallback {background: #e5e7eb; color: #374151; font-weight: 700; "
+        "text-align: center; line-height: 30px;}",
+    ]
+    logos = bundle["logos"]
+    items = sorted(logos.items()) if tickers is None else [(tk, logos[tk]) for tk in tickers if tk in logos]
+    for ticker, uri in items:
+        rules.append(f".{css_class(ticker)} {{background-image: url('{uri}');}}")
+    return "<style>\n" + "\n".join(rules) + "\n</style>"
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "fetch":
+        fetched, failed = fetch_logos(portfolio_data.logo_domain_map)
+        print(f"downloaded {fetched} logo(s) to {LOGO_SOURCE_DIR}" + (f"; failed: {', '.join(failed)}" if failed else ""))
+    if len(sys.argv) > 1 and sys.argv[1] in ("build", "fetch"):
+        bundle = build_logo_bundle(domain_map=portfolio_data.logo_domain_map)
+        print(f"{len(bundle['logos'])} logos bundled (hash {bundle['hash']}) -> {LOGO_BUNDLE_FILE}")
+    else:
+        print(__doc__)
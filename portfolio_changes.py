@@ -0,0 +1,163 @@
+"""
+持仓变动分析：在 季度 × 股票 矩阵上整体向量化计算（每个数据集只算一次，随 PortfolioDataset 共享）。
+
+- 相邻两个披露季度之间的持股变化 (百万股)
+- 估计净买入 / 卖出金额：持股变化 × 两期估计成交价均值（每股价格 = 市值 / 持股数）；
+  新建仓只有本期价格，清仓只有上期价格
+- 换手率：min(买入, 卖出) / 两期组合市值均值
+- 集中度：HHI (Σ 权重²) 与前 5 大持仓合计占比
+- 新建仓 / 清仓
+
+说明：13F 只披露季末持仓，金额为估算；拆股会表现为持股数跳变，第一个季度没有上一期可比，不计变动。
+"""
+import numpy as np
+import pandas as pd
+
+TOP_K = 5
+# 每只股票每个季度的动作编码（界面按语言翻译）
+ACTIONS = np.array(['hold', 'new', 'add', 'trim', 'exit'], dtype=object)
+
+
+def _shift(matrix, fill=0):
+    """沿季度轴下移一行（上一期），首行填充 fill"""
+    prev = np.empty_like(matrix)
+    prev[0] = fill
+    prev[1:] = matrix[:-1]
+    return prev
+
+
+class PortfolioChanges:
+    # 逐股票矩阵及新增列（追加季度时新出现的股票）在已有季度上的填充值
+    MATRICES = {'share_delta': 0.0, 'share_change_pct': np.nan, 'flow': 0.0, 'new': False, 'exited': False, 'action': 0}
+
+    def __init__(self, cube, previous=None, keep=0):
+        """previous 为追加季度之前的分析结果时，只计算第 keep 个季度及之后的行，前面的行直接沿用"""
+        self.cube = cube
+        start = keep if previous is not None else 0
+        tail = self._compute(cube, start)
+        if previous is None:
+            matrices = tail
+        else:
+            col = np.searchsorted(cube.tickers, previous.cube.tickers)
+            matrices = {}
+            for name, fill in self.MATRICES.items():
+                head = np.full((keep, len(cube.tickers)), fill, dtype=tail[name].dtype)
+                head[:, col] = getattr(previous, name)[:keep]
+                matrices[name] = np.vstack([head, tail[name]])
+        for name, arr in matrices.items():
+            arr.flags.writeable = False
+            setattr(self, name, arr)
+
+        self._ticker_pos = {tk: i for i, tk in enumerate(cube.tickers)}
+        if previous is None:
+            self.quarterly = self._quarterly(None)
+        else:
+            self.quarterly = pd.concat(
+                [previous.quarterly.iloc[:keep], self._quarterly(None, start)], ignore_index=True
+            )
+
+    @staticmethod
+    def _compute(cube, start):
+        """第 start 个季度及之后的逐股票变动；start > 0 时以第 start - 1 个季度为上一期"""
+        lo = max(start - 1, 0)
+        value, shares, held = cube.value[lo:], cube.shares[lo:], cube.held[lo:]
+        prev_held = _shift(held, False)
+
+        share_delta = shares - _shift(shares)
+        share_delta[0] = 0.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            price = np.where(shares > 0, value / shares, np.nan)
+            share_change_pct = np.where(prev_held & held, share_delta / _shift(shares) * 100, np.nan)
+        prev_price = _shift(price, np.nan)
+        trade_price = np.where(
+            np.isnan(price), prev_price, np.where(np.isnan(prev_price), price, (price + prev_price) / 2)
+        )
+        # 估计成交金额（十亿美元）：正为买入，负为卖出
+        flow = np.nan_to_num(share_delta * trade_price)
+
+        new = held & ~prev_held
+        new[0] = False
+        exited = ~held & prev_held
+        action = np.select(
+            [new, exited, share_delta > 0, share_delta < 0], [1, 4, 2, 3], 0
+        ).astype(np.int8)  # 下标对应 ACTIONS
+        matrices = {'share_delta': share_delta, 'share_change_pct': share_change_pct, 'flow': flow,
+                    'new': new, 'exited': exited, 'action': action}
+        # 窗口第一行只作为上一期
+        return {name: arr[start - lo:] for name, arr in matrices.items()}
+
+    # ------------------------------------------------------------------ 组合层面（每季度一行）
+    def _quarterly(self, ticker_mask, start=0):
+        cube = self.cube
+        lo = max(start - 1, 0)
+        cols = slice(None) if ticker_mask is None else ticker_mask
+        value = cube.value[lo:, cols]
+        flow = self.flow[lo:, cols]
+
+        buys = np.where(flow > 0, flow, 0.0).sum(axis=1)
+        sells = -np.where(flow < 0, flow, 0.0).sum(axis=1)
+        total = value.sum(axis=1)
+        avg_total = (total + _shift(total)) / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            turnover = np.where(avg_total > 0, np.minimum(buys, sells) / avg_total, np.nan)
+            weights = value / total[:, None]
+        turnover[0] = np.nan
+        weights = np.nan_to_num(weights)
+        k = min(TOP_K, weights.shape[1])
+        top_k = -np.partition(-weights, k - 1, axis=1)[:, :k].sum(axis=1) if k else np.zeros(len(total))
+
+        frame = pd.DataFrame({
+            'Date': cube.dates[lo:],
+            'Quarter': cube.quarters[lo:],
+            'Total_Value_Billions': total,
+            'Buys_Billions': buys,
+            'Sells_Billions': sells,
+            'Net_Flow_Billions': buys - sells,
+            'Turnover_Pct': turnover * 100,
+            'HHI': (weights ** 2).sum(axis=1),
+            'Top5_Share_Pct': top_k * 100,
+            'Positions': cube.held[lo:, cols].sum(axis=1),
+            'New_Positions': self.new[lo:, cols].sum(axis=1),
+            'Exited_Positions': self.exited[lo:, cols].sum(axis=1),
+        })
+        return frame.iloc[start - lo:].reset_index(drop=True)
+
+    def quarter_frame(self, i0, i1, ticker_mask=None):
+        """[i0, i1) 季度的组合变动汇总；ticker_mask 为部分股票时按该子组合重新计算"""
+        if ticker_mask is None or ticker_mask.all():
+            return self.quarterly.iloc[i0:i1]
+        return self._quarterly(ticker_mask).iloc[i0:i1]
+
+    # ------------------------------------------------------------------ 个股层面
+    def ticker_frame(self, ticker, i0, i1):
+        """单只股票的逐季变动：持有或清仓的季度 (Date, Quarter, Shares_Millions, Share_Delta_Millions,
+        Share_Change_Pct, Flow_Billions, Action)"""
+        j = self._ticker_pos[ticker]
+        cube = self.cube
+        rows = np.flatnonzero(cube.held[i0:i1, j] | self.exited[i0:i1, j]) + i0
+        return pd.DataFrame({
+            'Date': cube.dates[rows],
+            'Quarter': cube.quarters[rows],
+            'Shares_Millions': cube.shares[rows, j],
+            'Share_Delta_Millions': self.share_delta[rows, j],
+            'Share_Change_Pct': self.share_change_pct[rows, j],
+            'Flow_Billions': self.flow[rows, j],
+            'Action': ACTIONS[self.action[rows, j]],
+        })
+
+    def activity_frame(self, q, names, ticker_mask=None):
+        """第 q 个季度有变动的股票，按估计金额绝对值降序 (Ticker, Name, Action, Share_Delta_Millions,
+        Share_Change_Pct, Flow_Billions)；names 为按股票编码索引的显示名"""
+        changed = self.action[q] > 0
+        if ticker_mask is not None:
+            changed &= ticker_mask
+        cols = np.flatnonzero(changed)
+        cols = cols[np.argsort(-np.abs(self.flow[q, cols]), kind='stable')]
+        return pd.DataFrame({
+            'Ticker': self.cube.tickers[cols],
+            'Name': np.asarray(names, dtype=object)[cols],
+            'Action': ACTIONS[self.action[q, cols]],
+            'Share_Delta_Millions': self.share_delta[q, cols],
+            'Share_Change_Pct': self.share_change_pct[q, cols],
+            'Flow_Billions': self.flow[q, cols],
+        })
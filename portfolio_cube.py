@@ -0,0 +1,147 @@
+"""
+季度 × 股票 稠密矩阵 (NumPy)，以及 季度 × 行业 汇总和市值沿时间轴的前缀和。
+
+时间范围筛选 -> searchsorted 得到季度下标区间；行业筛选 -> 行业布尔向量；
+区间市值合计（Top N 排序用）-> 前缀和相减，O(1)。
+"""
+import numpy as np
+import pandas as pd
+
+import portfolio_data
+
+LANG_KEYS = ('en', 'zh')
+
+
+class HoldingsCube:
+    def __init__(self, df, version=""):
+        """df 必须按 Date 升序排列（load_data 返回的快照即如此）；version 为数据集版本（源数据哈希）"""
+        self.version = version
+        date_codes, dates = pd.factorize(df['Date'], sort=True)
+        ticker_codes, tickers = pd.factorize(df['Ticker'], sort=True)
+        quarter_by_date = df.drop_duplicates('Date').set_index('Date')['Quarter']
+
+        self.dates = dates.values
+        self.quarters = quarter_by_date.reindex(dates).to_numpy()
+        self.tickers = np.asarray(tickers, dtype=object)
+
+        # 行业：固定顺序的 key 列表 + 每种语言的显示名
+        self.sector_keys = list(portfolio_data.sector_map)
+        sector_pos = {key: i for i, key in enumerate(self.sector_keys)}
+        self.ticker_sector = np.array(
+            [sector_pos[portfolio_data.ticker_sector_map.get(tk, 'Others')] for tk in self.tickers], dtype=np.int16
+        )
+        self.sector_labels = {
+            lk: np.array([portfolio_data.sector_map[k][lk] for k in self.sector_keys], dtype=object) for lk in LANG_KEYS
+        }
+
+        shape = (len(self.dates), len(self.tickers))
+        self.value = np.zeros(shape)
+        self.shares = np.zeros(shape)
+        self.weight = np.zeros(shape)
+        self.held = np.zeros(shape, dtype=bool)
+        np.add.at(self.value, (date_codes, ticker_codes), df['Value_Billions'].to_numpy(dtype=float))
+        np.add.at(self.shares, (date_codes, ticker_codes), df['Shares_Millions'].to_numpy(dtype=float))
+        np.add.at(self.weight, (date_codes, ticker_codes), df['Percent_Portfolio'].to_numpy(dtype=float))
+        self.held[date_codes, ticker_codes] = True
+
+        # 季度 × 行业 汇总
+        n_sectors = len(self.sector_keys)
+        sector_onehot = np.zeros((len(self.tickers), n_sectors))
+        sector_onehot[np.arange(len(self.tickers)), self.ticker_sector] = 1.0
+        self.sector_value = self.value @ sector_onehot
+        self.sector_held = (self.held @ sector_onehot) > 0
+
+        # 市值沿时间轴的前缀和（首行补 0，区间 [i0, i1) 合计 = cum[i1] - cum[i0]）
+        self.value_cumsum = np.vstack([np.zeros((1, shape[1])), np.cumsum(self.value, axis=0)])
+
+        # 长表的行 -> (季度偏移, 行业) 索引，用于把筛选结果映射回原 DataFrame 的行
+        self.row_offsets = np.searchsorted(date_codes, np.arange(len(self.dates) + 1))
+        self.row_sector = self.ticker_sector[ticker_codes]
+
+    # ------------------------------------------------------------------ 追加季度
+    def extended(self, df_new, keep, version=""):
+        """
+        保留前 keep 个季度，追加 df_new 中的季度（须按 Date 升序且都晚于保留部分），返回新的 cube。
+        只聚合新季度的行；已有季度的矩阵行、行业汇总和前缀和按列位置搬移，不重新计算。
+        """
+        cube = object.__new__(HoldingsCube)
+        cube.version = version
+        date_codes, new_dates = pd.factorize(df_new['Date'], sort=True)
+        new_ticker_values = df_new['Ticker'].to_numpy(dtype=object)
+        cube.tickers = np.union1d(self.tickers, new_ticker_values).astype(object)
+        col = np.searchsorted(cube.tickers, self.tickers)
+        ticker_codes = np.searchsorted(cube.tickers, new_ticker_values)
+        quarter_by_date = df_new.drop_duplicates('Date').set_index('Date')['Quarter']
+        cube.dates = np.concatenate([self.dates[:keep], new_dates.values])
+        cube.quarters = np.concatenate([self.quarters[:keep], quarter_by_date.reindex(new_dates).to_numpy()])
+
+        cube.sector_keys = self.sector_keys
+        cube.sector_labels = self.sector_labels
+        sector_pos = {key: i for i, key in enumerate(self.sector_keys)}
+        cube.ticker_sector = np.array(
+            [sector_pos[portfolio_data.ticker_sector_map.get(tk, 'Others')] for tk in cube.tickers], dtype=np.int16
+        )
+        cube.ticker_sector[col] = self.ticker_sector
+
+        shape = (len(cube.dates), len(cube.tickers))
+
+        def grow(old, dtype=float):
+            matrix = np.zeros(shape, dtype=dtype)
+            matrix[:keep, col] = old[:keep]
+            return matrix
+
+        rows = date_codes + keep
+        cube.value, cube.shares, cube.weight = grow(self.value), grow(self.shares), grow(self.weight)
+        cube.held = grow(self.held, bool)
+        np.add.at(cube.value, (rows, ticker_codes), df_new['Value_Billions'].to_numpy(dtype=float))
+        np.add.at(cube.shares, (rows, ticker_codes), df_new['Shares_Millions'].to_numpy(dtype=float))
+        np.add.at(cube.weight, (rows, ticker_codes), df_new['Percent_Portfolio'].to_numpy(dtype=float))
+        cube.held[rows, ticker_codes] = True
+
+        n_sectors = len(cube.sector_keys)
+        sector_onehot = np.zeros((shape[1], n_sectors))
+        sector_onehot[np.arange(shape[1]), cube.ticker_sector] = 1.0
+        cube.sector_value = np.vstack([self.sector_value[:keep], cube.value[keep:] @ sector_onehot])
+        cube.sector_held = np.vstack([self.sector_held[:keep], (cube.held[keep:] @ sector_onehot) > 0])
+
+        cube.value_cumsum = np.zeros((shape[0] + 1, shape[1]))
+        cube.value_cumsum[:keep + 1, col] = self.value_cumsum[:keep + 1]
+        cube.value_cumsum[keep + 1:] = cube.value_cumsum[keep] + np.cumsum(cube.value[keep:], axis=0)
+
+        kept_rows = self.row_offsets[keep]
+        cube.row_offsets = np.concatenate([
+            self.row_offsets[:keep], np.searchsorted(date_codes, np.arange(len(new_dates) + 1)) + kept_rows
+        ])
+        cube.row_sector = np.concatenate([self.row_sector[:kept_rows], cube.ticker_sector[ticker_codes]])
+        return cube
+
+    # ------------------------------------------------------------------ 筛选
+    def date_index_range(self, start, end):
+        """闭区间 [start, end] -> 季度下标半开区间 [i0, i1)"""
+        i0 = int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start)), side='left'))
+        i1 = int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end)), side='right'))
+        return i0, i1
+
+    def sector_selection(self, labels, lang_key):
+        return np.isin(self.sector_labels[lang_key], list(labels))
+
+    def row_positions(self, i0, i1, sector_sel):
+        """筛选后的行在长表中的位置（长表按季度连续存放，时间筛选即切片）"""
+        r0, r1 = self.row_offsets[i0], self.row_offsets[i1]
+        return np.flatnonzero(sector_sel[self.row_sector[r0:r1]]) + r0
+
+    # ------------------------------------------------------------------ 聚合
+    def range_sum(self, i0, i1):
+        """每只股票在 [i0, i1) 季度区间内的市值合计"""
+        return self.value_cumsum[i1] - self.value_cumsum[i0]
+
+    def sector_frame(self, i0, i1, sector_sel, lang_key):
+        """季度 × 行业 汇总的长表 (Date, Quarter, Sector, Value_Billions)，只包含有持仓的组合"""
+        q_idx, s_idx = np.nonzero(self.sector_held[i0:i1] & sector_sel)
+        q_idx = q_idx + i0
+        return pd.DataFrame({
+            'Date': self.dates[q_idx],
+            'Quarter': self.quarters[q_idx],
+            'Sector': self.sector_labels[lang_key][s_idx],
+            'Value_Billions': self.sector_value[q_idx, s_idx],
+        }).sort_values(['Date', 'Sector'], ignore_index=True)
@@ -0,0 +1,268 @@
+"""
+伯克希尔持仓数据层：源数据 (CSV) -> 预计算列 -> Arrow IPC 列式快照 (内存映射读取)
+
+构建快照：
+    python portfolio_data.py build
+"""
+import hashlib
+import os
+import sys
+
+import pandas as pd
+import pyarrow as pa
+
+# 可通过环境变量指向其他数据目录（如基准测试的合成数据）
+DATA_DIR = os.environ.get("PORTFOLIO_DATA_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+HOLDINGS_CSV = os.path.join(DATA_DIR, "holdings.csv")
+SNAPSHOT_FILE = os.path.join(DATA_DIR, "holdings.arrow")
+
+HOLDING_COLUMNS = ['Quarter', 'Ticker', 'Shares_Millions', 'Value_Billions', 'Percent_Portfolio']
+
+# -----------------------------------------------------------------------------
+# 参考数据
+# -----------------------------------------------------------------------------
+# 核心映射数据：全名映射（中英文）
+full_name_map = {
+    'AAPL': {'en': 'Apple Inc.', 'zh': '苹果公司'},
+    'AXP': {'en': 'American Express Company', 'zh': '美国运通公司'},
+    'BAC': {'en': 'Bank of America Corporation', 'zh': '美国银行'},
+    'KO': {'en': 'The Coca-Cola Company', 'zh': '可口可乐公司'},
+    'CVX': {'en': 'Chevron Corporation', 'zh': '雪佛龙公司'},
+    'OXY': {'en': 'Occidental Petroleum Corporation', 'zh': '西方石油公司'},
+    'MCO': {'en': 'Moody\'s Corporation', 'zh': '穆迪公司'},
+    'KHC': {'en': 'The Kraft Heinz Company', 'zh': '卡夫亨氏公司'},
+    'CB': {'en': 'Chubb Limited', 'zh': '丘博保险'},
+    'GOOGL': {'en': 'Alphabet Inc. (Google)', 'zh': '字母表公司 (谷歌)'},
+    'DVA': {'en': 'DaVita Inc.', 'zh': '达维塔公司'},
+    'KR': {'en': 'The Kroger Co.', 'zh': '克罗格公司'},
+    'DPZ': {'en': 'Domino\'s Pizza, Inc.', 'zh': '达美乐披萨'},
+    'POOL': {'en': 'Pool Corporation', 'zh': '普尔公司'},
+    'IBM': {'en': 'International Business Machines Corp.', 'zh': 'IBM公司'},
+    'WFC': {'en': 'Wells Fargo & Company', 'zh': '富国银行'},
+    'PG': {'en': 'The Procter & Gamble Company', 'zh': '宝洁公司'},
+    'VZ': {'en': 'Verizon Communications Inc.', 'zh': '威瑞森通信'},
+    'USB': {'en': 'U.S. Bancorp', 'zh': '美国合众银行'},
+    'JPM': {'en': 'JPMorgan Chase & Co.', 'zh': '摩根大通'},
+    'C': {'en': 'Citigroup Inc.', 'zh': '花旗集团'},
+    'V': {'en': 'Visa Inc.', 'zh': '维萨公司'},
+    'MA': {'en': 'Mastercard Incorporated', 'zh': '万事达卡公司'},
+    'AMZN': {'en': 'Amazon.com, Inc.', 'zh': '亚马逊公司'},
+    'ATVI': {'en': 'Activision Blizzard', 'zh': '动视暴雪'},
+    'HPQ': {'en': 'HP Inc.', 'zh': '惠普公司'},
+    'PARA': {'en': 'Paramount Global', 'zh': '派拉蒙全球'},
+    'WPO': {'en': 'The Washington Post Company', 'zh': '华盛顿邮报公司'},
+    'G': {'en': 'The Gillette Company', 'zh': '吉列公司'},
+    'COP': {'en': 'ConocoPhillips', 'zh': '康菲石油公司'},
+    'KFT': {'en': 'Kraft Foods', 'zh': '卡夫食品'},
+    'WSC': {'en': 'Wesco Financial', 'zh': '韦斯科金融公司'},
+    'BNI': {'en': 'BNSF Railway Co.', 'zh': 'BNSF铁路公司'},
+    'PSX': {'en': 'Phillips 66', 'zh': '菲利普斯66公司'},
+    'TSM': {'en': 'Taiwan Semiconductor (TSM)', 'zh': '台积电'},
+    'UNH': {'en': 'UnitedHealth Group', 'zh': '联合健康集团'},
+    'JNJ': {'en': 'Johnson & Johnson', 'zh': '强生公司'},
+    'SNOW': {'en': 'Snowflake Inc.', 'zh': '雪花公司'},
+    'VRSN': {'en': 'VeriSign Inc.', 'zh': '威瑞信公司'},
+    'BK': {'en': 'Bank of New York Mellon Corporation', 'zh': '纽约梅隆银行'},
+    'WMT': {'en': 'Walmart Inc.', 'zh': '沃尔玛公司'},
+    'COST': {'en': 'Costco Wholesale Corporation', 'zh': '开市客公司'},
+    'BUD': {'en': 'Anheuser-Busch InBev SA/NV', 'zh': '百威英博'},
+    'DIS': {'en': 'The Walt Disney Company', 'zh': '迪士尼公司'},
+    'CHTR': {'en': 'Charter Communications Inc.', 'zh': '特许通信公司'},
+    'XOM': {'en': 'Exxon Mobil Corporation', 'zh': '埃克森美孚公司'},
+    'DAL': {'en': 'Delta Air Lines Inc.', 'zh': '达美航空公司'},
+    'LUV': {'en': 'Southwest Airlines Co.', 'zh': '西南航空公司'},
+    'UAL': {'en': 'United Airlines Holdings Inc.', 'zh': '联合航空控股公司'},
+    'AAL': {'en': 'American Airlines Group Inc.', 'zh': '美国航空集团'},
+    'ABBV': {'en': 'AbbVie Inc.', 'zh': '艾伯维公司'},
+    'MRK': {'en': 'Merck & Co. Inc.', 'zh': '默克公司'},
+    'HRB': {'en': 'H&R Block Inc.', 'zh': 'H&R布洛克公司'},
+    'MTB': {'en': 'M&T Bank Corporation', 'zh': 'M&T银行'}
+}
+
+# 行业映射（中英文）
+sector_map = {
+    'Technology': {'en': 'Technology', 'zh': '科技'},
+    'Financials': {'en': 'Financials', 'zh': '金融'},
+    'Consumer Staples': {'en': 'Consumer Staples', 'zh': '必选消费'},
+    'Consumer Discretionary': {'en': 'Consumer Discretionary', 'zh': '可选消费'},
+    'Comm/Media': {'en': 'Comm/Media', 'zh': '通信/媒体'},
+    'Energy': {'en': 'Energy', 'zh': '能源'},
+    'Industrials': {'en': 'Industrials', 'zh': '工业'},
+    'Healthcare': {'en': 'Healthcare', 'zh': '医疗健康'},
+    'Others': {'en': 'Others', 'zh': '其他'}
+}
+
+# 股票行业映射
+ticker_sector_map = {
+    'AAPL': 'Technology', 'IBM': 'Technology', 'HPQ': 'Technology', 'SNOW': 'Technology', 'GOOGL': 'Technology', 'VRSN': 'Technology', 'ATVI': 'Technology', 'TSM': 'Technology',
+    'BAC': 'Financials', 'AXP': 'Financials', 'WFC': 'Financials', 'USB': 'Financials', 'C': 'Financials', 'JPM': 'Financials', 'MCO': 'Financials', 'BK': 'Financials', 'CB': 'Financials', 'MA': 'Financials', 'V': 'Financials', 'WSC': 'Financials', 'MTB': 'Financials',
+    'KO': 'Consumer Staples', 'KHC': 'Consumer Staples', 'KFT': 'Consumer Staples', 'PG': 'Consumer Staples', 'WMT': 'Consumer Staples', 'KR': 'Consumer Staples', 'COST': 'Consumer Staples', 'BUD': 'Consumer Staples',
+    'G': 'Consumer Discretionary', 'WPO': 'Comm/Media', 'DPZ': 'Consumer Discretionary', 'DIS': 'Comm/Media', 'CHTR': 'Comm/Media', 'PARA': 'Comm/Media', 'VZ': 'Comm/Media', 'POOL': 'Consumer Discretionary', 'HRB': 'Consumer Discretionary',
+    'CVX': 'Energy', 'OXY': 'Energy', 'XOM': 'Energy', 'COP': 'Energy', 'PSX': 'Energy',
+    'BNI': 'Industrials', 'DAL': 'Industrials', 'LUV': 'Industrials', 'UAL': 'Industrials', 'AAL': 'Industrials',
+    'DVA': 'Healthcare', 'JNJ': 'Healthcare', 'ABBV': 'Healthcare', 'MRK': 'Healthcare', 'UNH': 'Healthcare',
+}
+
+# Logo 域名映射（本地 Logo 文件可按域名命名，见 logo_assets.py）
+logo_domain_map = {
+    'AAPL': 'apple.com', 'AXP': 'americanexpress.com', 'BAC': 'bankofamerica.com',
+    'KO': 'coca-colacompany.com', 'CVX': 'chevron.com', 'OXY': 'oxy.com',
+    'MCO': 'moodys.com', 'KHC': 'kraftheinzcompany.com', 'CB': 'chubb.com',
+    'GOOGL': 'google.com', 'DVA': 'davita.com', 'KR': 'kroger.com',
+    'DPZ': 'dominos.com', 'POOL': 'poolcorp.com', 'IBM': 'ibm.com',
+    'WFC': 'wellsfargo.com', 'PG': 'pg.com', 'VZ': 'verizon.com',
+    'USB': 'usbank.com', 'JPM': 'jpmorganchase.com', 'C': 'citi.com',
+    'V': 'visa.com', 'MA': 'mastercard.com', 'AMZN': 'amazon.com',
+    'ATVI': 'activisionblizzard.com', 'HPQ': 'hp.com', 'PARA': 'paramount.com',
+    'WPO': 'washingtonpost.com', 'G': 'gillette.com', 'COP': 'conocophillips.com',
+    'KFT': 'kraftfoods.com', 'WSC': 'wesco.com', 'BNI': 'bnsf.com',
+    'PSX': 'phillips66.com', 'TSM': 'tsmc.com', 'UNH': 'unitedhealthgroup.com',
+    'JNJ': 'jnj.com', 'SNOW': 'snowflake.com', 'VRSN': 'verisign.com',
+    'BK': 'bnymellon.com', 'WMT': 'walmart.com', 'COST': 'costco.com',
+    'BUD': 'ab-inbev.com', 'DIS': 'disney.com', 'CHTR': 'charter.com',
+    'XOM': 'exxonmobil.com', 'DAL': 'delta.com', 'LUV': 'southwest.com',
+    'UAL': 'united.com', 'AAL': 'aa.com', 'ABBV': 'abbvie.com',
+    'MRK': 'merck.com', 'HRB': 'hrblock.com', 'MTB': 'mtb.com'
+}
+
+
+# -----------------------------------------------------------------------------
+# 快照构建
+# -----------------------------------------------------------------------------
+QUARTER_END = {'Q1': '03-31', 'Q2': '06-30', 'Q3': '09-30', 'Q4': '12-31'}
+
+
+def parse_quarter(q_str):
+    year, q = q_str.split(' ')
+    return f"{year}-{QUARTER_END[q]}"
+
+
+def file_digest(path):
+    """源文件内容哈希，用于判断快照是否过期"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def read_holdings(path=HOLDINGS_CSV):
+    return pd.read_csv(path, dtype={'Quarter': str, 'Ticker': str})[HOLDING_COLUMNS]
+
+
+def derive_columns(df, logo_bundle):
+    """预计算派生列：映射只按唯一值计算一次，再按行广播"""
+    import logo_assets  # logo_assets 从本模块取 DATA_DIR，延迟导入避免循环引用
+
+    df = df.copy()
+    quarters = pd.Series(df['Quarter'].unique())
+    quarter_dates = pd.Series(pd.to_datetime(quarters.map(parse_quarter)).values, index=quarters)
+    df['Date'] = df['Quarter'].map(quarter_dates)
+
+    tickers = df['Ticker'].unique()
+    lookup = pd.DataFrame(index=tickers)
+    sector_keys = [ticker_sector_map.get(tk, 'Others') for tk in tickers]
+    lookup['Sector_En'] = [sector_map[k]['en'] for k in sector_keys]
+    lookup['Sector_Zh'] = [sector_map[k]['zh'] for k in sector_keys]
+    lookup['Full_Name_En'] = [full_name_map.get(tk, {}).get('en', tk) for tk in tickers]
+    lookup['Full_Name_Zh'] = [full_name_map.get(tk, {}).get('zh', tk) for tk in tickers]
+    lookup['Logo_HTML'] = [logo_assets.logo_html(tk, logo_bundle) for tk in tickers]
+    for col in lookup.columns:
+        df[col] = df['Ticker'].map(lookup[col])
+
+    df = df.sort_values(by=['Date', 'Value_Billions'], ascending=[True, False])
+    return df.reset_index(drop=True)
+
+
+def quarter_digests(df):
+    """每个季度持仓内容的摘要（与行顺序无关）：源 CSV 与快照得到的结果相同，用于判断哪些季度变化了"""
+    cols = df[HOLDING_COLUMNS].astype({'Quarter': object, 'Ticker': object})
+    row_hash = pd.util.hash_pandas_object(cols, index=False).to_numpy()
+    sums = pd.Series(row_hash).groupby(cols['Quarter'].to_numpy()).sum()
+    return {str(q): int(v) for q, v in sums.items()}
+
+
+def write_snapshot(df, path, metadata=None):
+    """写入 Arrow IPC 文件（不压缩，便于内存映射零拷贝读取）；先写临时文件再原子替换"""
+    _write_table(pa.Table.from_pandas(df, preserve_index=False), path, metadata)
+
+
+def _write_table(table, path, metadata=None):
+    if metadata:
+        meta = dict(table.schema.metadata or {})
+        meta.update({k.encode(): str(v).encode() for k, v in metadata.items()})
+        table = table.replace_schema_metadata(meta)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def load_logo_bundle():
+    import logo_assets
+
+    return logo_assets.load_logo_bundle(domain_map=logo_domain_map)
+
+
+def snapshot_path_for(src):
+    """源 CSV 对应的快照路径（同目录、同名 .arrow）"""
+    return os.path.splitext(src)[0] + ".arrow"
+
+
+def build_snapshot(src=HOLDINGS_CSV, dest=SNAPSHOT_FILE):
+    logo_bundle = load_logo_bundle()
+    df = derive_columns(read_holdings(src), logo_bundle)
+    write_snapshot(df, dest, {"source_sha256": file_digest(src), "logo_bundle": logo_bundle["hash"]})
+    return dest
+
+
+def snapshot_metadata(path=SNAPSHOT_FILE):
+    with pa.memory_map(path, "r") as source:
+        meta = pa.ipc.open_file(source).schema.metadata or {}
+    return {k.decode(): v.decode() for k, v in meta.items()}
+
+
+def snapshot_is_fresh(src=HOLDINGS_CSV, dest=SNAPSHOT_FILE):
+    if not os.path.exists(dest):
+        return False
+    try:
+        meta = snapshot_metadata(dest)
+        return (meta.get("source_sha256") == file_digest(src)
+                and meta.get("logo_bundle") == load_logo_bundle()["hash"])
+    except (OSError, pa.ArrowInvalid):
+        return False
+
+
+def open_snapshot(path=SNAPSHOT_FILE):
+    """内存映射打开快照；数值列直接引用映射页，多个进程共享同一份操作系统页缓存"""
+    source = pa.memory_map(path, "r")
+    table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def extend_snapshot(dest, keep_rows, new_df, src):
+    """
+    追加式更新快照：保留旧快照的前 keep_rows 行（零拷贝切片，不重新派生），
+    拼接新季度已派生好的行，写入新文件后原子替换。已打开旧快照的会话继续读取旧文件。
+    """
+    with pa.memory_map(dest, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+        schema = table.schema.remove_metadata()
+        new_table = pa.Table.from_pandas(new_df[schema.names], schema=schema, preserve_index=False)
+        combined = pa.concat_tables([table.slice(0, keep_rows).replace_schema_metadata(None), new_table])
+        _write_table(combined, dest, {"source_sha256": file_digest(src), "logo_bundle": load_logo_bundle()["hash"]})
+    return dest
+
+
+def ensure_snapshot(src=HOLDINGS_CSV, dest=SNAPSHOT_FILE):
+    if not snapshot_is_fresh(src, dest):
+        build_snapshot(src, dest)
+    return dest
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "build":
+        print(f"snapshot written: {build_snapshot()}")
+    else:
+        print(__doc__)
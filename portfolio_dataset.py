@@ -0,0 +1,242 @@
+"""
+进程级共享的只读数据集：Ticker / 行业 / 名称以整数编码 (pandas Categorical) 存储，数值列为 float32，
+每种语言的显示名只是一组按编码索引的标签数组。
+
+切换语言 = 取另一份预先构建好的视图 (O(1))，不再对整表复制或逐行 apply。
+
+内存报告：
+    python portfolio_dataset.py report
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+import portfolio_data
+from portfolio_changes import PortfolioChanges
+from portfolio_cube import LANG_KEYS, HoldingsCube
+from reference_table import ReferenceIndex
+from search_index import SearchIndex
+
+NUMERIC_COLUMNS = ['Shares_Millions', 'Value_Billions', 'Percent_Portfolio']
+
+
+def _categorical(per_ticker_labels, ticker_codes):
+    """按 Ticker 编码展开标签；标签重复时共用同一个类别"""
+    label_codes, labels = pd.factorize(np.asarray(per_ticker_labels, dtype=object))
+    return pd.Categorical.from_codes(label_codes[ticker_codes], categories=labels)
+
+
+class PortfolioDataset:
+    def __init__(self, df, version="", lineage=None, cube=None, changes=None):
+        """
+        df 为快照 DataFrame（按 Date 升序）；构建后视为只读，由所有会话共享。
+        lineage 标识一条只追加季度的数据演进线（追加季度后保持不变，已有季度下标也不变），
+        图表缓存按 lineage + 季度区间作键，追加后未覆盖新季度的缓存仍然有效。
+        """
+        self.version = version
+        self.lineage = lineage or version
+        self.cube = cube if cube is not None else HoldingsCube(df, version=version)
+        for name, value in vars(self.cube).items():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+        # 持仓变动分析（买入 / 卖出 / 换手 / 集中度 / 新建仓与清仓），随数据集只算一次
+        self.changes = changes if changes is not None else PortfolioChanges(self.cube)
+        self.quarter_digests = portfolio_data.quarter_digests(df)
+
+        ticker_codes = pd.Categorical(df['Ticker'], categories=self.cube.tickers).codes
+        first_row = np.unique(ticker_codes, return_index=True)[1]
+        self.ticker_codes = ticker_codes
+        # 每只股票的行号（按日期升序）：个股分析只取目标股票的行，会话无需持有整张筛选结果
+        self.ticker_row_order = np.argsort(ticker_codes, kind='stable')
+        self.ticker_row_offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(ticker_codes, minlength=len(self.cube.tickers)))]
+        )
+
+        logo_html = df['Logo_HTML'].to_numpy()[first_row]
+        base = pd.DataFrame({
+            'Quarter': pd.Categorical(df['Quarter']),
+            'Ticker': pd.Categorical.from_codes(ticker_codes, categories=self.cube.tickers),
+            **{col: df[col].to_numpy(dtype=np.float32) for col in NUMERIC_COLUMNS},
+            'Date': df['Date'].to_numpy(),
+            'Logo_HTML': _categorical(logo_html, ticker_codes),
+        })
+
+        # 每种语言：按编码索引的标签数组 -> Categorical 列（共享同一组编码）
+        self.full_names = {}
+        self.logo_names = {}
+        self.views = {}
+        for lk in LANG_KEYS:
+            suffix = lk.capitalize()
+            names = df[f'Full_Name_{suffix}'].to_numpy()[first_row]
+            self.full_names[lk] = names
+            logo_names = np.array([f"{name} ({ticker})" for name, ticker in zip(names, self.cube.tickers)], dtype=object)
+            self.logo_names[lk] = logo_names
+            view = base.copy(deep=False)
+            view['Sector'] = pd.Categorical.from_codes(self.cube.row_sector, categories=self.cube.sector_labels[lk])
+            view['Full_Name'] = _categorical(names, ticker_codes)
+            view['Logo_Name'] = _categorical(logo_names, ticker_codes)
+            self.views[lk] = view
+        # 公司参考表：每种语言预先渲染的表格行 + 排序下标（Tab 4 只发送当前页）
+        self.reference = ReferenceIndex(self.cube, self.full_names, logo_html)
+        # 公司搜索（代码 / 英文名 / 中文名 / 拼音），侧边栏与 Tab 2 的选择框只显示前若干条匹配
+        self.search = SearchIndex(self.cube.tickers, self.full_names)
+        self._ticker_pos = {tk: i for i, tk in enumerate(self.cube.tickers)}
+
+    def extended(self, df, df_new, keep, version):
+        """
+        追加季度：df 为更新后的完整快照，df_new 为其中新增季度的行，keep 为保留的已有季度数。
+        矩阵和变动分析只计算新季度，语言视图按编码重新拼装；返回新对象，旧对象继续服务正在进行的重跑。
+        """
+        cube = self.cube.extended(df_new, keep, version=version)
+        changes = PortfolioChanges(cube, previous=self.changes, keep=keep)
+        return PortfolioDataset(df, version=version, lineage=self.lineage, cube=cube, changes=changes)
+
+    def view(self, lang_key):
+        """当前语言的只读视图（不得原地修改，所有会话共享）"""
+        return self.views[lang_key]
+
+    def filter(self, lang_key, i0, i1, sector_sel):
+        """时间 + 行业筛选；全部行业被选中时返回连续切片，不复制数据"""
+        view = self.views[lang_key]
+        if sector_sel.all():
+            r0, r1 = self.cube.row_offsets[i0], self.cube.row_offsets[i1]
+            return view.iloc[r0:r1]
+        return view.iloc[self.cube.row_positions(i0, i1, sector_sel)]
+
+    def ticker_frame(self, lang_key, tickers, i0, i1):
+        """一只或多只股票在季度区间 [i0, i1) 内的行（保持原表顺序，即按日期升序）"""
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        order, offsets = self.ticker_row_order, self.ticker_row_offsets
+        parts = [order[offsets[p]:offsets[p + 1]] for p in (self._ticker_pos[tk] for tk in tickers)]
+        rows = np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+        r0, r1 = self.cube.row_offsets[i0], self.cube.row_offsets[i1]
+        return self.views[lang_key].iloc[rows[(rows >= r0) & (rows < r1)]]
+
+    def universe_size(self, i0, i1, sector_sel):
+        """筛选范围内出现过的股票数量"""
+        return int(np.count_nonzero(self.ticker_mask(i0, i1, sector_sel)))
+
+    def ticker_label(self, ticker, lang_key, logo=False):
+        """股票代码 -> 当前语言的显示名（logo=True 时为 "名称 (代码)"）"""
+        labels = self.logo_names if logo else self.full_names
+        return labels[lang_key][self._ticker_pos[ticker]]
+
+    def ticker_mask(self, i0, i1, sector_sel):
+        """筛选范围内出现过的股票（按股票编码的布尔数组）"""
+        return self.cube.held[i0:i1].any(axis=0) & sector_sel[self.cube.ticker_sector]
+
+    def top_n_frame(self, lang_key, i0, i1, sector_sel, top_n, others_label, keep_tickers=(), max_traces=None):
+        """
+        大股票池的精简长表：每个季度的前 top_n 大持仓保留为独立系列，其余合并为一条 "Others"。
+        keep_tickers（如高亮的股票）始终保留；保留的系列总数不超过 max_traces（按区间市值合计排序，
+        区间合计由前缀和 O(1) 得到）。返回列：Date, Quarter, Ticker, Logo_Name, Value_Billions, Percent_Portfolio
+        """
+        cube = self.cube
+        in_sector = sector_sel[cube.ticker_sector]
+        held = cube.held[i0:i1] & in_sector
+        value = np.where(held, cube.value[i0:i1], 0.0)
+        weight = np.where(held, cube.weight[i0:i1], 0.0)
+        n_tickers = value.shape[1]
+        max_traces = max_traces or top_n * 2
+
+        keep = np.zeros(n_tickers, dtype=bool)
+        k = min(top_n, n_tickers)
+        if k and len(value):
+            top_idx = np.argpartition(-value, k - 1, axis=1)[:, :k]
+            # 只计入该季度确有持仓的位置（持仓少于 top_n 的季度会选到空位）
+            keep[top_idx[np.take_along_axis(held, top_idx, axis=1)]] = True
+        keep &= held.any(axis=0)
+        if keep.sum() > max_traces:
+            range_value = np.where(keep, cube.range_sum(i0, i1) * in_sector, -np.inf)
+            capped = np.zeros(n_tickers, dtype=bool)
+            capped[np.argsort(-range_value)[:max_traces]] = True
+            keep &= capped
+        forced = np.isin(cube.tickers, list(keep_tickers))
+        keep |= forced & held.any(axis=0)
+
+        q_idx, t_idx = np.nonzero(held & keep)
+        # 与原长表一致：按日期升序、同日期按市值降序，保证系列顺序（颜色）稳定
+        order = np.lexsort((-value[q_idx, t_idx], q_idx))
+        q_idx, t_idx = q_idx[order], t_idx[order]
+        frame = pd.DataFrame({
+            'Date': cube.dates[q_idx + i0],
+            'Quarter': cube.quarters[q_idx + i0],
+            'Ticker': cube.tickers[t_idx],
+            'Logo_Name': self.logo_names[lang_key][t_idx],
+            'Value_Billions': value[q_idx, t_idx],
+            'Percent_Portfolio': weight[q_idx, t_idx],
+        })
+
+        tail = held & ~keep
+        tail_quarters = np.flatnonzero(tail.any(axis=1))
+        if len(tail_quarters):
+            others = pd.DataFrame({
+                'Date': cube.dates[tail_quarters + i0],
+                'Quarter': cube.quarters[tail_quarters + i0],
+                'Ticker': others_label,
+                'Logo_Name': others_label,
+                'Value_Billions': np.where(tail, value, 0.0).sum(axis=1)[tail_quarters],
+                'Percent_Portfolio': np.where(tail, weight, 0.0).sum(axis=1)[tail_quarters],
+            })
+            frame = pd.concat([frame, others]).sort_values('Date', kind='stable', ignore_index=True)
+        return frame
+
+    # ------------------------------------------------------------------ 内存
+    def shared_bytes(self):
+        """整个进程只需一份的内存（两种语言视图 + 矩阵 + 变动分析 + 参考表）；共享的底层数组只计一次"""
+        seen = {}
+        for view in self.views.values():
+            for col in view.columns:
+                arr = view[col].array
+                if isinstance(arr, pd.Categorical):
+                    seen[id(arr.codes.base if arr.codes.base is not None else arr.codes)] = arr.codes.nbytes
+                    seen[id(arr.categories)] = arr.categories.memory_usage(deep=True)
+                else:
+                    np_arr = np.asarray(arr)
+                    seen[id(np_arr.base if np_arr.base is not None else np_arr)] = np_arr.nbytes
+        cube_bytes = sum(v.nbytes for v in vars(self.cube).values() if isinstance(v, np.ndarray))
+        changes_bytes = sum(v.nbytes for v in vars(self.changes).values() if isinstance(v, np.ndarray))
+        changes_bytes += int(self.changes.quarterly.memory_usage(deep=True).sum())
+        index_bytes = self.ticker_row_order.nbytes + self.ticker_row_offsets.nbytes
+        return sum(seen.values()) + cube_bytes + changes_bytes + index_bytes + self.reference.nbytes()
+
+
+def legacy_session_bytes(df, lang_key='zh'):
+    """旧实现每个会话的开销：st.cache_data 返回的整表副本 + 三个逐行生成的字符串列 + filtered_df 副本"""
+    suffix = lang_key.capitalize()
+    session_df = df.copy()
+    session_df['Sector'] = session_df[f'Sector_{suffix}']
+    session_df['Full_Name'] = session_df[f'Full_Name_{suffix}']
+    session_df['Logo_Name'] = session_df['Full_Name'] + ' (' + session_df['Ticker'] + ')'
+    filtered = session_df[session_df['Sector'].isin(session_df['Sector'].unique())]
+    return int(session_df.memory_usage(deep=True).sum() + filtered.memory_usage(deep=True).sum())
+
+
+def memory_report(df, dataset, lang_key='zh'):
+    cube = dataset.cube
+    default_view = dataset.filter(lang_key, 0, len(cube.dates), np.ones(len(cube.sector_keys), dtype=bool))
+    sector_sel = np.zeros(len(cube.sector_keys), dtype=bool)
+    sector_sel[0] = True
+    subset_view = dataset.filter(lang_key, 0, len(cube.dates), sector_sel)
+    return {
+        "rows": len(df),
+        "tickers": len(cube.tickers),
+        "before_per_session_bytes": legacy_session_bytes(df, lang_key),
+        # 默认视图为共享数据的切片 (无拷贝)；只有部分行业时才为筛选结果分配内存
+        "after_per_session_bytes_default_view": 0 if np.shares_memory(
+            default_view['Value_Billions'].to_numpy(), dataset.views[lang_key]['Value_Billions'].to_numpy()
+        ) else int(default_view.memory_usage(deep=False).sum()),
+        "after_per_session_bytes_one_sector": int(subset_view.memory_usage(deep=False).sum()),
+        "after_shared_bytes_per_process": int(dataset.shared_bytes()),
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "report":
+        snapshot_df = portfolio_data.open_snapshot(portfolio_data.ensure_snapshot())
+        for key, value in memory_report(snapshot_df, PortfolioDataset(snapshot_df)).items():
+            print(f"{key:40s} {value:>12,}")
+    else:
+        print(__doc__)
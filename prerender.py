@@ -0,0 +1,271 @@
+"""
+静态预渲染：不启动 Streamlit，直接复用 portfolio_dataset / charts 的构建逻辑，
+把 语言 × 日期预设 × 行业 的所有常用视图导出为静态 JSON 图表和 HTML 页面，
+流量高峰时由 CDN / 普通文件服务器提供，只有自定义筛选才访问在线应用。
+
+输出目录结构（默认 static/）：
+    static/index.json                           所有视图及其参数（语言、季度区间、行业）
+    static/<lang>/<preset>/<sector>/<figure>.json
+    static/<lang>/<preset>/<sector>/index.html
+    static/plotly-<版本>.min.js                 页面引用的 plotly.js（--plotlyjs file，取自已安装的 plotly 包）
+
+- 进程池并行，每个 worker 只打开一次内存映射快照
+- 输出确定：JSON 按键排序、HTML 使用固定的 div id，相同输入得到逐字节相同的文件
+- 增量：static/.manifest.json 记录每个视图的输入摘要（数据版本 + 渲染代码 + 视图参数），未变化的视图直接跳过
+- plotly.js 的引用方式由 --plotlyjs 选择：file（默认，输出目录下一份共享文件，不依赖外部地址）、
+  inline（嵌入每个页面，单个 HTML 可独立打开，但每页多约 4.8 MB）或 cdn（cdn.plot.ly 上的同版本文件）
+
+用法：
+    python prerender.py [--out static] [--workers N] [--force] [--plotlyjs file|inline|cdn]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import plotly
+
+import charts
+import portfolio_data
+from i18n import LANG
+from portfolio_dataset import PortfolioDataset
+
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+MANIFEST_NAME = ".manifest.json"
+INDEX_NAME = "index.json"
+
+PLOTLYJS_MODES = ("file", "inline", "cdn")
+# plotly.js 自身的版本（不是 Python 包的版本），与 cdn.plot.ly 上的文件名一致
+PLOTLYJS_NAME = f"plotly-{plotly.offline.get_plotlyjs_version()}.min.js"
+
+LANG_CODES = {"English": "en", "中文": "zh"}
+# 日期预设：(名称, 向前回溯的年数；None 为全部)，以数据中最新季度为终点
+DATE_PRESETS = (("all", None), ("10y", 10), ("5y", 5), ("1y", 1))
+ALL_SECTORS = "all"
+
+# 渲染结果依赖的源码：任一变化都会让所有视图重新生成
+RENDER_SOURCES = ("charts.py", "i18n.py", "portfolio_changes.py", "portfolio_cube.py", "portfolio_dataset.py",
+                  "prerender.py")
+
+_dataset = None
+
+
+def slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def code_digest():
+    h = hashlib.sha256(plotly.__version__.encode())
+    base = os.path.dirname(os.path.abspath(__file__))
+    for name in RENDER_SOURCES:
+        h.update(portfolio_data.file_digest(os.path.join(base, name)).encode())
+    return h.hexdigest()
+
+
+def view_specs(cube):
+    """所有 语言 × 日期预设 × 行业 视图（行业只包含数据中出现过的）"""
+    end = pd.Timestamp(cube.dates[-1])
+    ranges = []
+    for preset, years in DATE_PRESETS:
+        start = pd.Timestamp(cube.dates[0]) if years is None else end - pd.DateOffset(years=years)
+        i0, i1 = cube.date_index_range(start, end)
+        if i1 > i0:
+            ranges.append((preset, i0, i1))
+    sectors = [ALL_SECTORS] + [key for i, key in enumerate(cube.sector_keys) if cube.sector_held[:, i].any()]
+
+    specs = []
+    for lang, lang_key in LANG_CODES.items():
+        for preset, i0, i1 in ranges:
+            for sector in sectors:
+                specs.append({
+                    "id": f"{lang_key}/{preset}/{slug(sector)}",
+                    "lang": lang,
+                    "lang_key": lang_key,
+                    "preset": preset,
+                    "i0": int(i0),
+                    "i1": int(i1),
+                    "start_quarter": str(cube.quarters[i0]),
+                    "end_quarter": str(cube.quarters[i1 - 1]),
+                    "sector": sector,
+                    "sector_label": LANG[lang]["all_sectors"] if sector == ALL_SECTORS
+                    else portfolio_data.sector_map[sector][lang_key],
+                })
+    return specs
+
+
+def view_digest(spec, data_version, render_version):
+    payload = json.dumps([data_version, render_version, spec], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _init_worker(snapshot_path):
+    global _dataset
+    df = portfolio_data.open_snapshot(snapshot_path)
+    _dataset = PortfolioDataset(df, version=portfolio_data.snapshot_metadata(snapshot_path).get("source_sha256", ""))
+
+
+def build_figures(dataset, spec):
+    """与 streamlit_app 的 Tab 1 / 3 / 5 相同的图表（无高亮）；筛选结果为空时返回空列表"""
+    cube, t, lk = dataset.cube, LANG[spec["lang"]], spec["lang_key"]
+    i0, i1 = spec["i0"], spec["i1"]
+    if spec["sector"] == ALL_SECTORS:
+        sel = np.ones(len(cube.sector_keys), dtype=bool)
+    else:
+        sel = np.array([key == spec["sector"] for key in cube.sector_keys])
+    filtered_df = dataset.filter(lk, i0, i1, sel)
+    if filtered_df.empty:
+        return []
+
+    chart_df = charts.holdings_chart_frame(dataset, lk, i0, i1, sel, filtered_df, t["others_label"])
+    sector_data = cube.sector_frame(i0, i1, sel, lk)
+    latest_date = pd.Timestamp(filtered_df['Date'].max())
+    quarter_changes = dataset.changes.quarter_frame(i0, i1, sel[cube.ticker_sector])
+    return [
+        ("holdings_area", charts.holdings_area(chart_df, t)),
+        ("holdings_bar", charts.holdings_bar(chart_df, t)),
+        ("sector_area", charts.sector_area(sector_data, t)),
+        ("sector_pie", charts.sector_pie(sector_data[sector_data['Date'] == latest_date], latest_date, t)),
+        ("flows", charts.flow_bars(quarter_changes, t)),
+        ("turnover", charts.turnover_lines(quarter_changes, t)),
+    ]
+
+
+def write_if_changed(path, content):
+    """内容相同则不写（保留文件时间戳，便于 CDN / rsync 增量同步）；返回是否写入"""
+    data = content.encode("utf-8")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def plotlyjs_tag(spec, plotlyjs):
+    """页面 <head> 中加载 plotly.js 的标签；file 模式按视图目录深度引用输出目录根下的共享文件"""
+    if plotlyjs == "inline":
+        return f'<script type="text/javascript">{plotly.offline.get_plotlyjs()}</script>'
+    if plotlyjs == "cdn":
+        src = f"https://cdn.plot.ly/{PLOTLYJS_NAME}"
+    else:
+        src = "../" * len(spec["id"].split("/")) + PLOTLYJS_NAME
+    return f'<script src="{src}" charset="utf-8"></script>'
+
+
+def write_plotlyjs(out_dir, plotlyjs):
+    """file 模式写出共享的 plotly.js，并删除其他版本 / 其他模式留下的文件"""
+    for name in os.listdir(out_dir):
+        if re.fullmatch(r"plotly-.*\.min\.js", name) and (plotlyjs != "file" or name != PLOTLYJS_NAME):
+            os.remove(os.path.join(out_dir, name))
+    if plotlyjs == "file":
+        write_if_changed(os.path.join(out_dir, PLOTLYJS_NAME), plotly.offline.get_plotlyjs())
+
+
+def page_html(spec, figures, plotlyjs="file"):
+    t = LANG[spec["lang"]]
+    parts = [
+        "<!DOCTYPE html>",
+        f'<html lang="{spec["lang_key"]}"><head><meta charset="utf-8">',
+        f'<title>{t["title"]} · {spec["start_quarter"]} – {spec["end_quarter"]}</title>',
+        plotlyjs_tag(spec, plotlyjs),
+        "</head><body>",
+        f'<h1>{t["title"]}</h1>',
+        f'<p>{spec["start_quarter"]} – {spec["end_quarter"]} · {spec["sector_label"]}</p>',
+    ]
+    for name, fig in figures:
+        parts.append(fig.to_html(full_html=False, include_plotlyjs=False, div_id=name))
+    parts.append("</body></html>")
+    return "\n".join(parts) + "\n"
+
+
+def _render_view(args):
+    spec, out_dir, plotlyjs = args
+    view_dir = os.path.join(out_dir, *spec["id"].split("/"))
+    os.makedirs(view_dir, exist_ok=True)
+    figures = build_figures(_dataset, spec)
+    files, written = [], 0
+    for name, fig in figures:
+        fig_json = json.dumps(json.loads(fig.to_json()), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        written += write_if_changed(os.path.join(view_dir, f"{name}.json"), fig_json)
+        files.append(f"{name}.json")
+    if figures:
+        written += write_if_changed(os.path.join(view_dir, "index.html"), page_html(spec, figures, plotlyjs))
+        files.append("index.html")
+    return spec["id"], files, written
+
+
+def load_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_json(path, obj):
+    write_if_changed(path, json.dumps(obj, indent=2, sort_keys=True, ensure_ascii=False) + "\n")
+
+
+def prerender(out_dir=OUTPUT_DIR, workers=None, force=False, snapshot_path=None, plotlyjs="file"):
+    """增量预渲染；返回 (重新渲染的视图数, 跳过的视图数)"""
+    if plotlyjs not in PLOTLYJS_MODES:
+        raise ValueError(f"plotlyjs must be one of {PLOTLYJS_MODES}, got {plotlyjs!r}")
+    snapshot_path = snapshot_path or portfolio_data.ensure_snapshot()
+    data_version = portfolio_data.snapshot_metadata(snapshot_path).get("source_sha256", "")
+    # 引用方式不同则页面内容不同：切换后所有视图重新生成
+    render_version = f"{code_digest()}:{plotlyjs}"
+    _init_worker(snapshot_path)
+    specs = view_specs(_dataset.cube)
+
+    os.makedirs(out_dir, exist_ok=True)
+    write_plotlyjs(out_dir, plotlyjs)
+    manifest = load_manifest(out_dir)
+    new_manifest, jobs = {}, []
+    for spec in specs:
+        digest = view_digest(spec, data_version, render_version)
+        entry = manifest.get(spec["id"], {})
+        view_dir = os.path.join(out_dir, *spec["id"].split("/"))
+        new_manifest[spec["id"]] = {"sha256": digest, "files": entry.get("files", [])}
+        if (not force and entry.get("sha256") == digest
+                and all(os.path.exists(os.path.join(view_dir, name)) for name in entry.get("files", []))):
+            continue
+        jobs.append((spec, out_dir, plotlyjs))
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(snapshot_path,)) as pool:
+            for view_id, files, written in pool.map(_render_view, jobs, chunksize=4):
+                new_manifest[view_id]["files"] = files
+                print(f"{view_id}: {len(files)} file(s), {written} changed")
+
+    # 数据中已不存在的视图（如行业被移除）一并删除
+    for view_id in set(manifest) - set(new_manifest):
+        shutil.rmtree(os.path.join(out_dir, *view_id.split("/")), ignore_errors=True)
+
+    index = {
+        "data_version": data_version,
+        "views": [dict(spec, files=new_manifest[spec["id"]]["files"]) for spec in specs],
+    }
+    save_json(os.path.join(out_dir, INDEX_NAME), index)
+    save_json(os.path.join(out_dir, MANIFEST_NAME), new_manifest)
+    return len(jobs), len(specs) - len(jobs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-render static figures for every language x date preset x sector view")
+    parser.add_argument("--out", default=OUTPUT_DIR, help="output directory")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size")
+    parser.add_argument("--force", action="store_true", help="re-render every view")
+    parser.add_argument("--plotlyjs", choices=PLOTLYJS_MODES, default="file",
+                        help="how pages load plotly.js: shared file in --out (default), inline in every page, or the CDN")
+    args = parser.parse_args()
+
+    rendered, skipped = prerender(args.out, args.workers, args.force, plotlyjs=args.plotlyjs)
+    print(f"rendered {rendered} view(s), skipped {skipped} unchanged")
@@ -0,0 +1,75 @@
+"""
+公司参考表（Tab 4）：服务端排序 + 分页，只把当前页的行发送到浏览器。
+
+- 每个数据集构建一次：每种语言预先渲染好每只股票的表格行 (<tr>…</tr>)，以及按 行业 / 代码 / 名称 的排序下标
+- 每次重跑只做：排序下标上的布尔筛选 (O(股票数)) + 当前页行片段拼接 (O(页大小))
+- Logo 样式同样只输出当前页用到的规则（见 logo_assets.logo_css 的 tickers 参数）
+
+上万只股票时页面大小也只取决于页大小，而不是筛选结果的股票数。
+"""
+import html
+
+import numpy as np
+
+from portfolio_cube import LANG_KEYS
+
+SORT_KEYS = ("sector", "ticker", "name")
+PAGE_SIZES = (25, 50, 100, 200)
+
+
+def _order(*keys):
+    """按多个键（第一个为主键）的稳定排序下标"""
+    return np.lexsort([np.array([str(v).lower() for v in key], dtype=str) for key in reversed(keys)])
+
+
+class ReferenceIndex:
+    def __init__(self, cube, full_names, logo_html):
+        """full_names: {lang_key: 按股票编码索引的全名}；logo_html: 按股票编码索引的 Logo 占位 HTML"""
+        self.tickers = cube.tickers
+        self.ticker_sector = cube.ticker_sector
+        self.rows = {}
+        self.orders = {}
+        tickers = [html.escape(str(tk)) for tk in cube.tickers]
+        for lk in LANG_KEYS:
+            names = full_names[lk]
+            sectors = cube.sector_labels[lk][cube.ticker_sector]
+            self.rows[lk] = np.array([
+                f"<tr><td>{logo} <span class='ref-ticker-col'>{tk}</span>: {html.escape(str(name))}</td>"
+                f"<td>{html.escape(str(sector))}</td></tr>"
+                for tk, name, sector, logo in zip(tickers, names, sectors, logo_html)
+            ], dtype=object)
+            self.orders[lk] = {
+                "sector": _order(sectors, cube.tickers),
+                "ticker": _order(cube.tickers),
+                "name": _order(names, cube.tickers),
+            }
+
+    def page(self, lang_key, mask, sort="sector", descending=False, page=1, page_size=PAGE_SIZES[0]):
+        """
+        mask 为按股票编码的布尔数组（筛选结果中出现过的股票）。
+        返回 (当前页股票代码数组, <tr> 片段拼接的 HTML, 总行数)；page 从 1 开始，越界时取最后一页
+        """
+        order = self.orders[lang_key][sort]
+        if descending:
+            order = order[::-1]
+        selected = order[mask[order]]
+        total = len(selected)
+        n_pages = max(1, -(-total // page_size))
+        start = (min(max(page, 1), n_pages) - 1) * page_size
+        window = selected[start:start + page_size]
+        return self.tickers[window], "".join(self.rows[lang_key][window]), total
+
+    def nbytes(self):
+        """预渲染行与排序下标占用的内存（近似）"""
+        row_bytes = sum(len(row) for rows in self.rows.values() for row in rows)
+        order_bytes = sum(order.nbytes for orders in self.orders.values() for order in orders.values())
+        return row_bytes + order_bytes
+
+
+def table_html(rows_html, t):
+    """与 DataFrame.to_html 相同的表格结构（沿用原有样式），只包含当前页的行"""
+    return (
+        '<table border="1" class="dataframe">'
+        f'<thead><tr style="text-align: right;"><th>{t["col_logo_name"]}</th><th>{t["col_sector"]}</th></tr></thead>'
+        f"<tbody>{rows_html}</tbody></table>"
+    )
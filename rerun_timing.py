@@ -0,0 +1,191 @@
+"""
+重跑热点计时：命名 span + 进程级直方图，定时导出为 Prometheus 文本或 JSON Lines。
+
+    spans = SpanRecorder("rerun_metrics.prom")
+    with spans.span("tab1"):
+        ...
+    @spans.span("tab2")          # 也可作为装饰器（fragment 单独重跑时同样计时）
+    def render_tab2(...): ...
+
+- 每个 span 名对应一个固定桶的直方图（毫秒），线程安全，所有会话共享
+- 分位数 (p50/p90/p99) 由桶内线性插值估计，另记录精确的最大值
+- 导出文件按后缀选择格式：.jsonl 追加一行快照，其他写 Prometheus 文本（原子替换）；
+  路径中的 {pid} 会替换为进程号，多 worker 部署时各写各的文件
+"""
+import atexit
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# 桶上界（毫秒），最后隐含 +Inf
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+METRIC_NAME = "streamlit_rerun_span_seconds"
+
+
+class Histogram:
+    def __init__(self, bounds=BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(self.bounds, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        self.max = max(self.max, ms)
+
+    def quantile(self, q):
+        """按桶估计分位数；落在 +Inf 桶时返回最大值"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(self.bounds):
+                    return self.max
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = min(self.bounds[i], self.max)
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.sum, 3),
+            "mean_ms": round(self.sum / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.50), 3),
+            "p90_ms": round(self.quantile(0.90), 3),
+            "p99_ms": round(self.quantile(0.99), 3),
+            "max_ms": round(self.max, 3),
+        }
+
+
+class SpanRecorder:
+    def __init__(self, export_path=None, export_interval=30.0):
+        self.export_path = export_path.format(pid=os.getpid()) if export_path else None
+        self.export_interval = export_interval
+        self.started = time.time()
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._stop = threading.Event()
+
+        if self.export_path:
+            self._thread = threading.Thread(target=self._run, name="rerun-timing-export", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    # ------------------------------------------------------------------ 记录
+    def observe(self, name, ms):
+        with self._lock:
+            hist = self._histograms.get(name)
+            if hist is None:
+                hist = self._histograms[name] = Histogram()
+            hist.observe(ms)
+            self._dirty = True
+
+    @contextmanager
+    def span(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - t0) * 1000)
+
+    def timed(self, name, fn):
+        """计时调用 fn() 并返回其结果（便于包在 lambda / 缓存构建函数里）"""
+        with self.span(name):
+            return fn()
+
+    def add_gauges(self, metric, help_text, collect):
+        """导出时调用 collect() -> {名称: 数值}，作为 Prometheus gauge（如每会话内存）一并写出"""
+        with self._lock:
+            self._gauges[metric] = (help_text, collect)
+
+    def gauges(self):
+        with self._lock:
+            gauges = list(self._gauges.items())
+        return {metric: collect() for metric, (_, collect) in gauges}
+
+    def summary(self):
+        """{span 名: {count, total_ms, mean_ms, p50_ms, p90_ms, p99_ms, max_ms}}，按名称排序"""
+        with self._lock:
+            return {name: hist.summary() for name, hist in sorted(self._histograms.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._dirty = True
+
+    # ------------------------------------------------------------------ 导出
+    def prometheus_text(self):
+        lines = [
+            f"# HELP {METRIC_NAME} Wall time of named stages in a Streamlit script rerun.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        with self._lock:
+            for name, hist in sorted(self._histograms.items()):
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                cumulative = 0
+                for bound, n in zip(hist.bounds, hist.counts):
+                    cumulative += n
+                    lines.append(f'{METRIC_NAME}_bucket{{span="{label}",le="{bound / 1000:g}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_bucket{{span="{label}",le="+Inf"}} {hist.count}')
+                lines.append(f'{METRIC_NAME}_sum{{span="{label}"}} {hist.sum / 1000:.6f}')
+                lines.append(f'{METRIC_NAME}_count{{span="{label}"}} {hist.count}')
+            gauges = list(self._gauges.items())
+        for metric, (help_text, collect) in gauges:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            for name, value in collect().items():
+                lines.append(f'{metric}{{name="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def json_line(self):
+        return json.dumps(
+            {"ts": round(time.time(), 3), "pid": os.getpid(), "spans": self.summary(), "gauges": self.gauges()},
+            ensure_ascii=False,
+        )
+
+    def export(self, path=None):
+        """写出当前直方图；没有新数据时跳过"""
+        path = path or self.export_path
+        if not path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+        try:
+            if path.endswith(".jsonl"):
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(self.json_line() + "\n")
+            else:
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(self.prometheus_text())
+                os.replace(tmp, path)
+        except OSError:
+            with self._lock:
+                self._dirty = True
+            logger.exception("rerun timing export to %s failed; will retry", path)
+
+    def _run(self):
+        while not self._stop.wait(self.export_interval):
+            self.export()
+
+    def close(self):
+        if not self._stop.is_set():
+            self._stop.set()
+            self.export()
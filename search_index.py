@@ -0,0 +1,107 @@
+"""
+公司搜索索引（双语 typeahead）：代码、英文名、中文名及其拼音，每个数据集构建一次，所有会话共享。
+
+匹配规则（分数高者在前，同分按当前语言的名称排序）：
+    100  代码完全匹配
+     90  代码前缀
+     80  英文名 / 中文名 / 拼音全拼 / 拼音首字母 前缀
+     70  英文名中某个单词的前缀
+     60  任一字段包含
+     40  模糊：查询字符按顺序出现在代码 / 英文单词首字母 / 拼音首字母中（如 "brkb"、"boa"）
+
+拼音需要可选依赖 pypinyin；未安装时只匹配代码、英文名和中文字符。
+界面只把得分最高的前若干条结果发送到浏览器，不再把全部名称作为选项。
+"""
+import re
+
+import numpy as np
+
+from portfolio_cube import LANG_KEYS
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:  # 可选依赖
+    lazy_pinyin = None
+
+DEFAULT_LIMIT = 20
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", str(text)).strip().lower()
+
+
+def _pinyin(text, initials=False):
+    if lazy_pinyin is None:
+        return ""
+    parts = lazy_pinyin(text, style=Style.FIRST_LETTER) if initials else lazy_pinyin(text)
+    return re.sub(r"[^a-z0-9]", "", "".join(parts).lower())
+
+
+class SearchIndex:
+    def __init__(self, tickers, full_names):
+        """tickers: 股票代码数组（按编码）；full_names: {lang_key: 按编码索引的全名}"""
+        self.tickers = np.asarray(tickers)
+        ticker = np.array([_normalize(tk) for tk in tickers], dtype=str)
+        en = np.array([_normalize(name) for name in full_names["en"]], dtype=str)
+        zh = np.array([_normalize(name) for name in full_names["zh"]], dtype=str)
+        pinyin = np.array([_pinyin(name) for name in full_names["zh"]], dtype=str)
+        initials = np.array([_pinyin(name, initials=True) for name in full_names["zh"]], dtype=str)
+
+        self.ticker = ticker
+        self.prefix_fields = (en, zh, pinyin, initials)
+        # 单词前缀：在前面补一个空格，查询 " q" 即可匹配任一单词开头
+        self.en_words = np.char.add(" ", en)
+        en_initials = np.array(
+            [re.sub(r"[^a-z0-9]", "", "".join(w[:1] for w in name.split())) for name in en], dtype=str
+        )
+        # 模糊匹配：每个字段拼成一个按行分隔的长字符串，一次正则扫描即可（行号 = 股票编码）
+        self.fuzzy_fields = []
+        for field in (ticker, en_initials, initials):
+            lengths = np.char.str_len(field) + 1
+            self.fuzzy_fields.append(("\n".join(field.tolist()), np.concatenate([[0], np.cumsum(lengths)[:-1]])))
+        # 同分时按当前语言的名称排序
+        self.name_rank = {}
+        for lk in LANG_KEYS:
+            names = np.array([_normalize(name) for name in full_names[lk]], dtype=str)
+            rank = np.empty(len(ticker), dtype=np.int64)
+            rank[np.argsort(names, kind="stable")] = np.arange(len(ticker))
+            self.name_rank[lk] = rank
+
+    def scores(self, query):
+        """每只股票的匹配分数（0 为不匹配）；空查询时全部为 1"""
+        q = _normalize(query)
+        n = len(self.ticker)
+        if not q:
+            return np.ones(n, dtype=np.int16)
+        compact = q.replace(" ", "")
+        score = np.zeros(n, dtype=np.int16)
+
+        def bump(value, hit):
+            np.maximum(score, np.where(hit, value, 0).astype(np.int16), out=score)
+
+        # c1[^\nc2]*c2[^\nc3]*c3…：不跨行、无回溯；匹配位置所在的行即命中的股票
+        pattern = re.compile(re.escape(compact[0]) + "".join(
+            f"[^\\n{re.escape(c)}]*{re.escape(c)}" for c in compact[1:]
+        ))
+        fuzzy = np.zeros(n, dtype=bool)
+        for text, line_starts in self.fuzzy_fields:
+            starts = [m.start() for m in pattern.finditer(text)]
+            fuzzy[np.searchsorted(line_starts, starts, side="right") - 1] = True
+        bump(40, fuzzy)
+        for field in (self.ticker,) + self.prefix_fields:
+            bump(60, np.char.find(field, q) >= 0)
+        bump(70, np.char.find(self.en_words, " " + q) >= 0)
+        for field in self.prefix_fields:
+            bump(80, np.char.startswith(field, q) | np.char.startswith(field, compact))
+        bump(90, np.char.startswith(self.ticker, compact))
+        bump(100, self.ticker == compact)
+        return score
+
+    def search(self, query, lang_key, mask=None, limit=DEFAULT_LIMIT):
+        """返回按相关度排序的前 limit 个股票代码；mask 限定候选（如筛选范围内出现过的股票）"""
+        score = self.scores(query)
+        if mask is not None:
+            score = np.where(mask, score, 0)
+        hits = np.flatnonzero(score)
+        order = np.lexsort((self.name_rank[lang_key][hits], -score[hits]))[:limit]
+        return self.tickers[hits[order]]
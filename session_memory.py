@@ -0,0 +1,126 @@
+"""
+每个会话的内存记账：进程内只有一份的只读数据集之外，每个会话自己占用的字节数。
+
+- 数据集的底层数组（语言视图的列、矩阵、变动分析）登记为"共享"；会话持有的 DataFrame / 数组
+  如果只是它们的切片或视图，则不计入会话
+- retained：跨重跑一直存活的对象（session_state、fragment 的调用参数——Streamlit 会保留它们以便单独重跑）
+- transient：本次重跑临时分配的对象（筛选结果等），重跑结束即释放，记录的是每次重跑的峰值估计
+- 最近 ACTIVE_SECONDS 内有过重跑的会话视为活跃，超时的会话从统计中移除
+
+    session_memory = SessionMemory()
+    session_memory.record(session_id, dataset, retained=[...], transient=[...])
+    session_memory.stats()   # 活跃会话数、每会话 retained / transient 字节数（均值 / 最大值）
+"""
+import sys
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+
+ACTIVE_SECONDS = 600
+MAX_DEPTH = 4
+
+
+def _root(arr):
+    """沿 .base 找到真正持有内存的对象（切片 / 视图与原数组共用同一个根）"""
+    while getattr(arr, "base", None) is not None:
+        arr = arr.base
+    return arr
+
+
+def _column_parts(series):
+    """Series -> [(底层数组, 字节数)]；Categorical 拆成编码和类别两部分"""
+    arr = series.array
+    if isinstance(arr, pd.Categorical):
+        return [(arr.codes, arr.codes.nbytes), (arr.categories, int(arr.categories.memory_usage(deep=True)))]
+    values = series.to_numpy()
+    if values.dtype == object:
+        return [(values, int(series.memory_usage(index=False, deep=True)))]
+    return [(values, values.nbytes)]
+
+
+def shared_roots(dataset):
+    """数据集所有底层数组的根对象 id（由所有会话共享）"""
+    roots = set()
+    for view in dataset.views.values():
+        for col in view.columns:
+            for part, _ in _column_parts(view[col]):
+                roots.add(id(part))
+                roots.add(id(_root(part)))
+    for holder in (dataset.cube, dataset.changes, dataset):
+        for value in vars(holder).values():
+            if isinstance(value, np.ndarray):
+                roots.add(id(_root(value)))
+    return roots
+
+
+def object_bytes(obj, shared, depth=0):
+    """obj 中不属于共享数据集的字节数（近似；容器最多展开 MAX_DEPTH 层）"""
+    if isinstance(obj, pd.DataFrame):
+        total = int(obj.index.memory_usage())
+        for col in obj.columns:
+            total += object_bytes(obj[col], shared, depth)
+        return total
+    if isinstance(obj, pd.Series):
+        return sum(
+            0 if id(part) in shared or id(_root(part)) in shared else size
+            for part, size in _column_parts(obj)
+        )
+    if isinstance(obj, np.ndarray):
+        return 0 if id(_root(obj)) in shared else obj.nbytes
+    size = sys.getsizeof(obj)
+    if depth >= MAX_DEPTH:
+        return size
+    if isinstance(obj, dict):
+        return size + sum(object_bytes(k, shared, depth + 1) + object_bytes(v, shared, depth + 1) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(object_bytes(item, shared, depth + 1) for item in obj)
+    return size
+
+
+class SessionMemory:
+    def __init__(self, active_seconds=ACTIVE_SECONDS):
+        self.active_seconds = active_seconds
+        self._sessions = {}  # session_id -> (最近一次重跑的时间, retained 字节, transient 字节)
+        self._shared = weakref.WeakKeyDictionary()  # 数据集 -> 共享根对象 id（数据集被淘汰后自动释放）
+        self._lock = threading.Lock()
+
+    def _shared_roots(self, dataset):
+        with self._lock:
+            roots = self._shared.get(dataset)
+        if roots is None:
+            roots = shared_roots(dataset)
+            with self._lock:
+                self._shared[dataset] = roots
+        return roots
+
+    def record(self, session_id, dataset, retained=(), transient=()):
+        """记录一次重跑结束时会话持有的对象；返回 (retained 字节, transient 字节)"""
+        shared = self._shared_roots(dataset)
+        retained_bytes = sum(object_bytes(obj, shared) for obj in retained)
+        transient_bytes = sum(object_bytes(obj, shared) for obj in transient)
+        with self._lock:
+            self._sessions[session_id] = (time.monotonic(), retained_bytes, transient_bytes)
+        return retained_bytes, transient_bytes
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.active_seconds
+        for sid in [sid for sid, (seen, _, _) in self._sessions.items() if seen < cutoff]:
+            del self._sessions[sid]
+
+    def stats(self):
+        with self._lock:
+            self._prune()
+            retained = [r for _, r, _ in self._sessions.values()]
+            transient = [tr for _, _, tr in self._sessions.values()]
+        n = len(retained)
+        return {
+            "active_sessions": n,
+            "retained_bytes_total": sum(retained),
+            "retained_bytes_mean": sum(retained) // n if n else 0,
+            "retained_bytes_max": max(retained, default=0),
+            "transient_bytes_mean": sum(transient) // n if n else 0,
+            "transient_bytes_max": max(transient, default=0),
+        }
@@ -0,0 +1,388 @@
+"""
+跨进程 / 跨副本共享的二级缓存：数据集快照 (Arrow IPC 文件) 和序列化后的图表 JSON。
+负载均衡后的多个 Streamlit 副本、以及重启后的新进程直接读取已有结果，不再各自冷启动重算。
+
+后端由 PORTFOLIO_CACHE_URL 选择，需要显式开启：
+    （未设置）或 off         关闭
+    disk                     DATA_DIR/cache/ 下的本地磁盘缓存（同一台机器上的副本共享）
+    /path 或 file:///path    指定目录的本地磁盘缓存
+    redis://host:port/db     Redis 协议 (RESP) 服务，多台机器上的副本共享；无需安装 redis 客户端库
+磁盘缓存总大小上限为 PORTFOLIO_CACHE_MAX_MB（默认 512），超出时按最近使用时间淘汰；
+Redis 的容量与淘汰由服务端的 maxmemory / maxmemory-policy 决定。
+
+键 = 类别 + (代码版本, 数据集版本哈希, ...) 的摘要。代码版本为本目录源文件与 pandas / plotly 版本的摘要，
+部署新代码后自动换用新的键，不会读到旧格式的条目。
+条目只有 Arrow 快照和图表 JSON 两种数据格式，读取时不会反序列化出可执行对象；快照写回本地后经元数据校验才使用。
+后端出错（磁盘已满、连接断开）时视为未命中，不影响页面。
+
+本地 RESP 替身（开发 / 测试 redis:// 后端）与维护命令：
+    python shared_cache.py resp-server [--port 6390]
+    python shared_cache.py stats|clear [URL]
+"""
+import glob
+import hashlib
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+import pandas as pd
+import plotly
+
+import portfolio_data
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIR = os.path.join(portfolio_data.DATA_DIR, "cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+SOCKET_TIMEOUT = 2.0
+RETRY_SECONDS = 30  # Redis 连接失败后，在这段时间内直接视为未命中
+
+
+def code_version():
+    """本目录 .py 源文件 + pandas / plotly 版本的摘要（快照与图表 JSON 的格式依赖它们）"""
+    h = hashlib.sha256(f"{pd.__version__}|{plotly.__version__}".encode())
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+CODE_VERSION = code_version()
+
+
+def make_key(kind, *parts):
+    """缓存键：类别前缀 + (代码版本, *parts) 的摘要；parts 中通常包含数据集版本哈希"""
+    digest = hashlib.sha256(repr((CODE_VERSION,) + parts).encode("utf-8")).hexdigest()
+    return f"{kind}:{digest}"
+
+
+class _Stats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.errors = 0
+        self.evictions = 0
+
+    def as_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses, "puts": self.puts, "errors": self.errors,
+            "evictions": self.evictions, "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# -----------------------------------------------------------------------------
+# 本地磁盘
+# -----------------------------------------------------------------------------
+class DiskCache:
+    def __init__(self, root=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        """每个条目一个文件（先写临时文件再原子替换）；读取时更新 mtime，淘汰最久未用的文件"""
+        self.root = root
+        self.max_bytes = max_bytes
+        self._stats = _Stats()
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._bytes = sum(size for _, size, _ in self._scan())
+
+    def _path(self, key):
+        kind, _, digest = key.partition(":")
+        return os.path.join(self.root, f"{kind}-{digest}.bin")
+
+    def _scan(self):
+        entries = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(".bin"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._stats.misses += 1
+            return None
+        with self._lock:
+            self._stats.hits += 1
+        return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            # 覆盖已有条目时扣除旧文件的大小，否则重复写同一个键会让计数一直增长、提前触发淘汰
+            try:
+                replaced = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.warning("disk cache write failed: %s", path, exc_info=True)
+            with self._lock:
+                self._stats.errors += 1
+            return
+        with self._lock:
+            self._stats.puts += 1
+            self._bytes += len(data) - replaced
+            over = self._bytes > self.max_bytes
+        if over:
+            self._evict()
+
+    def _evict(self):
+        # 其他进程也在写同一目录：以实际扫描结果为准，淘汰到上限的 90%
+        entries = sorted(self._scan(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._bytes = total
+            self._stats.evictions += removed
+
+    def clear(self):
+        for path, _, _ in self._scan():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "disk", "path": self.root, "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    **self._stats.as_dict()}
+
+
+# -----------------------------------------------------------------------------
+# Redis 协议 (RESP)
+# -----------------------------------------------------------------------------
+def _encode_command(*args):
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+        out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(out)
+
+
+def _read_reply(reader):
+    line = reader.readline()
+    if not line:
+        raise ConnectionError("connection closed")
+    prefix, body = line[:1], line[1:-2]
+    if prefix == b"+":
+        return body.decode()
+    if prefix == b"-":
+        raise RuntimeError(body.decode())
+    if prefix == b":":
+        return int(body)
+    if prefix == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        if len(data) != length + 2:
+            raise ConnectionError("connection closed")
+        return data[:-2]
+    if prefix == b"*":
+        length = int(body)
+        return None if length < 0 else [_read_reply(reader) for _ in range(length)]
+    raise RuntimeError(f"unexpected reply {line!r}")
+
+
+class RedisCache:
+    def __init__(self, host="localhost", port=6379, db=0, password=None, prefix="portfolio:", ttl=None):
+        """单连接 + 锁的最小 RESP 客户端（GET / SET / DEL / SCAN）；ttl 为条目过期秒数（None 为不过期）"""
+        self.host, self.port, self.db, self.password = host, port, db, password
+        self.prefix = prefix
+        self.ttl = ttl
+        self._stats = _Stats()
+        self._lock = threading.Lock()
+        self._sock = None
+        self._reader = None
+        self._down_until = 0.0
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=SOCKET_TIMEOUT)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock, self._reader = sock, sock.makefile("rb")
+        if self.password:
+            self._call("AUTH", self.password)
+        if self.db:
+            self._call("SELECT", self.db)
+
+    def _call(self, *args):
+        self._sock.sendall(_encode_command(*args))
+        return _read_reply(self._reader)
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._reader = None
+
+    def command(self, *args):
+        """执行一条命令；连接失败时在 RETRY_SECONDS 内不再重试，返回 None（视为未命中）"""
+        with self._lock:
+            if time.monotonic() < self._down_until:
+                return None
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._call(*args)
+                except (OSError, ConnectionError) as exc:
+                    self._close()
+                    if attempt:
+                        logger.warning("cache server %s:%s unavailable: %s", self.host, self.port, exc)
+                        self._down_until = time.monotonic() + RETRY_SECONDS
+                        self._stats.errors += 1
+                        return None
+                except RuntimeError:
+                    logger.warning("cache server error for %s", args[0], exc_info=True)
+                    self._stats.errors += 1
+                    return None
+
+    def get(self, key):
+        data = self.command("GET", self.prefix + key)
+        with self._lock:
+            if data is None:
+                self._stats.misses += 1
+            else:
+                self._stats.hits += 1
+        return data
+
+    def put(self, key, data):
+        args = ("SET", self.prefix + key, data) + (("EX", int(self.ttl)) if self.ttl else ())
+        if self.command(*args) is not None:
+            with self._lock:
+                self._stats.puts += 1
+
+    def clear(self):
+        cursor = b"0"
+        while True:
+            reply = self.command("SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", 1000)
+            if not reply:
+                return
+            cursor, keys = reply
+            if keys:
+                self.command("DEL", *keys)
+            if cursor in (b"0", "0"):
+                return
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "redis", "server": f"{self.host}:{self.port}/{self.db}", **self._stats.as_dict()}
+
+
+def open_cache(url=None, max_bytes=DEFAULT_MAX_BYTES):
+    """按 URL 创建后端（见模块说明）；URL 为空或 off 时返回 None（关闭）"""
+    if url is None:
+        url = os.environ.get("PORTFOLIO_CACHE_URL", "")
+    url = url.strip()
+    if url.lower() in ("", "off", "none", "0"):
+        return None
+    if url.startswith("redis://"):
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip("/") or 0)
+        return RedisCache(parsed.hostname or "localhost", parsed.port or 6379, db, parsed.password)
+    if url.lower() == "disk":
+        path = DEFAULT_DIR
+    else:
+        path = (urlparse(url).path if url.startswith("file://") else url) or DEFAULT_DIR
+    try:
+        return DiskCache(path, max_bytes)
+    except OSError:
+        logger.warning("shared cache directory %s is not writable; shared cache disabled", path)
+        return None
+
+
+# -----------------------------------------------------------------------------
+# 本地 RESP 替身：只实现缓存用到的命令，数据保存在内存中
+# -----------------------------------------------------------------------------
+class _RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        store, lock = self.server.store, self.server.lock
+        while True:
+            try:
+                args = _read_reply(self.rfile)
+            except (ConnectionError, OSError):
+                return
+            name = args[0].decode().upper() if args else ""
+            with lock:
+                if name == "PING":
+                    reply = b"+PONG\r\n"
+                elif name in ("AUTH", "SELECT"):
+                    reply = b"+OK\r\n"
+                elif name == "GET":
+                    value = store.get(args[1])
+                    reply = b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+                elif name == "SET":
+                    store[args[1]] = args[2]
+                    reply = b"+OK\r\n"
+                elif name == "DEL":
+                    reply = b":%d\r\n" % sum(store.pop(k, None) is not None for k in args[1:])
+                elif name == "DBSIZE":
+                    reply = b":%d\r\n" % len(store)
+                elif name == "SCAN":
+                    pattern = args[args.index(b"MATCH") + 1].rstrip(b"*") if b"MATCH" in args else b""
+                    keys = [k for k in store if k.startswith(pattern)]
+                    reply = b"*2\r\n$1\r\n0\r\n" + _encode_command(*keys)
+                else:
+                    reply = b"-ERR unknown command '%s'\r\n" % name.encode()
+            self.wfile.write(reply)
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=6390, host="127.0.0.1"):
+        super().__init__((host, port), _RespHandler)
+        self.store = {}
+        self.lock = threading.Lock()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "resp-server":
+        port = int(sys.argv[sys.argv.index("--port") + 1]) if "--port" in sys.argv else 6390
+        print(f"RESP stand-in listening on 127.0.0.1:{port}")
+        RespServer(port).serve_forever()
+    elif command in ("stats", "clear"):
+        cache = open_cache(sys.argv[2] if len(sys.argv) > 2 else None)
+        if cache is None:
+            print("shared cache disabled")
+        elif command == "clear":
+            cache.clear()
+            print("cleared")
+        else:
+            print(cache.stats())
+    else:
+        print(__doc__)
@@ -1,10 +1,28 @@
+import os
+import time
+
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import datetime
-import json  # 新增：计数功能依赖
-import os    # 新增：文件判断依赖
+import numpy as np
+
+import charts
+import client_filter
+import logo_assets
+import reference_table
+import shared_cache
+from i18n import LANG
+import portfolio_data
+from access_gate import AccessGate, load_secret
+from admission import AdmissionController, Overloaded
+from figure_cache import FigureCache
+from figure_templates import FigureTemplates, fast_figure
+from visit_counter import VisitCounter
+from daily_prices import DailyMarks
+from data_refresh import DataRefresher
+from filer_store import DEFAULT_FILER, FilerStore, common_dates, portfolio_overlap
+from rerun_timing import SpanRecorder
+from session_memory import SessionMemory
 
 
 
@@ -76,141 +94,79 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-COUNTER_FILE = "visit_stats.json"
+# --- 重跑计时 / 诊断面板 ---
+METRICS_FILE = os.environ.get("PORTFOLIO_METRICS_FILE", "rerun_metrics.prom")  # .jsonl 则写 JSON Lines
+METRICS_INTERVAL = float(os.environ.get("PORTFOLIO_METRICS_INTERVAL", "30"))   # 导出间隔（秒）
+DIAGNOSTICS_KEY = os.environ.get("PORTFOLIO_DIAGNOSTICS_KEY", "")             # ?diag=<key> 显示诊断面板
+
+@st.cache_resource
+def get_span_recorder():
+    # 进程级直方图，所有会话共享；后台线程定时导出到 METRICS_FILE
+    return SpanRecorder(METRICS_FILE, export_interval=METRICS_INTERVAL)
+
+spans = get_span_recorder()
+rerun_started = time.perf_counter()
+
+@st.cache_resource
+def get_session_memory():
+    # 进程级：每个活跃会话在共享数据集之外持有的字节数，随重跑计时一起导出为 gauge
+    memory = SessionMemory()
+    spans.add_gauges("streamlit_session_memory_bytes", "Bytes held per active session outside the shared dataset.",
+                     memory.stats)
+    return memory
+
+COUNTER_FILE = "visit_stats.db"
+LEGACY_COUNTER_FILE = "visit_stats.json"
+
+@st.cache_resource
+def get_visit_counter():
+    # 进程级单例：内存聚合，后台线程定时批量写入 SQLite (WAL)；写库耗时 / 失败次数随重跑计时一起导出
+    counter = VisitCounter(COUNTER_FILE, legacy_json=LEGACY_COUNTER_FILE)
+    spans.add_gauges("streamlit_visit_counter", "Visit counter batch writes to the shared SQLite file.", counter.stats)
+    return counter
 
 def update_daily_visits():
-    """安全更新访问量，如果出错则返回 0，绝不让程序崩溃"""
-    try:
-        today_str = datetime.date.today().isoformat()
-        
-        # 避免同一会话重复计数
-        if "has_counted" in st.session_state:
-            if os.path.exists(COUNTER_FILE):
-                try:
-                    with open(COUNTER_FILE, "r") as f:
-                        return json.load(f).get("count", 0)
-                except:
-                    return 0
-            return 0
-
-        data = {"date": today_str, "count": 0}
-        
-        # 读取文件，如果日期匹配则累加，否则重置
-        if os.path.exists(COUNTER_FILE):
-            try:
-                with open(COUNTER_FILE, "r") as f:
-                    file_data = json.load(f)
-                    if file_data.get("date") == today_str:
-                        data = file_data
-            except:
-                pass
-        
-        data["count"] += 1
-        
-        with open(COUNTER_FILE, "w") as f:
-            json.dump(data, f)
-        
+    """同一会话只计数一次；重跑时只读内存中的计数，不做文件 I/O"""
+    counter = get_visit_counter()
+    if "has_counted" not in st.session_state:
+        counter.record_visit()
         st.session_state["has_counted"] = True
-        return data["count"]
-        
-    except Exception as e:
-        return 0
+    return counter.count()
         
 # --- 权限配置 ---
-FREE_PERIOD_SECONDS = 60      # 免费试用期 60 秒
-ACCESS_DURATION_HOURS = 24    # 密码解锁后的访问时长 24 小时
-UNLOCK_CODE = "vip24"        # 预设的解锁密码
+FREE_PERIOD_SECONDS = int(os.environ.get("PORTFOLIO_FREE_PERIOD_SECONDS", "60"))        # 免费试用期 60 秒
+ACCESS_DURATION_HOURS = float(os.environ.get("PORTFOLIO_ACCESS_DURATION_HOURS", "24"))  # 密码解锁后的访问时长 24 小时
+UNLOCK_CODE = os.environ.get("PORTFOLIO_UNLOCK_CODE", "vip24")                          # 预设的解锁密码，设为空则不限制访问
+CLIENT_IP_HEADER = os.environ.get("PORTFOLIO_CLIENT_IP_HEADER", "")  # 反向代理传递客户端地址的请求头（如 X-Forwarded-For）
+# --- 准入控制：同时构图的上限与排队（见 admission.py）---
+MAX_ACTIVE_BUILDS = int(os.environ.get("PORTFOLIO_MAX_ACTIVE_BUILDS", str(max(1, (os.cpu_count() or 2) // 2))))
+MAX_QUEUED_BUILDS = int(os.environ.get("PORTFOLIO_MAX_QUEUED_BUILDS", "32"))  # 排队已满的请求直接降级
+QUEUE_WAIT_SECONDS = float(os.environ.get("PORTFOLIO_QUEUE_WAIT_SECONDS", "3"))  # 排队超过此时间改用缓存结果
 # --- 配置结束 ---
 
+@st.cache_resource
+def get_access_gate():
+    # 进程级：签名密钥 + 解锁尝试频率限制；UNLOCK_CODE 为空时不启用
+    if not UNLOCK_CODE:
+        return None
+    gate = AccessGate(load_secret(), UNLOCK_CODE, FREE_PERIOD_SECONDS, ACCESS_DURATION_HOURS)
+    spans.add_gauges("streamlit_access_gate", "Trial tokens issued, unlocks and locked reruns.", gate.stats)
+    return gate
+
+@st.cache_resource
+def get_admission():
+    # 进程级：所有会话共用构图名额；排队等待时间记入 admission.wait 直方图，计数作为 gauge 导出
+    admission = AdmissionController(MAX_ACTIVE_BUILDS, MAX_QUEUED_BUILDS, QUEUE_WAIT_SECONDS,
+                                    observe_wait=lambda ms: spans.observe("admission.wait", ms))
+    spans.add_gauges("streamlit_admission", "Concurrent figure builds, queued / rejected work and cache fallbacks.",
+                     admission.stats)
+    return admission
+
 
 # -----------------------------------------------------------------------------
 # 1. 多语言配置
 # -----------------------------------------------------------------------------
-# 语言字典 - 包含所有需要翻译的文本
-LANG = {
-    "English": {
-        "page_title": "Berkshire Portfolio | 2000-2025",
-        "title": "Berkshire Hathaway Portfolio Evolution",
-        "caption": "A 25-year interactive visualization of Warren Buffett's investment strategy (2000-2025).",
-        "sidebar_header": "⚙️ Controls",
-        "time_slider": "⏳ Select Time Period",
-        "sector_filter": "🏷️ Filter by Sector",
-        "stock_filter": "🔍 Highlight Specific Stocks",
-        "start_period": "Start Period",
-        "end_period": "End Period",
-        "top_holding": "Top Holding (Filtered)",
-        "top_sector": "Top Sector",
-        "warning_no_latest_data": "No data found for the latest selected period. Adjust filters.",
-        "warning_no_data": "No data found for the selected time and sector filters.",
-        "tab1_title": "📊 Portfolio Composition",
-        "tab2_title": "📈 Stock Deep Dive",
-        "tab3_title": "🧩 Sector Shift",
-        "tab4_title": "📘 Company Reference",
-        "tab1_sub1": "Evolution of Top Holdings (Value & Proportion)",
-        "tab1_chart1_title": "Portfolio Value by Stock (Filtered by Time & Sector)",
-        "tab1_chart1_yaxis": "Value ($ Billions)",
-        "tab1_sub2": "Proportional Changes Over Time",
-        "tab1_chart2_title": "Relative Portfolio Weight % (Filtered by Time & Sector)",
-        "tab2_sub1": "Single Stock Analysis",
-        "tab2_select_company": "Select a Company to Analyze",
-        "tab2_no_stocks": "No stocks available for analysis with current filters.",
-        "tab2_chart1_title": "{name}: Market Value History ($B)",
-        "tab2_chart2_title": "{name}: Shares Held History (Millions)",
-        "tab2_divider": "Comparison Tool",
-        "tab2_compare_label": "Compare Holdings (Value)",
-        "tab2_compare_title": "Holdings Value Comparison (Filtered)",
-        "tab3_sub1": "Strategic Shift by Sector",
-        "tab3_chart1_title": "Portfolio Value Composition by Sector (Filtered)",
-        "tab3_chart2_title": "Sector Allocation ({date}) (Filtered)",
-        "tab3_no_sector_data": "No sector data available for the latest period with current filters.",
-        "tab4_sub1": "📘 Company Reference (Full Name & Real Logo)",
-        "tab4_description": "Below are the companies appearing in the filtered data with their information:",
-        "col_logo_name": "Logo & Name",
-        "col_sector": "Sector",
-        "footer": "Designed with Streamlit & Plotly | Data based on Berkshire Hathaway 13F Filings (Top Holdings Only)"
-    },
-    "中文": {
-        "page_title": "伯克希尔投资组合 | 2000-2025",
-        "title": "伯克希尔·哈撒韦投资组合演变",
-        "caption": "巴菲特25年投资策略的交互式可视化分析 (2000-2025)",
-        "sidebar_header": "⚙️ 控制面板",
-        "time_slider": "⏳ 选择时间范围",
-        "sector_filter": "🏷️ 按行业筛选",
-        "stock_filter": "🔍 高亮特定股票",
-        "start_period": "开始时间",
-        "end_period": "结束时间",
-        "top_holding": "最大持仓 (已筛选)",
-        "top_sector": "主要行业",
-        "warning_no_latest_data": "所选最新时间段无数据，请调整筛选条件。",
-        "warning_no_data": "所选时间和行业筛选条件下无数据。",
-        "tab1_title": "📊 投资组合构成",
-        "tab2_title": "📈 个股深度分析",
-        "tab3_title": "🧩 行业变迁",
-        "tab4_title": "📘 公司参考",
-        "tab1_sub1": "主要持仓演变 (价值与占比)",
-        "tab1_chart1_title": "股票持仓价值 (按时间和行业筛选)",
-        "tab1_chart1_yaxis": "价值 (十亿美元)",
-        "tab1_sub2": "持仓占比变化趋势",
-        "tab1_chart2_title": "持仓权重占比 % (按时间和行业筛选)",
-        "tab2_sub1": "个股分析",
-        "tab2_select_company": "选择要分析的公司",
-        "tab2_no_stocks": "当前筛选条件下无可分析的股票。",
-        "tab2_chart1_title": "{name}: 市值历史 (十亿美元)",
-        "tab2_chart2_title": "{name}: 持股数量历史 (百万股)",
-        "tab2_divider": "对比分析工具",
-        "tab2_compare_label": "对比持仓价值",
-        "tab2_compare_title": "持仓价值对比 (已筛选)",
-        "tab3_sub1": "行业配置战略变迁",
-        "tab3_chart1_title": "行业持仓价值构成 (已筛选)",
-        "tab3_chart2_title": "行业配置占比 ({date}) (已筛选)",
-        "tab3_no_sector_data": "当前筛选条件下最新时间段无行业数据。",
-        "tab4_sub1": "📘 公司参考 (全名与真实Logo)",
-        "tab4_description": "以下是筛选后的数据中出现的公司及其信息：",
-        "col_logo_name": "Logo & 名称",
-        "col_sector": "行业",
-        "footer": "使用 Streamlit & Plotly 制作 | 数据基于伯克希尔·哈撒韦 13F 备案文件 (仅主要持仓)"
-    }
-}
+# 语言字典见 i18n.py（离线导出等工具共用）
 
 
 # 在侧边栏顶部添加语言选择器
@@ -233,14 +189,6 @@ st.markdown("""
     h2 {font-family: 'Helvetica Neue', sans-serif; font-weight: 600; letter-spacing: -0.5px; color: #333;}
     .stMetric {background-color: #f9f9f9; padding: 10px; border-radius: 5px; border: 1px solid #eee;}
     
-    /* 优化表格中 Logo 的显示 */
-    table img {
-        border-radius: 5px;
-        vertical-align: middle;
-        margin-right: 8px;
-        width: 30px;
-        height: 30px;
-    }
     .ref-ticker-col {font-weight: bold; color: #3498DB;}
     
     /* 中文字体优化 */
@@ -250,224 +198,242 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # -----------------------------------------------------------------------------
-# 3. 数据准备 (内置全量清洗后的数据)
+# 访问控制：免费试用期 + 解锁码（签名令牌，见 access_gate.py）
+# 试用期结束且未解锁的会话停在这里，不加载数据、不构建图表；
+# 通过检查的会话构图时还要拿到进程级的构图名额（准入控制，见 plot()）
 # -----------------------------------------------------------------------------
-@st.cache_data
-def load_data():
-    # 核心映射数据：新增全名映射（中英文）
-    full_name_map = {
-        'AAPL': {'en': 'Apple Inc.', 'zh': '苹果公司'},
-        'AXP': {'en': 'American Express Company', 'zh': '美国运通公司'},
-        'BAC': {'en': 'Bank of America Corporation', 'zh': '美国银行'},
-        'KO': {'en': 'The Coca-Cola Company', 'zh': '可口可乐公司'},
-        'CVX': {'en': 'Chevron Corporation', 'zh': '雪佛龙公司'},
-        'OXY': {'en': 'Occidental Petroleum Corporation', 'zh': '西方石油公司'},
-        'MCO': {'en': 'Moody\'s Corporation', 'zh': '穆迪公司'},
-        'KHC': {'en': 'The Kraft Heinz Company', 'zh': '卡夫亨氏公司'},
-        'CB': {'en': 'Chubb Limited', 'zh': '丘博保险'},
-        'GOOGL': {'en': 'Alphabet Inc. (Google)', 'zh': '字母表公司 (谷歌)'},
-        'DVA': {'en': 'DaVita Inc.', 'zh': '达维塔公司'},
-        'KR': {'en': 'The Kroger Co.', 'zh': '克罗格公司'},
-        'DPZ': {'en': 'Domino\'s Pizza, Inc.', 'zh': '达美乐披萨'},
-        'POOL': {'en': 'Pool Corporation', 'zh': '普尔公司'},
-        'IBM': {'en': 'International Business Machines Corp.', 'zh': 'IBM公司'},
-        'WFC': {'en': 'Wells Fargo & Company', 'zh': '富国银行'},
-        'PG': {'en': 'The Procter & Gamble Company', 'zh': '宝洁公司'},
-        'VZ': {'en': 'Verizon Communications Inc.', 'zh': '威瑞森通信'},
-        'USB': {'en': 'U.S. Bancorp', 'zh': '美国合众银行'},
-        'JPM': {'en': 'JPMorgan Chase & Co.', 'zh': '摩根大通'},
-        'C': {'en': 'Citigroup Inc.', 'zh': '花旗集团'},
-        'V': {'en': 'Visa Inc.', 'zh': '维萨公司'},
-        'MA': {'en': 'Mastercard Incorporated', 'zh': '万事达卡公司'},
-        'AMZN': {'en': 'Amazon.com, Inc.', 'zh': '亚马逊公司'},
-        'ATVI': {'en': 'Activision Blizzard', 'zh': '动视暴雪'},
-        'HPQ': {'en': 'HP Inc.', 'zh': '惠普公司'},
-        'PARA': {'en': 'Paramount Global', 'zh': '派拉蒙全球'},
-        'WPO': {'en': 'The Washington Post Company', 'zh': '华盛顿邮报公司'},
-        'G': {'en': 'The Gillette Company', 'zh': '吉列公司'},
-        'COP': {'en': 'ConocoPhillips', 'zh': '康菲石油公司'},
-        'KFT': {'en': 'Kraft Foods', 'zh': '卡夫食品'},
-        'WSC': {'en': 'Wesco Financial', 'zh': '韦斯科金融公司'},
-        'BNI': {'en': 'BNSF Railway Co.', 'zh': 'BNSF铁路公司'},
-        'PSX': {'en': 'Phillips 66', 'zh': '菲利普斯66公司'},
-        'TSM': {'en': 'Taiwan Semiconductor (TSM)', 'zh': '台积电'},
-        'UNH': {'en': 'UnitedHealth Group', 'zh': '联合健康集团'},
-        'JNJ': {'en': 'Johnson & Johnson', 'zh': '强生公司'},
-        'SNOW': {'en': 'Snowflake Inc.', 'zh': '雪花公司'},
-        'VRSN': {'en': 'VeriSign Inc.', 'zh': '威瑞信公司'},
-        'BK': {'en': 'Bank of New York Mellon Corporation', 'zh': '纽约梅隆银行'},
-        'WMT': {'en': 'Walmart Inc.', 'zh': '沃尔玛公司'},
-        'COST': {'en': 'Costco Wholesale Corporation', 'zh': '开市客公司'},
-        'BUD': {'en': 'Anheuser-Busch InBev SA/NV', 'zh': '百威英博'},
-        'DIS': {'en': 'The Walt Disney Company', 'zh': '迪士尼公司'},
-        'CHTR': {'en': 'Charter Communications Inc.', 'zh': '特许通信公司'},
-        'XOM': {'en': 'Exxon Mobil Corporation', 'zh': '埃克森美孚公司'},
-        'DAL': {'en': 'Delta Air Lines Inc.', 'zh': '达美航空公司'},
-        'LUV': {'en': 'Southwest Airlines Co.', 'zh': '西南航空公司'},
-        'UAL': {'en': 'United Airlines Holdings Inc.', 'zh': '联合航空控股公司'},
-        'AAL': {'en': 'American Airlines Group Inc.', 'zh': '美国航空集团'},
-        'ABBV': {'en': 'AbbVie Inc.', 'zh': '艾伯维公司'},
-        'MRK': {'en': 'Merck & Co. Inc.', 'zh': '默克公司'},
-        'HRB': {'en': 'H&R Block Inc.', 'zh': 'H&R布洛克公司'},
-        'MTB': {'en': 'M&T Bank Corporation', 'zh': 'M&T银行'}
-    }
-    
-    # 行业映射（中英文）
-    sector_map = {
-        'Technology': {'en': 'Technology', 'zh': '科技'},
-        'Financials': {'en': 'Financials', 'zh': '金融'},
-        'Consumer Staples': {'en': 'Consumer Staples', 'zh': '必选消费'},
-        'Consumer Discretionary': {'en': 'Consumer Discretionary', 'zh': '可选消费'},
-        'Comm/Media': {'en': 'Comm/Media', 'zh': '通信/媒体'},
-        'Energy': {'en': 'Energy', 'zh': '能源'},
-        'Industrials': {'en': 'Industrials', 'zh': '工业'},
-        'Healthcare': {'en': 'Healthcare', 'zh': '医疗健康'},
-        'Others': {'en': 'Others', 'zh': '其他'}
-    }
-    
-    # 股票行业映射
-    ticker_sector_map = {
-        'AAPL': 'Technology', 'IBM': 'Technology', 'HPQ': 'Technology', 'SNOW': 'Technology', 'GOOGL': 'Technology', 'VRSN': 'Technology', 'ATVI': 'Technology', 'TSM': 'Technology',
-        'BAC': 'Financials', 'AXP': 'Financials', 'WFC': 'Financials', 'USB': 'Financials', 'C': 'Financials', 'JPM': 'Financials', 'MCO': 'Financials', 'BK': 'Financials', 'CB': 'Financials', 'MA': 'Financials', 'V': 'Financials', 'WSC': 'Financials', 'MTB': 'Financials',
-        'KO': 'Consumer Staples', 'KHC': 'Consumer Staples', 'KFT': 'Consumer Staples', 'PG': 'Consumer Staples', 'WMT': 'Consumer Staples', 'KR': 'Consumer Staples', 'COST': 'Consumer Staples', 'BUD': 'Consumer Staples',
-        'G': 'Consumer Discretionary', 'WPO': 'Comm/Media', 'DPZ': 'Consumer Discretionary', 'DIS': 'Comm/Media', 'CHTR': 'Comm/Media', 'PARA': 'Comm/Media', 'VZ': 'Comm/Media', 'POOL': 'Consumer Discretionary', 'HRB': 'Consumer Discretionary',
-        'CVX': 'Energy', 'OXY': 'Energy', 'XOM': 'Energy', 'COP': 'Energy', 'PSX': 'Energy',
-        'BNI': 'Industrials', 'DAL': 'Industrials', 'LUV': 'Industrials', 'UAL': 'Industrials', 'AAL': 'Industrials',
-        'DVA': 'Healthcare', 'JNJ': 'Healthcare', 'ABBV': 'Healthcare', 'MRK': 'Healthcare', 'UNH': 'Healthcare',
-    }
-
-    # 使用Google Favicon API获取logo URL
-    def get_google_logo_url(ticker):
-        domain_map = {
-            'AAPL': 'apple.com', 'AXP': 'americanexpress.com', 'BAC': 'bankofamerica.com',
-            'KO': 'coca-colacompany.com', 'CVX': 'chevron.com', 'OXY': 'oxy.com',
-            'MCO': 'moodys.com', 'KHC': 'kraftheinzcompany.com', 'CB': 'chubb.com',
-            'GOOGL': 'google.com', 'DVA': 'davita.com', 'KR': 'kroger.com',
-            'DPZ': 'dominos.com', 'POOL': 'poolcorp.com', 'IBM': 'ibm.com',
-            'WFC': 'wellsfargo.com', 'PG': 'pg.com', 'VZ': 'verizon.com',
-            'USB': 'usbank.com', 'JPM': 'jpmorganchase.com', 'C': 'citi.com',
-            'V': 'visa.com', 'MA': 'mastercard.com', 'AMZN': 'amazon.com',
-            'ATVI': 'activisionblizzard.com', 'HPQ': 'hp.com', 'PARA': 'paramount.com',
-            'WPO': 'washingtonpost.com', 'G': 'gillette.com', 'COP': 'conocophillips.com',
-            'KFT': 'kraftfoods.com', 'WSC': 'wesco.com', 'BNI': 'bnsf.com',
-            'PSX': 'phillips66.com', 'TSM': 'tsmc.com', 'UNH': 'unitedhealthgroup.com',
-            'JNJ': 'jnj.com', 'SNOW': 'snowflake.com', 'VRSN': 'verisign.com',
-            'BK': 'bnymellon.com', 'WMT': 'walmart.com', 'COST': 'costco.com',
-            'BUD': 'ab-inbev.com', 'DIS': 'disney.com', 'CHTR': 'charter.com',
-            'XOM': 'exxonmobil.com', 'DAL': 'delta.com', 'LUV': 'southwest.com',
-            'UAL': 'united.com', 'AAL': 'aa.com', 'ABBV': 'abbvie.com',
-            'MRK': 'merck.com', 'HRB': 'hrblock.com', 'MTB': 'mtb.com'
-        }
-        domain = domain_map.get(ticker, 'google.com')
-        size = 30
-        return f"https://www.google.com/s2/favicons?domain={domain}&sz={size}"
-    
-    raw_data = [
-        ('2025 Q3', 'AAPL', 238.0, 60.6, 22.7), ('2025 Q3', 'AXP', 151.6, 50.3, 18.8), ('2025 Q3', 'BAC', 568.3, 29.3, 11.0), ('2025 Q3', 'KO', 400.0, 26.5, 9.9), ('2025 Q3', 'CVX', 122.1, 18.9, 7.1), ('2025 Q3', 'OXY', 265.3, 13.0, 4.9), ('2025 Q3', 'MCO', 24.7, 11.0, 4.1), ('2025 Q3', 'KHC', 325.6, 10.5, 3.9), ('2025 Q3', 'CB', 31.3, 8.8, 3.3), ('2025 Q3', 'GOOGL', 17.8, 4.3, 1.6), ('2025 Q3', 'DVA', 32.2, 4.2, 1.6), ('2025 Q3', 'KR', 50.0, 2.8, 1.0), ('2025 Q3', 'DPZ', 3.0, 1.3, 0.5), ('2025 Q3', 'POOL', 3.5, 1.1, 0.4),
-        ('2024 Q4', 'AAPL', 300.0, 69.9, 25.0), ('2024 Q4', 'AXP', 151.6, 48.2, 17.3), ('2024 Q4', 'BAC', 700.0, 31.5, 11.3), ('2024 Q4', 'KO', 400.0, 25.2, 9.0), ('2024 Q4', 'CVX', 118.6, 18.3, 6.5), ('2024 Q4', 'OXY', 255.0, 14.8, 5.3), ('2024 Q4', 'KHC', 325.6, 11.1, 3.9), ('2024 Q4', 'MCO', 24.7, 10.6, 3.8), ('2024 Q4', 'CB', 27.0, 7.6, 2.7), ('2024 Q4', 'DVA', 36.1, 4.5, 1.6), ('2024 Q4', 'C', 55.2, 3.5, 1.2), ('2024 Q4', 'KR', 50.0, 2.7, 0.9),
-        ('2023 Q4', 'AAPL', 905.6, 174.3, 50.1), ('2023 Q4', 'BAC', 1032.9, 34.8, 10.0), ('2023 Q4', 'AXP', 151.6, 28.4, 8.2), ('2023 Q4', 'KO', 400.0, 23.6, 6.8), ('2023 Q4', 'CVX', 126.1, 18.8, 5.4), ('2023 Q4', 'OXY', 248.0, 14.8, 4.3), ('2023 Q4', 'KHC', 325.6, 12.0, 3.5), ('2023 Q4', 'MCO', 24.7, 9.6, 2.8),
-        ('2022 Q4', 'AAPL', 895.1, 116.3, 38.9), ('2022 Q4', 'BAC', 1010.1, 33.5, 11.2), ('2022 Q4', 'CVX', 163.0, 29.3, 9.8), ('2022 Q4', 'KO', 400.0, 25.4, 8.5), ('2022 Q4', 'AXP', 151.6, 22.4, 7.5), ('2022 Q4', 'KHC', 325.6, 13.3, 4.4), ('2022 Q4', 'OXY', 194.4, 12.2, 4.1), ('2022 Q4', 'MCO', 24.7, 6.9, 2.3),
-        ('2021 Q4', 'AAPL', 887.1, 157.5, 47.6), ('2021 Q4', 'BAC', 1010.1, 44.9, 13.6), ('2021 Q4', 'AXP', 151.6, 24.8, 7.5), ('2021 Q4', 'KO', 400.0, 23.7, 7.2), ('2021 Q4', 'KHC', 325.6, 11.7, 3.5), ('2021 Q4', 'MCO', 24.7, 9.6, 2.9), ('2021 Q4', 'VZ', 158.8, 8.3, 2.5),
-        ('2020 Q4', 'AAPL', 887.1, 117.7, 43.6), ('2020 Q4', 'BAC', 1010.1, 30.6, 11.3), ('2020 Q4', 'KO', 400.0, 21.9, 8.1), ('2020 Q4', 'AXP', 151.6, 18.3, 6.8), ('2020 Q4', 'VZ', 146.7, 8.6, 3.2), ('2020 Q4', 'KHC', 325.6, 11.3, 4.2), ('2020 Q4', 'MCO', 24.7, 7.2, 2.7), ('2020 Q4', 'USB', 131.1, 6.1, 2.3),
-        ('2019 Q4', 'AAPL', 245.2, 72.0, 29.7), ('2019 Q4', 'BAC', 925.0, 32.6, 13.5), ('2019 Q4', 'KO', 400.0, 22.1, 9.2), ('2019 Q4', 'AXP', 151.6, 18.9, 7.8), ('2019 Q4', 'WFC', 323.2, 17.4, 7.2), ('2019 Q4', 'KHC', 325.6, 10.5, 4.3), ('2019 Q4', 'JPM', 59.5, 8.3, 3.4),
-        ('2015 Q4', 'WFC', 479.7, 26.1, 19.8), ('2015 Q4', 'KHC', 325.6, 23.7, 17.9), ('2015 Q4', 'KO', 400.0, 17.2, 13.0), ('2015 Q4', 'IBM', 81.0, 11.2, 8.4), ('2015 Q4', 'AXP', 151.6, 10.5, 8.0), ('2015 Q4', 'PSX', 61.5, 4.9, 3.7), ('2015 Q4', 'PG', 52.8, 4.2, 3.2),
-        ('2010 Q4', 'KO', 200.0, 13.2, 25.0), ('2010 Q4', 'WFC', 342.6, 10.6, 20.2), ('2010 Q4', 'AXP', 151.6, 6.5, 12.4), ('2010 Q4', 'PG', 76.1, 4.9, 9.3), ('2010 Q4', 'KFT', 105.2, 3.3, 6.3), ('2010 Q4', 'JNJ', 42.6, 2.6, 5.0),
-        ('2005 Q4', 'AXP', 151.6, 7.8, 16.8), ('2005 Q4', 'KO', 200.0, 8.1, 17.3), ('2005 Q4', 'PG', 96.3, 5.6, 12.0), ('2005 Q4', 'WFC', 56.4, 3.5, 7.6), ('2005 Q4', 'MCO', 48.0, 3.0, 6.4), ('2005 Q4', 'WSC', 5.7, 2.1, 4.6), ('2005 Q4', 'WPO', 1.7, 1.3, 2.8),
-        ('2000 Q4', 'KO', 200.0, 12.2, 31.5), ('2000 Q4', 'AXP', 151.6, 8.3, 21.6), ('2000 Q4', 'G', 96.0, 3.5, 8.9), ('2000 Q4', 'WFC', 23.7, 2.7, 6.9), ('2000 Q4', 'WSC', 5.7, 1.7, 4.3), ('2000 Q4', 'WPO', 1.7, 1.0, 2.6)
-    ]
-
-    # DataFrame 初始化
-    df = pd.DataFrame(raw_data, columns=['Quarter', 'Ticker', 'Shares_Millions', 'Value_Billions', 'Percent_Portfolio'])
-    
-    # 数据清洗和映射
-    def parse_quarter(q_str):
-        year, q = q_str.split(' ')
-        if q == 'Q1': return f"{year}-03-31"
-        if q == 'Q2': return f"{year}-06-30"
-        if q == 'Q3': return f"{year}-09-30"
-        if q == 'Q4': return f"{year}-12-31"
-    
-    df['Date'] = pd.to_datetime(df['Quarter'].apply(parse_quarter))
-    
-    # 根据语言获取行业名称
-    def get_sector_name(ticker):
-        sector_key = ticker_sector_map.get(ticker, 'Others')
-        return sector_map[sector_key]
-    
-    df['Sector_En'] = df['Ticker'].apply(lambda x: get_sector_name(x)['en'])
-    df['Sector_Zh'] = df['Ticker'].apply(lambda x: get_sector_name(x)['zh'])
-    
-    # 根据语言获取公司全名
-    def get_company_name(ticker, lang):
-        lang_key = 'en' if lang == 'English' else 'zh'
-        return full_name_map.get(ticker, {}).get(lang_key, ticker)
-    
-    # 临时存储，后续根据当前语言选择
-    df['Full_Name_En'] = df['Ticker'].apply(lambda x: get_company_name(x, 'English'))
-    df['Full_Name_Zh'] = df['Ticker'].apply(lambda x: get_company_name(x, '中文'))
-    
-    # 生成Logo的img标签
-    df['Logo_URL'] = df['Ticker'].apply(lambda t: get_google_logo_url(t))
-    df['Logo_HTML'] = df['Logo_URL'].apply(lambda url: f'<img src="{url}" alt="logo" width="30" height="30">')
-    
-    df = df.sort_values(by=['Date', 'Value_Billions'], ascending=[True, False])
-    return df, full_name_map, sector_map, ticker_sector_map
-
-# 加载数据
-df, full_name_map, sector_map, ticker_sector_map = load_data()
+access_gate = get_access_gate()
+admission = get_admission()
+
+def client_address():
+    """解锁限频的客户端标识：受信任代理头中的第一个地址，否则为连接的对端地址"""
+    if CLIENT_IP_HEADER:
+        forwarded = st.context.headers.get(CLIENT_IP_HEADER, "")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return st.context.ip_address or "local"
+
+def unlock_form(container, key):
+    """解锁码表单（输入时不触发重跑）；解锁后令牌写入会话状态和 URL，刷新页面仍然有效"""
+    with container.form(key, clear_on_submit=True):
+        code = st.text_input(t["gate_code"], type="password")
+        submitted = st.form_submit_button(t["gate_unlock"])
+    if submitted:
+        access, error = access_gate.unlock(code, client_address())
+        if access is not None:
+            st.session_state["access_token"] = st.query_params["access"] = access.token
+            st.rerun()
+        container.error(t["gate_too_many"] if error == "too_many" else t["gate_wrong_code"])
+
+def require_access():
+    """fragment 单独重跑时不经过主脚本的检查：试用期已过则整页重跑，显示解锁页"""
+    if access_gate is not None and access_gate.expired(st.session_state.get("access_token")):
+        st.rerun(scope="app")
+
+if access_gate is not None:
+    with spans.span("access_gate"):
+        access, remaining = access_gate.check(st.session_state.get("access_token") or st.query_params.get("access"))
+    st.session_state["access_token"] = access.token
+    if st.query_params.get("access") != access.token:
+        st.query_params["access"] = access.token
+    if remaining <= 0:
+        st.title(t["title"])
+        st.warning(t["gate_locked"].format(hours=f"{ACCESS_DURATION_HOURS:g}"))
+        unlock_form(st, "unlock_locked")
+        st.stop()
+    if access.kind == "trial":
+        st.sidebar.caption(t["gate_trial"].format(seconds=int(remaining)))
+        unlock_form(st.sidebar.expander(t["gate_unlock_expander"]), "unlock_trial")
+    else:
+        st.sidebar.caption(t["gate_unlocked"].format(hours=remaining / 3600))
 
-# 根据当前语言更新数据列
+# -----------------------------------------------------------------------------
+# 3. 数据准备 (每个机构一份列式快照：data/holdings.csv -> data/holdings.arrow，
+#    其他机构在 data/filers/<id>/ 下，见 filer_store.py)
+# -----------------------------------------------------------------------------
+FILER_CACHE_MB = int(os.environ.get("PORTFOLIO_FILER_CACHE_MB", "1024"))  # 已加载机构数据集的内存上限
+CACHE_URL = os.environ.get("PORTFOLIO_CACHE_URL", "")                    # 跨副本共享缓存（默认关闭），见 shared_cache.py
+CACHE_MAX_MB = int(os.environ.get("PORTFOLIO_CACHE_MAX_MB", "512"))      # 磁盘共享缓存的大小上限
+
+@st.cache_resource
+def get_shared_cache():
+    # 设置 PORTFOLIO_CACHE_URL 后多个副本 / 重启后的进程共享：快照与序列化图表按数据集版本哈希存放，新进程无需冷启动重算；
+    # 未设置时返回 None，只使用进程内缓存
+    return shared_cache.open_cache(CACHE_URL, max_bytes=CACHE_MAX_MB * 1024 * 1024)
+
+@st.cache_resource
+def get_filer_store():
+    # 进程级共享：按机构内存映射快照，已加载的数据集按内存大小 LRU 淘汰
+    return FilerStore(max_bytes=FILER_CACHE_MB * 1024 * 1024, shared=get_shared_cache())
+
+REFRESH_SECONDS = float(os.environ.get("PORTFOLIO_REFRESH_SECONDS", "60"))  # 数据目录轮询间隔，0 关闭
+
+@st.cache_resource
+def get_data_refresher():
+    # 后台线程：新季度到达时只导入 / 追加该季度，并只清除覆盖该季度的图表缓存；在线会话不中断
+    return DataRefresher(get_filer_store(), get_figure_cache(), interval=REFRESH_SECONDS)
+
+def load_data(filer_id=DEFAULT_FILER):
+    # 快照缺失或源数据变化时自动重建；派生列 (Date/Sector/Full_Name/Logo) 已在构建时预计算
+    # 进程级共享的只读数据集：整数编码 + 每种语言一份标签视图，以及 季度 × 股票 预计算矩阵
+    return get_filer_store().dataset(filer_id)
+
+@st.cache_resource
+def get_daily_marks():
+    # 进程级共享：内存映射的日线价格 + 每个数据集的每日盯市估值（价格只追加新交易日时增量计算）
+    return DailyMarks()
+
+@st.cache_resource
+def get_figure_cache():
+    # 进程级共享：所有会话命中同一份已序列化的图表；本进程未命中时再查跨副本共享缓存
+    return FigureCache(shared=get_shared_cache())
+
+@st.cache_resource(max_entries=8)
+def get_figure_templates(filer_id, version, lang_key, _dataset, _t):
+    # 进程级共享：每个 数据集 × 语言 的图表骨架；数据刷新后 version 变化即重建。骨架不引用数据集，
+    # FilerStore 淘汰的数据集不会被这里保留
+    return FigureTemplates(_dataset, lang_key, _t)
+
+@st.cache_resource(max_entries=8)
+def get_client_payload(filer_id, version, lang_key, _dataset, _t, _templates):
+    # 进程级共享：浏览器端筛选组件的二进制载荷，每个 数据集 × 语言 编码一次
+    return client_filter.build_payload(_dataset, lang_key, _t, _templates)
+
+@st.cache_resource
+def get_plotlyjs():
+    # 进程级：浏览器端筛选组件使用的本地 plotly.js（不访问 CDN）
+    return client_filter.plotlyjs()
+
+@st.cache_resource
+def get_logo_bundle():
+    # 本地 Logo 资源包 (data-URI)；表格行只引用 CSS 类，样式按页输出
+    return portfolio_data.load_logo_bundle()
+
+# 根据当前语言切换视图（预先构建，无需复制或逐行计算）
 current_lang = 'en' if lang == 'English' else 'zh'
-df['Sector'] = df[f'Sector_{current_lang.capitalize()}']
-df['Full_Name'] = df[f'Full_Name_{current_lang.capitalize()}']
-df['Logo_Name'] = df.apply(lambda row: f"{row['Full_Name']} ({row['Ticker']})", axis=1)
+
+# 机构选择（注册表中只有一个机构时不显示）
+filer_store = get_filer_store()
+data_refresher = get_data_refresher()
+filer_ids = filer_store.filer_ids()
+if len(filer_ids) > 1:
+    filer_id = st.sidebar.selectbox(
+        t["filer_select"], filer_ids, key="filer",
+        format_func=lambda fid: filer_store.filer_name(fid, current_lang)
+    )
+else:
+    filer_id = filer_ids[0]
+filer_name = filer_store.filer_name(filer_id, current_lang)
+
+# 加载数据（所有会话共享同一对象，只读）
+with spans.span("load_data"):
+    dataset = load_data(filer_id)
+cube = dataset.cube
+
+with spans.span("lang_mapping"):
+    df = dataset.view(current_lang)
+
+TYPEAHEAD_LIMIT = 20  # 选择框中最多列出的匹配数
+
+def typeahead(container, dataset, label, key, lang_key, t, mask=None, multi=False, default=None, logo=False):
+    """
+    公司选择：输入框查询进程级共享的搜索索引（代码 / 英文名 / 中文名 / 拼音），
+    选择框只包含得分最高的 TYPEAHEAD_LIMIT 条匹配和已选中的项，不再发送全部公司。
+    选项值为股票代码（切换语言后选择保持不变）；multi=False 时返回单个代码（没有匹配时为 None）
+    """
+    query = container.text_input(label, key=f"{key}_query", placeholder=t["search_placeholder"])
+    with spans.span("search"):
+        matches = list(dataset.search.search(query, lang_key, mask, TYPEAHEAD_LIMIT))
+    in_scope = set(dataset.cube.tickers if mask is None else dataset.cube.tickers[mask])
+    # 已选中的项保留在选项中；不在当前数据 / 筛选范围内的（如切换机构或缩小时间范围后）丢弃
+    if multi:
+        selected = [tk for tk in st.session_state.get(key, default or []) if tk in in_scope]
+        options = selected + [tk for tk in matches if tk not in selected]
+        st.session_state[key] = selected
+    else:
+        current = st.session_state.get(key, default)
+        if current not in in_scope:
+            current = None
+        options = matches if current is None or current in matches else [current] + matches
+        if not options:
+            return None
+        st.session_state[key] = current if current is not None else options[0]
+    widget = container.multiselect if multi else container.selectbox
+    return widget(
+        label, options, key=key, label_visibility="collapsed",
+        format_func=lambda tk: dataset.ticker_label(tk, lang_key, logo=logo)
+    )
 
 # -----------------------------------------------------------------------------
 # 4. Sidebar 控制区
 # -----------------------------------------------------------------------------
 st.sidebar.header(t["sidebar_header"])
 
-# 时间线滑块
-min_date = df['Date'].min().to_pydatetime()
-max_date = df['Date'].max().to_pydatetime()
+# 浏览器端筛选：Tab 1 / Tab 3 的时间范围、行业、高亮筛选在浏览器中完成（见 client_filter.py），
+# 侧边栏不再显示这些筛选器；其他 Tab 使用组件最近一次回传的筛选条件
+client_mode = st.sidebar.toggle(t["client_mode"], key="client_mode", help=t["client_mode_help"])
 
-date_range = st.sidebar.slider(
-    t["time_slider"],
-    min_value=min_date,
-    max_value=max_date,
-    value=(min_date, max_date),
-    format="YYYY-MM"
-)
-start_date, end_date = date_range
+if client_mode:
+    q_start, q_end, sector_selection = client_filter.server_filters(st.session_state.get("client_filters"), cube)
+    selected_tickers = []
+else:
+    # 时间线滑块
+    min_date = pd.Timestamp(cube.dates[0]).to_pydatetime()
+    max_date = pd.Timestamp(cube.dates[-1]).to_pydatetime()
+
+    date_range = st.sidebar.slider(
+        t["time_slider"],
+        min_value=min_date,
+        max_value=max_date,
+        value=(min_date, max_date),
+        format="YYYY-MM"
+    )
+    start_date, end_date = date_range
+
+    # 行业筛选器 - 使用当前语言的行业名称
+    all_sectors = sorted(df['Sector'].unique())
+    selected_sectors = st.sidebar.multiselect(t["sector_filter"], all_sectors, default=all_sectors)
+
+    # 公司筛选器 - 服务端搜索（代码 / 中英文名 / 拼音），只列出前若干条匹配
+    selected_tickers = typeahead(st.sidebar, dataset, t["stock_filter"], "stock_filter", current_lang, t, multi=True)
 
-# 行业筛选器 - 使用当前语言的行业名称
-all_sectors = sorted(df['Sector'].unique())
-selected_sectors = st.sidebar.multiselect(t["sector_filter"], all_sectors, default=all_sectors)
+# 每日盯市：有本地价格文件 (data/prices.arrow) 时可选，Tab 1 / Tab 3 面积图改为按交易日重建的市值
+daily_marks = get_daily_marks()
+daily_mode = not client_mode and daily_marks.available() and st.sidebar.toggle(t["daily_mode"], key="daily_mode", help=t["daily_mode_help"])
+with spans.span("daily_marks"):
+    valuation = daily_marks.get(dataset) if daily_mode else None
 
-# 公司筛选器 - 使用当前语言的公司全名
-all_full_names = sorted([name for name in df['Full_Name'].unique() if pd.notna(name)])
-selected_full_names = st.sidebar.multiselect(t["stock_filter"], all_full_names, default=[])
+# 时间轴回放：Tab 1 / Tab 3 的面积图改为预先生成全部季度帧的动画图表，在浏览器端播放（见 timeline_frames.py）
+playback_mode = not client_mode and st.sidebar.toggle(t["playback_mode"], key="playback_mode", help=t["playback_mode_help"])
 
 # -----------------------------------------------------------------------------
 # 5. 数据筛选应用
 # -----------------------------------------------------------------------------
-# 1. 行业筛选
-filtered_df = df[df['Sector'].isin(selected_sectors)]
-
-# 2. 时间筛选
-filtered_df = filtered_df[
-    (filtered_df['Date'] >= start_date) & 
-    (filtered_df['Date'] <= end_date)
-]
+# 1. 时间筛选 -> 季度下标区间；2. 行业筛选 -> 行业布尔向量（均基于预计算矩阵，无需整表比较）
+with spans.span("filter"):
+    if not client_mode:
+        q_start, q_end = cube.date_index_range(start_date, end_date)
+        sector_selection = cube.sector_selection(selected_sectors, current_lang)
+    filtered_df = dataset.filter(current_lang, q_start, q_end, sector_selection)
 
 # 3. 选中公司筛选 (仅高亮)
-highlighted_df = filtered_df[filtered_df['Full_Name'].isin(selected_full_names)] if selected_full_names else None
+with spans.span("filter.highlight"):
+    highlighted_df = filtered_df[filtered_df['Ticker'].isin(selected_tickers)] if selected_tickers else None
+
+# 图表缓存键：规范化后的筛选状态（时间范围按季度下标，行业按下标，公司名排序）
+# filter_key 不含高亮，供不受高亮影响的图表 (Tab 2/3) 使用
+filter_key = (dataset.lineage, lang, q_start, q_end, tuple(np.flatnonzero(sector_selection).tolist()))
+view_key = filter_key + (tuple(sorted(selected_tickers)),)
 
 # -----------------------------------------------------------------------------
 # 6. 主内容区
 # -----------------------------------------------------------------------------
-st.title(t["title"])
-st.caption(t["caption"])
+if filer_id == DEFAULT_FILER:
+    st.title(t["title"])
+    st.caption(t["caption"])
+else:
+    st.title(t["title_filer"].format(filer=filer_name))
+    st.caption(t["caption_filer"].format(filer=filer_name))
 
 if not filtered_df.empty:
     latest_date_filtered = filtered_df['Date'].max()
@@ -493,148 +459,345 @@ else:
 # -----------------------------------------------------------------------------
 # 7. 可视化 Tab 页
 # -----------------------------------------------------------------------------
-tab1, tab2, tab3, tab4 = st.tabs([t["tab1_title"], t["tab2_title"], t["tab3_title"], t["tab4_title"]])
+# 每个 Tab 是一个独立的渲染函数，依赖的侧边栏状态全部通过参数显式传入。
+# - 只有当前打开的 Tab 会执行（on_change="rerun" + tab.open），其他 Tab 在首次打开时才构建
+# - Tab 2 是 fragment：选择公司 / 对比列表只重跑这个 Tab，不影响其他图表
+# - 每个 Tab、每张图的构建 (px.*) 与输出 (st.plotly_chart 序列化) 分别计时
+
+def cache_scope(filter_key):
+    # filter_key = (lineage, 语言, q_start, q_end, 行业下标)；数据刷新时按季度区间清除缓存
+    lineage, _, q_start, q_end = filter_key[:4]
+    return lineage, q_start, q_end
+
+def fallback_group(key, scope):
+    # 键 = 图表名 (+ 股票等) + filter_key；取到 (lineage, 语言) 为止的部分作分组，忽略季度区间 / 行业 / 高亮
+    if scope is None:
+        return None
+    return next((key[:i + 2] for i in range(len(key) - 1) if key[i:i + 2] == (scope[0], lang)), None)
+
+def busy_fallback(name, key, scope):
+    """
+    构图名额已满（排队超时或队列已满）：返回同一图表在同一数据集 / 语言下最近缓存的视图（筛选条件可能不同），
+    没有可用的视图时返回 None 并提示稍后重试
+    """
+    group = fallback_group(key, scope)
+    fig = get_figure_cache().latest(group) if group else None
+    admission.fallback("stale" if fig is not None else "busy")
+    if fig is None:
+        st.info(t["busy_unavailable"])
+        st.button(t["busy_retry"], key=f"busy_retry_{name}")
+    else:
+        st.caption(t["busy_stale"])
+    return fig
+
+def plot(name, key, build, scope=None):
+    """取缓存或构建图表并输出；px.<name> 只在缓存未命中时出现，且需要拿到构图名额（见 admission.py）"""
+    with spans.span(f"figure.{name}"):
+        try:
+            # 进程内缓存按 lineage 作键（数据追加后按季度清除），共享缓存另加数据集版本哈希
+            fig = get_figure_cache().get_or_build(
+                key, lambda: admission.run(lambda: spans.timed(f"px.{name}", build)), scope,
+                shared_key=(dataset.version,) + key, group=fallback_group(key, scope)
+            )
+        except Overloaded:
+            fig = busy_fallback(name, key, scope)
+    if fig is None:
+        return
+    with spans.span(f"plotly_chart.{name}"):
+        # 缓存中的 dict 已经过校验，包装成 go.Figure 可跳过 st.plotly_chart 的逐属性重新校验
+        st.plotly_chart(fast_figure(fig), width="stretch")
+
 
 # --- Tab 1: 组合构成 (Macro) ---
-with tab1:
-    st.subheader(t["tab1_sub1"])
-    
-    fig_area = px.area(
-        filtered_df, 
-        x="Date", 
-        y="Value_Billions", 
-        color="Logo_Name",
-        title=t["tab1_chart1_title"],
-        labels={"Value_Billions": t["tab1_chart1_yaxis"]},
-        template="plotly_white",
-        hover_data={"Date": "|%Y-%m-%d"}
+@spans.span("tab1")
+def render_tab1(dataset, lang_key, q_start, q_end, sector_selection, filtered_df, highlighted_df, t, view_key,
+                templates, valuation=None, playback=False):
+    # 大股票池时改为 Top-N + "其他"（见 charts.holdings_chart_frame）
+    keep = highlighted_df['Ticker'].unique() if highlighted_df is not None else ()
+    chart_df = charts.holdings_chart_frame(
+        dataset, lang_key, q_start, q_end, sector_selection, filtered_df, t["others_label"], keep_tickers=keep
     )
-    
-    if highlighted_df is not None and not highlighted_df.empty:
-        highlight_names = highlighted_df['Logo_Name'].unique()
-        for trace in fig_area.data:
-            if trace.name in highlight_names:
-                trace.line.width = 3
-                trace.fill = 'tonextx'
-    fig_area.update_layout(showlegend=True, height=500)
-    st.plotly_chart(fig_area, use_container_width=True)
+    highlight_names = list(highlighted_df['Logo_Name'].unique()) if highlighted_df is not None else []
+
+    st.subheader(t["tab1_sub1"])
+    if playback:
+        # 全部季度的帧每个 数据集 × 语言 只生成一次；播放 / 拖动季度滑块不触发重跑
+        st.caption(t["playback_caption"])
+        plot("timeline_holdings", ("timeline_holdings", dataset.version, lang_key),
+             lambda: templates.holdings_timeline(dataset.cube, dataset.logo_names[lang_key]))
+    elif valuation is not None:
+        # 每日盯市：沿用季度图选出的系列，按交易日重建市值
+        st.caption(t["daily_caption"])
+        plot(
+            "area_daily", ("area_daily", valuation.version, dataset.version) + view_key,
+            lambda: templates.holdings_area(
+                valuation.holdings_frame(chart_df, dataset.logo_names[lang_key], q_start, q_end, sector_selection,
+                                         t["others_label"]), highlight_names
+            ),
+            cache_scope(view_key)
+        )
+    else:
+        plot("area", ("area",) + view_key, lambda: templates.holdings_area(chart_df, highlight_names), cache_scope(view_key))
     
     st.subheader(t["tab1_sub2"])
-    fig_bar = px.bar(
-        filtered_df, 
-        x="Quarter", 
-        y="Percent_Portfolio", 
-        color="Logo_Name",
-        title=t["tab1_chart2_title"],
-        barmode="relative",
-        template="plotly_white"
+    plot("bar", ("bar",) + view_key, lambda: templates.holdings_bar(chart_df, highlight_names), cache_scope(view_key))
+
+# --- Tab 1 / Tab 3 (浏览器端筛选) ---
+def apply_client_filters(key, tab2_label):
+    # 组件回传的触发值：保存筛选条件供服务端 Tab 使用；点击了某只股票时切换到 Tab 2 个股分析
+    value = st.session_state[key].get("filters")
+    if not value:
+        return
+    st.session_state["client_filters"] = {k: value[k] for k in ("q0", "q1", "sectors")}
+    if value.get("ticker"):
+        st.session_state["stock_pick"] = value["ticker"]
+        st.session_state["active_tab"] = tab2_label
+
+@spans.span("client_filter")
+def render_client_filter(view, payload, t):
+    """view = 'holdings' (Tab 1) / 'sectors' (Tab 3)；同一会话中载荷不变，Streamlit 的消息缓存只发送一次"""
+    st.caption(t["client_caption"])
+    # plotly.js 随应用发送（离线部署）；该元素内容不变，同一会话只传输一次
+    loader = st.components.v2.component("portfolio_plotlyjs", js=client_filter.LOADER_JS)
+    loader(data=get_plotlyjs(), key="client_filter_plotlyjs")
+    component = st.components.v2.component(
+        f"portfolio_filter_{view}", html=client_filter.html(view), css=client_filter.CSS, js=client_filter.JS,
+        isolate_styles=False,
+    )
+    key = f"client_filter_{view}"
+    component(
+        data=payload, key=key,
+        on_filters_change=lambda: apply_client_filters(key, t["tab2_title"]),
     )
-    
-    if highlighted_df is not None and not highlighted_df.empty:
-        highlight_names = highlighted_df['Logo_Name'].unique()
-        for trace in fig_bar.data:
-            if trace.name in highlight_names:
-                trace.marker.opacity = 1
-            else:
-                trace.marker.opacity = 0.5
-    fig_bar.update_layout(xaxis={'categoryorder':'category ascending'}, height=500)
-    st.plotly_chart(fig_bar, use_container_width=True)
 
 # --- Tab 2: 单个股票深度分析 (Micro) ---
-with tab2:
+@st.fragment
+@spans.span("tab2")
+def render_tab2(dataset, q_start, q_end, sector_selection, lang_key, t, filter_key):
+    require_access()
     st.subheader(t["tab2_sub1"])
     
-    stock_options_filtered = sorted([name for name in filtered_df['Full_Name'].unique() if pd.notna(name)])
-    if stock_options_filtered:
-        target_full_name = st.selectbox(t["tab2_select_company"], stock_options_filtered, index=0)
-        
-        stock_data = filtered_df[filtered_df['Full_Name'] == target_full_name].sort_values('Date')
+    # 候选只包含筛选范围内出现过的股票；选择框只列出搜索结果的前几条
+    ticker_mask = dataset.ticker_mask(q_start, q_end, sector_selection)
+    target = typeahead(st, dataset, t["tab2_select_company"], "stock_pick", lang_key, t, mask=ticker_mask)
+    if target is not None:
+        target_full_name = dataset.ticker_label(target, lang_key)
+        # 只取目标股票的行（共享数据集上的行号索引）；fragment 的参数会在会话中一直保留，不传整张筛选结果
+        stock_data = dataset.ticker_frame(lang_key, target, q_start, q_end)
         
         c1, c2 = st.columns(2)
         
         with c1:
-            fig_stock_val = px.line(
-                stock_data, x='Date', y='Value_Billions', markers=True,
-                title=t["tab2_chart1_title"].format(name=target_full_name),
-                color_discrete_sequence=['#2E86C1']
+            plot(
+                "stock_val", ("stock_val", target) + filter_key,
+                lambda: charts.stock_value_line(stock_data, target_full_name, t),
+                cache_scope(filter_key)
             )
-            fig_stock_val.update_yaxes(rangemode="tozero")
-            st.plotly_chart(fig_stock_val, use_container_width=True)
             
         with c2:
-            fig_stock_share = px.line(
-                stock_data, x='Date', y='Shares_Millions', markers=True,
-                title=t["tab2_chart2_title"].format(name=target_full_name),
-                color_discrete_sequence=['#E74C3C']
+            plot(
+                "stock_share", ("stock_share", target) + filter_key,
+                lambda: charts.stock_shares_line(stock_data, target_full_name, t),
+                cache_scope(filter_key)
             )
-            fig_stock_share.update_yaxes(rangemode="tozero")
-            st.plotly_chart(fig_stock_share, use_container_width=True)
+
+        # 历次披露之间的增减持（预计算的变动矩阵中取一列）
+        ticker_changes = dataset.changes.ticker_frame(target, q_start, q_end)
+        plot(
+            "stock_changes", ("stock_changes", target) + filter_key,
+            lambda: charts.stock_change_bars(ticker_changes, target_full_name, t),
+            cache_scope(filter_key)
+        )
             
         st.divider()
         st.subheader(t["tab2_divider"])
-        logo_name_options = filtered_df['Logo_Name'].unique()
-        default_compare = [filtered_df[filtered_df['Full_Name'] == target_full_name]['Logo_Name'].iloc[0]] if not filtered_df[filtered_df['Full_Name'] == target_full_name].empty else []
+        # 默认对比：当前股票 + 可口可乐；随当前股票变化重置
+        default_compare = [target]
+        if 'KO' in dataset.cube.tickers[ticker_mask] and target != 'KO':
+            default_compare.append('KO')
         
-        # 默认添加可口可乐作为对比
-        ko_name = None
-        for name in logo_name_options:
-            if '(KO)' in name:
-                ko_name = name
-                break
-        if ko_name and ko_name not in default_compare:
-            default_compare.append(ko_name)
-        
-        compare_stocks_names = st.multiselect(t["tab2_compare_label"], logo_name_options, default=default_compare[:2])
-        if compare_stocks_names:
-            compare_data = filtered_df[filtered_df['Logo_Name'].isin(compare_stocks_names)]
-            fig_compare = px.line(
-                compare_data, x="Date", y="Value_Billions", color="Logo_Name",
-                title=t["tab2_compare_title"], markers=True
+        compare_tickers = typeahead(
+            st, dataset, t["tab2_compare_label"], f"compare_{target}", lang_key, t,
+            mask=ticker_mask, multi=True, default=default_compare, logo=True
+        )
+        if compare_tickers:
+            compare_data = dataset.ticker_frame(lang_key, compare_tickers, q_start, q_end)
+            plot(
+                "compare", ("compare", tuple(compare_tickers)) + filter_key,
+                lambda: charts.compare_lines(compare_data, t),
+                cache_scope(filter_key)
             )
-            st.plotly_chart(fig_compare, use_container_width=True)
     else:
         st.info(t["tab2_no_stocks"])
 
 # --- Tab 3: 行业变迁 (Trends) ---
-with tab3:
+@spans.span("tab3")
+def render_tab3(cube, q_start, q_end, sector_selection, lang_key, latest_date_filtered, t, filter_key, templates,
+                valuation=None, playback=False):
     st.subheader(t["tab3_sub1"])
     
-    sector_data = filtered_df.groupby(['Date', 'Quarter', 'Sector'])['Value_Billions'].sum().reset_index()
-    
-    fig_sector = px.area(
-        sector_data, x="Date", y="Value_Billions", color="Sector",
-        title=t["tab3_chart1_title"],
-        template="plotly_white",
-    )
-    st.plotly_chart(fig_sector, use_container_width=True)
+    # 直接读取预计算的 季度 × 行业 汇总
+    sector_data = cube.sector_frame(q_start, q_end, sector_selection, lang_key)
+    if playback:
+        st.caption(t["playback_caption"])
+        plot("timeline_sector", ("timeline_sector", cube.version, lang_key), lambda: templates.sector_timeline(cube))
+    elif valuation is not None:
+        st.caption(t["daily_caption"])
+        plot(
+            "sector_daily", ("sector_daily", valuation.version, cube.version) + filter_key,
+            lambda: templates.sector_area(valuation.sector_frame(q_start, q_end, sector_selection, lang_key)),
+            cache_scope(filter_key)
+        )
+    else:
+        plot("sector", ("sector",) + filter_key, lambda: templates.sector_area(sector_data), cache_scope(filter_key))
     
     latest_sector_data = sector_data[sector_data['Date'] == latest_date_filtered]
     if not latest_sector_data.empty:
-        fig_pie = px.pie(
-            latest_sector_data, values='Value_Billions', names='Sector',
-            title=t["tab3_chart2_title"].format(date=latest_date_filtered.strftime("%Y Q%q")),
-            hole=0.4
+        plot(
+            "pie", ("pie",) + filter_key,
+            lambda: templates.sector_pie(latest_sector_data, latest_date_filtered), cache_scope(filter_key)
         )
-        st.plotly_chart(fig_pie, use_container_width=True)
     else:
         st.info(t["tab3_no_sector_data"])
 
 # --- Tab 4: 公司参考 (Reference) ---
-with tab4:
+@st.fragment
+@spans.span("tab4")
+def render_tab4(dataset, q_start, q_end, sector_selection, lang_key, t):
+    require_access()
     st.subheader(t["tab4_sub1"])
-    
-    ref_df = filtered_df[['Ticker', 'Full_Name', 'Sector', 'Logo_HTML']].drop_duplicates(subset=['Ticker']).sort_values('Sector')
-    
-    # 重新构建Logo & Name列
-    ref_df['Logo & Name'] = ref_df.apply(
-        lambda row: f"{row['Logo_HTML']} <span class='ref-ticker-col'>{row['Ticker']}</span>: {row['Full_Name']}", axis=1
-    )
-    
-    final_ref_df = ref_df[['Logo & Name', 'Sector']]
-    final_ref_df.columns = [t["col_logo_name"], t["col_sector"]]
-    
     st.markdown(t["tab4_description"], unsafe_allow_html=True)
-    st.write(final_ref_df.to_html(escape=False, index=False), unsafe_allow_html=True)
+
+    # 服务端排序 + 分页：只发送当前页的行和这些行用到的 Logo 样式
+    mask = dataset.ticker_mask(q_start, q_end, sector_selection)
+    c1, c2, c3 = st.columns([2, 1, 1])
+    sort = c1.selectbox(
+        t["tab4_sort_by"], reference_table.SORT_KEYS, key="ref_sort", format_func=lambda k: t[f"tab4_sort_{k}"]
+    )
+    page_size = c2.selectbox(t["tab4_page_size"], reference_table.PAGE_SIZES, key="ref_page_size")
+    n_pages = max(1, -(-int(np.count_nonzero(mask)) // page_size))
+    # 筛选条件变化后总页数可能变少：先收回到最后一页，再创建控件
+    if st.session_state.get("ref_page", 1) > n_pages:
+        st.session_state["ref_page"] = n_pages
+    page = c3.number_input(t["tab4_page"].format(pages=n_pages), 1, n_pages, key="ref_page")
+
+    with spans.span("reference.page"):
+        page_tickers, rows_html, total = dataset.reference.page(lang_key, mask, sort, page=page, page_size=page_size)
+        css = logo_assets.logo_css(get_logo_bundle(), page_tickers)
+    start = (page - 1) * page_size
+    st.caption(t["tab4_showing"].format(start=start + 1 if total else 0, end=start + len(page_tickers), total=total))
+    st.markdown(css, unsafe_allow_html=True)
+    st.markdown(reference_table.table_html(rows_html, t), unsafe_allow_html=True)
+
+# --- Tab 5: 持仓变动 (Changes) ---
+@st.fragment
+@spans.span("tab5")
+def render_tab5(dataset, q_start, q_end, sector_selection, lang_key, t, filter_key):
+    require_access()
+    cube, changes = dataset.cube, dataset.changes
+    ticker_mask = sector_selection[cube.ticker_sector]
+    quarter_changes = changes.quarter_frame(q_start, q_end, ticker_mask)
+
+    st.subheader(t["tab5_sub1"])
+    st.caption(t["tab5_note"])
+
+    latest = quarter_changes.iloc[-1]
+    previous = quarter_changes.iloc[-2] if len(quarter_changes) > 1 else None
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric(t["tab5_metric_net_flow"].format(quarter=latest['Quarter']), f"{latest['Net_Flow_Billions']:+.2f}")
+    m2.metric(
+        t["tab5_metric_turnover"], f"{latest['Turnover_Pct']:.1f}%" if pd.notna(latest['Turnover_Pct']) else "–",
+        delta=f"{latest['Turnover_Pct'] - previous['Turnover_Pct']:+.1f}pp"
+        if previous is not None and pd.notna(previous['Turnover_Pct']) and pd.notna(latest['Turnover_Pct']) else None,
+        delta_color="off"
+    )
+    m3.metric(
+        t["tab5_metric_hhi"], f"{latest['HHI']:.3f}",
+        delta=f"{latest['HHI'] - previous['HHI']:+.3f}" if previous is not None else None, delta_color="off"
+    )
+    m4.metric(t["tab5_metric_new_exited"], f"{int(latest['New_Positions'])} / {int(latest['Exited_Positions'])}")
+
+    plot("flows", ("flows",) + filter_key, lambda: charts.flow_bars(quarter_changes, t), cache_scope(filter_key))
+    plot("turnover", ("turnover",) + filter_key, lambda: charts.turnover_lines(quarter_changes, t), cache_scope(filter_key))
+
+    st.subheader(t["tab5_sub2"])
+    quarter_labels = list(quarter_changes['Quarter'])[::-1]
+    selected_quarter = st.selectbox(t["tab5_select_quarter"], quarter_labels, index=0)
+    q = q_start + len(quarter_labels) - 1 - quarter_labels.index(selected_quarter)
+    activity = changes.activity_frame(q, dataset.full_names[lang_key], ticker_mask)
+    if activity.empty:
+        st.info(t["tab5_no_activity"])
+    else:
+        st.dataframe(charts.activity_table(activity, t), hide_index=True, width="stretch")
+
+# --- Tab 6: 机构持仓重叠 (Overlap)，注册表中有多个机构时显示 ---
+@st.fragment
+@spans.span("tab6")
+def render_tab6(dataset, filer_id, filer_ids, lang_key, t):
+    require_access()
+    st.subheader(t["tab6_sub1"])
+    other_ids = [fid for fid in filer_ids if fid != filer_id]
+    other_id = st.selectbox(
+        t["tab6_compare_with"], other_ids, format_func=lambda fid: filer_store.filer_name(fid, lang_key)
+    )
+    other = load_data(other_id)
+    dates = common_dates(dataset, other)
+    if not len(dates):
+        st.info(t["tab6_no_common"])
+        return
+    quarter_by_date = dict(zip(dataset.cube.dates, dataset.cube.quarters))
+    date = st.selectbox(t["tab5_select_quarter"], dates[::-1], format_func=lambda d: quarter_by_date[d])
+    summary, shared = portfolio_overlap(dataset, other, date, lang_key)
+
+    name_a, name_b = filer_store.filer_name(filer_id, lang_key), filer_store.filer_name(other_id, lang_key)
+    m1, m2 = st.columns(2)
+    m1.metric(t["tab6_metric_overlap"], f"{summary['overlap_pct']:.1f}%")
+    m2.metric(t["tab6_metric_common"], f"{summary['common_positions']} / {summary['positions_a']} · {summary['positions_b']}")
+    if shared.empty:
+        st.info(t["tab6_no_shared"])
+        return
+    plot(
+        "overlap", ("overlap", dataset.version, other.version, str(date), lang_key),
+        lambda: charts.overlap_bars(shared, name_a, name_b, quarter_by_date[date], t)
+    )
+    st.dataframe(charts.overlap_table(shared, name_a, name_b, t), hide_index=True, width="stretch")
+
+tab_titles = [t["tab1_title"], t["tab2_title"], t["tab3_title"], t["tab4_title"], t["tab5_title"]]
+if len(filer_ids) > 1:
+    tab_titles.append(t["tab6_title"])
+tabs = st.tabs(tab_titles, key="active_tab", on_change="rerun")
+tab1, tab2, tab3, tab4, tab5 = tabs[:5]
+# Tab 1 / Tab 3 的图表只填充预先生成的骨架（见 figure_templates.py）
+templates = get_figure_templates(filer_id, dataset.version, current_lang, dataset, t)
+client_payload = get_client_payload(filer_id, dataset.version, current_lang, dataset, t, templates) if client_mode else None
+if tab1.open:
+    with tab1:
+        if client_mode:
+            render_client_filter("holdings", client_payload, t)
+        else:
+            render_tab1(
+                dataset, current_lang, q_start, q_end, sector_selection, filtered_df, highlighted_df, t, view_key,
+                templates, valuation, playback_mode
+            )
+if tab2.open:
+    with tab2:
+        render_tab2(dataset, q_start, q_end, sector_selection, current_lang, t, filter_key)
+if tab3.open:
+    with tab3:
+        if client_mode:
+            render_client_filter("sectors", client_payload, t)
+        else:
+            render_tab3(cube, q_start, q_end, sector_selection, current_lang, latest_date_filtered, t, filter_key,
+                        templates, valuation, playback_mode)
+if tab4.open:
+    with tab4:
+        render_tab4(dataset, q_start, q_end, sector_selection, current_lang, t)
+if tab5.open:
+    with tab5:
+        render_tab5(dataset, q_start, q_end, sector_selection, current_lang, t, filter_key)
+if len(tabs) > 5 and tabs[5].open:
+    with tabs[5]:
+        render_tab6(dataset, filer_id, filer_ids, current_lang, t)
 
 # -----------------------------------------------------------------------------
 # Footer
@@ -643,7 +806,8 @@ st.markdown("---")
 st.markdown(t["footer"])
 
 # -------- 每日访问统计 --------
-daily_visits = update_daily_visits()
+with spans.span("update_daily_visits"):
+    daily_visits = update_daily_visits()
 visit_text = f"今日访问: {daily_visits}"
 
 # ... (在主程序末尾的 HTML 声明中显示 visit_text) ...
@@ -653,3 +817,34 @@ st.markdown(f"""
 </div>
     """, unsafe_allow_html=True)
 
+# -------- 每会话内存（共享数据集之外）--------
+# retained：session_state + fragment（Tab 2 / Tab 4）的参数，Streamlit 为单独重跑 fragment 会一直保留它们；
+# transient：本次重跑的筛选结果，重跑结束即释放。只引用共享数据集的切片 / 视图不计入
+with spans.span("session_memory"):
+    ctx = get_script_run_ctx()
+    fragment_args = (q_start, q_end, sector_selection, current_lang, filter_key)
+    get_session_memory().record(
+        ctx.session_id if ctx is not None else "local", dataset,
+        retained=[dict(st.session_state)] + [fragment_args] * (tab2.open + tab4.open),
+        transient=[filtered_df, highlighted_df, latest_data_filtered],
+    )
+
+# -------- 诊断面板（?diag=<PORTFOLIO_DIAGNOSTICS_KEY> 时显示）--------
+spans.observe("rerun", (time.perf_counter() - rerun_started) * 1000)
+
+if DIAGNOSTICS_KEY and st.query_params.get("diag") == DIAGNOSTICS_KEY:
+    with st.expander("Diagnostics", expanded=True):
+        span_summary = pd.DataFrame.from_dict(spans.summary(), orient="index")
+        st.dataframe(span_summary.sort_values("p99_ms", ascending=False), width="stretch")
+        st.json({
+            "figure_cache": get_figure_cache().stats(),
+            "filer_store": filer_store.stats(),
+            "admission": admission.stats(),
+            "access_gate": access_gate.stats() if access_gate is not None else None,
+            "shared_cache": get_shared_cache().stats() if get_shared_cache() else None,
+            "daily_marks": daily_marks.stats(),
+            "session_memory": get_session_memory().stats(),
+            "visit_counter": get_visit_counter().stats(),
+            "data_refresh": data_refresher.events[-10:],
+            "metrics_file": spans.export_path,
+        })
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    """snapshot(df, name)：把持仓表 (HOLDING_COLUMNS) 写成 CSV 并构建、打开 Arrow 快照"""
+    import portfolio_data
+
+    def build(df, name="holdings"):
+        src, dst = tmp_path / f"{name}.csv", tmp_path / f"{name}.arrow"
+        df.to_csv(src, index=False)
+        portfolio_data.build_snapshot(str(src), str(dst))
+        return portfolio_data.open_snapshot(str(dst))
+
+    return build
+
+
+@pytest.fixture
+def extended_and_rebuilt(snapshot):
+    """
+    返回 make(drop, revise)：用合成持仓去掉最后 drop 个季度建旧数据集，再增量追加回来；
+    revise 时旧数据集的最后一个季度与新快照不同（修订后重算该季度）。返回 (增量结果, 完整重建)
+    """
+    from bench import synthetic
+    from portfolio_dataset import PortfolioDataset
+
+    full = synthetic.synthetic_holdings(60, 12, seed=3)
+    quarters = list(dict.fromkeys(full['Quarter']))
+
+    def make(drop, revise=False):
+        df_all = snapshot(full, "full")
+        old_df = full[~full['Quarter'].isin(quarters[-drop:])].copy()
+        added = set(quarters[-drop:])
+        if revise:
+            # 修订旧数据的最后一个季度：减持一半并去掉一只股票
+            last = old_df['Quarter'] == quarters[-drop - 1]
+            old_df.loc[last, 'Shares_Millions'] *= 0.5
+            old_df = old_df.drop(old_df.index[last][:1])
+            added.add(quarters[-drop - 1])
+        old = PortfolioDataset(snapshot(old_df, f"old{drop}"))
+        keep = len(quarters) - len(added)
+        ext = old.extended(df_all, df_all[df_all['Quarter'].isin(added)], keep, "v2")
+        return ext, PortfolioDataset(df_all)
+
+    return make
@@ -0,0 +1,74 @@
+"""访问控制：令牌签名校验、过期、解锁码限频"""
+import access_gate
+from access_gate import AccessGate
+
+NOW = 1_700_000_000
+
+
+def _gate(code="vip24"):
+    return AccessGate(b"secret", code, free_seconds=60, access_hours=24)
+
+
+def test_sign_and_verify_round_trip():
+    gate = _gate()
+    access = gate.sign("unlock", NOW, NOW + 3600)
+    assert gate.verify(access.token) == access
+
+
+def test_tampered_token_is_rejected():
+    gate = _gate()
+    token = gate.sign("trial", NOW, NOW + 60).token
+    kind, issued, expires, mac = token.split(".")
+    assert gate.verify(f"{kind}.{issued}.{int(expires) + 86400}.{mac}") is None
+    assert gate.verify(f"unlock.{issued}.{expires}.{mac}") is None
+    assert gate.verify(f"{kind}.{issued}.{expires}.{mac[:-2]}xx") is None
+    assert gate.verify("garbage") is None
+    # 签名合法但种类未知
+    payload = f"admin.{NOW}.{NOW + 60}"
+    assert gate.verify(f"{payload}.{gate._mac(payload)}") is None
+
+
+def test_changing_the_unlock_code_invalidates_tokens():
+    token = _gate("vip24").sign("unlock", NOW, NOW + 3600).token
+    assert _gate("other").verify(token) is None
+
+
+def test_trial_issued_then_expires():
+    gate = _gate()
+    access, remaining = gate.check(None, now=NOW)
+    assert access.kind == "trial" and remaining == 60
+    assert not gate.expired(access.token, now=NOW + 59)
+    same, remaining = gate.check(access.token, now=NOW + 61)
+    # 过期的试用令牌原样返回，不换发新的试用
+    assert same == access and remaining <= 0
+    assert gate.expired(access.token, now=NOW + 61)
+    assert gate.stats()["trials"] == 1 and gate.stats()["locked_reruns"] == 1
+
+
+def test_invalid_token_starts_a_counted_trial():
+    gate = _gate()
+    access, _ = gate.check("trial.1.2.bad", now=NOW)
+    assert access.kind == "trial"
+    assert gate.stats()["invalid_tokens"] == 1
+
+
+def test_unlock_expires_after_access_hours():
+    gate = _gate()
+    access, error = gate.unlock("vip24", "10.0.0.1", now=NOW)
+    assert error is None and access.kind == "unlock"
+    assert gate.check(access.token, now=NOW + 24 * 3600 - 1)[1] > 0
+    assert gate.check(access.token, now=NOW + 24 * 3600)[1] <= 0
+
+
+def test_wrong_codes_are_rate_limited_per_client():
+    gate = _gate()
+    for i in range(access_gate.MAX_ATTEMPTS):
+        assert gate.unlock("wrong", "10.0.0.1", now=NOW + i) == (None, "wrong")
+    # 次数用完后正确的解锁码也被拒绝，直到窗口过去
+    assert gate.unlock("vip24", "10.0.0.1", now=NOW + 10) == (None, "too_many")
+    assert gate.unlock("vip24", "10.0.0.2", now=NOW + 10)[1] is None
+    access, error = gate.unlock("vip24", "10.0.0.1", now=NOW + access_gate.ATTEMPT_WINDOW + 5)
+    assert error is None and access.kind == "unlock"
+    stats = gate.stats()
+    assert stats["unlock_failures"] == access_gate.MAX_ATTEMPTS + 1
+    assert stats["unlocks"] == 2
@@ -0,0 +1,111 @@
+"""准入控制：名额上限、排队、超时与拒绝计数，以及页面在名额已满时改用缓存视图"""
+import datetime
+import gc
+import pathlib
+import sys
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, Overloaded
+
+
+def test_acquire_and_release_within_limit():
+    admission = AdmissionController(max_active=2, max_waiting=4, wait_seconds=0.05)
+    assert admission.acquire() == 0.0
+    assert admission.acquire() == 0.0
+    assert admission.stats()["active"] == 2
+    with pytest.raises(Overloaded):
+        admission.acquire()
+    admission.release()
+    admission.acquire()
+    admission.release()
+    admission.release()
+    stats = admission.stats()
+    assert (stats["active"], stats["admitted"], stats["queued"], stats["timed_out"]) == (0, 3, 1, 1)
+
+
+def test_run_never_exceeds_max_active():
+    admission = AdmissionController(max_active=2, max_waiting=16, wait_seconds=5)
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def build():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        return "fig"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(admission.run(build))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["fig"] * 8
+    assert peak[0] == 2
+    stats = admission.stats()
+    assert stats["admitted"] == 8 and stats["active"] == 0 and stats["queued"] >= 1
+
+
+def test_queued_request_gets_the_released_slot():
+    waits = []
+    admission = AdmissionController(max_active=1, max_waiting=4, wait_seconds=5, observe_wait=waits.append)
+    admission.acquire()
+    threading.Timer(0.05, admission.release).start()
+    assert admission.run(lambda: "fig") == "fig"
+    assert waits and waits[0] >= 40
+    assert admission.stats()["queued"] == 1
+
+
+def test_full_queue_is_rejected():
+    admission = AdmissionController(max_active=1, max_waiting=0, wait_seconds=5)
+    admission.acquire()
+    with pytest.raises(Overloaded):
+        admission.run(lambda: "fig")
+    stats = admission.stats()
+    assert stats["rejected"] == 1 and stats["queued"] == 0
+    admission.fallback("stale")
+    admission.fallback("stale")
+    admission.fallback("busy")
+    assert admission.stats()["fallback_stale"] == 2 and admission.stats()["fallback_busy"] == 1
+
+
+def test_queue_timeout_falls_back_to_cached_view(tmp_path, monkeypatch):
+    from streamlit.testing.v1 import AppTest
+
+    monkeypatch.chdir(tmp_path)
+    # 脚本运行时 Streamlit 把 sys.modules["__main__"] 换成页面脚本；不恢复的话，
+    # 之后以 spawn 启动的子进程会把 streamlit_app.py 当作主模块重新执行一遍
+    monkeypatch.setitem(sys.modules, "__main__", sys.modules["__main__"])
+    monkeypatch.setenv("PORTFOLIO_UNLOCK_CODE", "")
+    monkeypatch.setenv("PORTFOLIO_REFRESH_SECONDS", "0")
+    monkeypatch.setenv("PORTFOLIO_QUEUE_WAIT_SECONDS", "0.05")
+    monkeypatch.setenv("PORTFOLIO_METRICS_FILE", str(tmp_path / "rerun_metrics.prom"))
+    at = AppTest.from_file(str(pathlib.Path(__file__).parents[1] / "streamlit_app.py"), default_timeout=120)
+    at.run()
+    assert not at.exception
+
+    admission = next(o for o in gc.get_objects() if isinstance(o, AdmissionController))
+    for _ in range(admission.max_active):
+        admission.acquire()
+    try:
+        # 未缓存过的时间范围：构图排队超时，改用同一图表最近缓存的视图
+        start, end = at.sidebar.slider[0].value
+        at.sidebar.slider[0].set_range(start, end - datetime.timedelta(days=800)).run()
+        assert not at.exception
+        assert any("⏳" in c.value for c in at.caption)
+        stats = admission.stats()
+        assert stats["timed_out"] >= 1 and stats["fallback_stale"] >= 1
+    finally:
+        for _ in range(admission.max_active):
+            admission.release()
+    at.run()
+    assert not any("⏳" in c.value for c in at.caption)
+    # 访问计数的库文件是相对路径：离开临时目录前写完
+    for counter in [o for o in gc.get_objects() if type(o).__name__ == "VisitCounter"]:
+        counter.close()
@@ -0,0 +1,45 @@
+"""浏览器端筛选回传：q1 为开区间（界面中最后一个选中季度 + 1），越界时收回到有效范围"""
+import numpy as np
+import pytest
+
+import client_filter
+
+LANG = "en"
+
+
+@pytest.fixture
+def dataset(extended_and_rebuilt):
+    return extended_and_rebuilt(1)[1]
+
+
+def _quarters(dataset, saved):
+    q0, q1, sector_sel = client_filter.server_filters(saved, dataset.cube)
+    return list(dict.fromkeys(dataset.filter(LANG, q0, q1, sector_sel)['Quarter'])), sector_sel
+
+
+def test_single_quarter_range(dataset):
+    # 界面只选中第 3 个季度：q0 = q1(闭) = 3，回传 q1 = 4
+    assert client_filter.server_filters({"q0": 3, "q1": 4, "sectors": []}, dataset.cube)[:2] == (3, 4)
+    quarters, _ = _quarters(dataset, {"q0": 3, "q1": 4, "sectors": list(range(len(dataset.cube.sector_keys)))})
+    assert quarters == [dataset.cube.quarters[3]]
+
+
+def test_full_range(dataset):
+    n = len(dataset.cube.dates)
+    all_sectors = list(range(len(dataset.cube.sector_keys)))
+    quarters, sector_sel = _quarters(dataset, {"q0": 0, "q1": n, "sectors": all_sectors})
+    assert quarters == list(dataset.cube.quarters)
+    assert sector_sel.all()
+    # 没有回传过筛选条件时同样是全部季度和行业
+    q0, q1, sector_sel = client_filter.server_filters(None, dataset.cube)
+    assert (q0, q1) == (0, n) and sector_sel.all()
+
+
+def test_out_of_range_values_are_clamped(dataset):
+    cube = dataset.cube
+    n = len(cube.dates)
+    q0, q1, sector_sel = client_filter.server_filters({"q0": -2, "q1": n + 5, "sectors": [0, 2, 999]}, cube)
+    assert (q0, q1) == (0, n)
+    assert np.flatnonzero(sector_sel).tolist() == [0, 2]
+    # 空区间至少保留一个季度
+    assert client_filter.server_filters({"q0": n + 1, "q1": 0, "sectors": []}, cube)[:2] == (n - 1, n)
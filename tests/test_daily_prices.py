@@ -0,0 +1,113 @@
+"""每日估值：价格追加交易日时的增量构建与完整重建一致，个股每日曲线与逐只股票向下填充的结果一致"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import daily_prices
+from daily_prices import DailyValuation, PriceHistory
+
+LANG = "en"
+OTHERS = "Others"
+
+
+@pytest.fixture
+def dataset(extended_and_rebuilt):
+    return extended_and_rebuilt(1)[1]
+
+
+def _price_csv(path, cube, days, seed, gap):
+    """
+    cube 中前 2/3 的股票有价格（随机缺价日），其余只能用 13F 隐含价格；
+    其中每隔一只股票在 gap 区间内整段停牌（缺价跨越多个块起点）
+    """
+    rng = np.random.default_rng(seed)
+    tickers = cube.tickers[: 2 * len(cube.tickers) // 3]
+    rows = pd.DataFrame(
+        [(day, tk, p) for tk in tickers for day, p in zip(days, rng.lognormal(4.0, 0.3, len(days)))],
+        columns=['Date', 'Ticker', 'Close'],
+    )
+    rows = rows[rng.random(len(rows)) > 0.2]
+    rows = rows[~(rows['Ticker'].isin(tickers[::2]) & rows['Date'].between(*gap))]
+    rows.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def price_versions(tmp_path, dataset):
+    """两个价格版本：v1 覆盖到最后一次披露之前，v2 只追加之后的交易日（parent 为 v1）"""
+    days = pd.bdate_range(dataset.cube.dates[0] - pd.Timedelta(days=90), dataset.cube.dates[-1] + pd.Timedelta(days=60))
+    cut = int(np.searchsorted(days, dataset.cube.dates[-1])) - 5
+    gap = (days[-200], days[-20])
+    dest = str(tmp_path / "prices.arrow")
+    daily_prices.import_prices([_price_csv(tmp_path / "a.csv", dataset.cube, days[:cut], 1, gap)], dest)
+    v1 = PriceHistory(dest)
+    added, appended = daily_prices.import_prices([_price_csv(tmp_path / "b.csv", dataset.cube, days[cut:], 2, gap)], dest)
+    v2 = PriceHistory(dest)
+    assert appended and added == len(days) - cut and v2.parent == v1.version
+    return v1, v2
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # 让价格历史跨越多个块，追加的交易日从块中间开始
+    monkeypatch.setattr(daily_prices, "CHUNK_DAYS", 64)
+
+
+def _chart_df(dataset, i0, i1):
+    sel = np.ones(len(dataset.cube.sector_keys), dtype=bool)
+    return dataset.top_n_frame(LANG, i0, i1, sel, 8, OTHERS), sel
+
+
+def test_incremental_matches_full_rebuild(dataset, price_versions):
+    v1, v2 = price_versions
+    ext = DailyValuation(dataset.cube, v1).extended(v2)
+    ref = DailyValuation(dataset.cube, v2)
+    np.testing.assert_array_equal(ext.days, ref.days)
+    np.testing.assert_array_equal(ext.q_idx, ref.q_idx)
+    np.testing.assert_allclose(ext.sector_value, ref.sector_value)
+    np.testing.assert_array_equal(ext.last_price, ref.last_price)
+    n = len(dataset.cube.dates)
+    sel = np.ones(len(dataset.cube.sector_keys), dtype=bool)
+    pd.testing.assert_frame_equal(ext.sector_frame(0, n, sel, LANG), ref.sector_frame(0, n, sel, LANG))
+    for i0, i1 in ((0, n), (n - 3, n)):
+        chart_df, sel = _chart_df(dataset, i0, i1)
+        args = (chart_df, dataset.logo_names[LANG], i0, i1, sel, OTHERS)
+        pd.testing.assert_frame_equal(ext.holdings_frame(*args), ref.holdings_frame(*args))
+
+
+def _reference_values(valuation, tickers, days):
+    """逐只股票在完整日线上向下填充，缺价时用当季隐含价格"""
+    cube = valuation.cube
+    prices = valuation.prices
+    closes = pd.DataFrame({tk: prices.close(tk) for tk in tickers if prices.close(tk) is not None},
+                          columns=list(tickers)).ffill()
+    q_idx = valuation.q_idx[days]
+    cols = np.searchsorted(cube.tickers, tickers)
+    close = closes.to_numpy(dtype=float)[days + valuation.first]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        implied = np.where(cube.shares > 0, cube.value / cube.shares * 1000, 0.0)[q_idx][:, cols]
+    price = np.where(np.isnan(close), implied, close)
+    return cube.shares[q_idx][:, cols] * price / 1000
+
+
+@pytest.mark.parametrize("quarters", [(0, None), (-4, -1), (-1, None)])
+def test_holdings_frame_matches_per_ticker_fill(dataset, price_versions, quarters):
+    valuation = DailyValuation(dataset.cube, price_versions[1])
+    n = len(dataset.cube.dates)
+    i0, i1 = quarters[0] % n, n if quarters[1] is None else quarters[1] % n
+    chart_df, sel = _chart_df(dataset, i0, i1)
+    frame = valuation.holdings_frame(chart_df, dataset.logo_names[LANG], i0, i1, sel, OTHERS)
+
+    tickers = [tk for tk in pd.unique(chart_df['Ticker']) if tk != OTHERS]
+    days = valuation.sampled_days(i0, i1)
+    expected = _reference_values(valuation, tickers, days)
+    held = dataset.cube.held[valuation.q_idx[days]][:, np.searchsorted(dataset.cube.tickers, tickers)]
+    stocks = frame[frame['Ticker'] != OTHERS]
+    d_idx, t_idx = np.nonzero(held)
+    pivot = stocks.pivot(index='Date', columns='Ticker', values='Value_Billions')
+    got = pivot.reindex(index=valuation.days[days], columns=tickers).to_numpy()
+    np.testing.assert_allclose(got[d_idx, t_idx], expected[d_idx, t_idx])
+    assert len(stocks) == len(d_idx)
+    others = frame[frame['Ticker'] == OTHERS]['Value_Billions'].to_numpy()
+    total = valuation.sector_value[days].sum(axis=1)
+    np.testing.assert_allclose(others, np.maximum(total - np.where(held, expected, 0.0).sum(axis=1), 0.0))
@@ -0,0 +1,80 @@
+"""增量刷新：失败后重试、只追加 / 修订末尾季度、图表缓存按季度区间清除"""
+import os
+
+import pytest
+
+from bench import synthetic
+from data_refresh import DataRefresher
+from figure_cache import FigureCache
+from filer_store import DEFAULT_FILER, FilerStore
+
+
+def _write(path, df):
+    df.to_csv(path, index=False)
+    # 同一纳秒内重写时 mtime 可能不变：显式推进，保证签名变化
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+@pytest.fixture
+def store(tmp_path):
+    full = synthetic.synthetic_holdings(40, 13, seed=1)
+    quarters = list(dict.fromkeys(full['Quarter']))
+    src = tmp_path / "holdings.csv"
+    _write(src, full[full['Quarter'] != quarters[-1]])
+    store = FilerStore(registry_path=str(tmp_path / "filers.json"))
+    store.dataset(DEFAULT_FILER)
+    return store, src, full, quarters
+
+
+def _refresher(store, tmp_path, cache=None):
+    return DataRefresher(store, cache, interval=0, source_dir=str(tmp_path / "13f"))
+
+
+def test_failed_refresh_is_retried(store, tmp_path, monkeypatch):
+    store, src, full, _ = store
+    refresher = _refresher(store, tmp_path)
+    real_refresh = store.refresh
+    calls = []
+
+    def flaky(filer_id):
+        calls.append(filer_id)
+        if len(calls) == 1:
+            raise OSError("transient")
+        return real_refresh(filer_id)
+
+    monkeypatch.setattr(store, "refresh", flaky)
+    _write(src, full)
+    with pytest.raises(OSError):
+        refresher.check()
+    assert refresher.check() == [(DEFAULT_FILER, "extend", 12)]
+    assert len(calls) == 2
+    assert len(store.dataset(DEFAULT_FILER).cube.dates) == 13
+    assert refresher.check() == []
+
+
+def test_append_and_revision_invalidate_only_covering_ranges(store, tmp_path):
+    store, src, full, quarters = store
+    cache = FigureCache()
+    refresher = _refresher(store, tmp_path, cache)
+    lineage = store.dataset(DEFAULT_FILER).lineage
+    cache.put("early", "{}", scope=(lineage, 0, 5))
+    cache.put("all", "{}", scope=(lineage, 0, 12))
+
+    # 追加一个季度：已有季度区间的图表都仍然有效
+    _write(src, full)
+    assert refresher.check() == [(DEFAULT_FILER, "extend", 12)]
+    dataset = store.dataset(DEFAULT_FILER)
+    assert dataset.lineage == lineage
+    assert cache.get("early") is not None and cache.get("all") is not None
+
+    # 修订倒数第二个季度：只清除区间覆盖该季度的图表
+    revised = full.copy()
+    revised.loc[revised['Quarter'] == quarters[11], 'Value_Billions'] *= 2
+    _write(src, revised)
+    assert refresher.check() == [(DEFAULT_FILER, "extend", 11)]
+    assert cache.get("early") is not None
+    assert cache.get("all") is None
+
+    fresh = FilerStore(registry_path=store.registry_path).dataset(DEFAULT_FILER)
+    assert (store.dataset(DEFAULT_FILER).cube.value == fresh.cube.value).all()
@@ -0,0 +1,90 @@
+"""图表缓存：同键并发只构图一次、构图失败传给等待者、按分组取最近使用的视图"""
+import threading
+import time
+
+import plotly.graph_objects as go
+import pytest
+
+from admission import Overloaded
+from figure_cache import FigureCache
+
+
+def _figure(title="fig"):
+    return go.Figure(layout={"title": {"text": title}})
+
+
+def _concurrently(n, target):
+    results, errors = [], []
+
+    def run():
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_misses_build_once():
+    cache = FigureCache()
+    calls = []
+
+    def build():
+        calls.append(1)
+        time.sleep(0.05)
+        return _figure()
+
+    results, errors = _concurrently(8, lambda: cache.get_or_build(("bar", "L", "zh"), build))
+    assert errors == [] and len(calls) == 1
+    assert len(results) == 8 and all(r["layout"]["title"]["text"] == "fig" for r in results)
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["coalesced"] >= 1
+
+
+def test_build_error_reaches_waiters_and_is_not_cached():
+    cache = FigureCache()
+    calls = []
+
+    def build():
+        calls.append(1)
+        time.sleep(0.05)
+        raise Overloaded("busy")
+
+    results, errors = _concurrently(4, lambda: cache.get_or_build(("bar", "L", "zh"), build))
+    assert results == [] and len(errors) == 4
+    assert all(isinstance(e, Overloaded) for e in errors)
+    assert len(calls) == 1
+    # 失败不留下进行中的标记，下一次请求重新构图
+    assert cache.get_or_build(("bar", "L", "zh"), _figure)["layout"]["title"]["text"] == "fig"
+
+
+def test_latest_is_most_recent_in_group():
+    cache = FigureCache()
+    group = ("bar", "L", "zh")
+    assert cache.latest(group) is None
+    cache.get_or_build(group + (0, 4), lambda: _figure("a"), group=group)
+    cache.get_or_build(group + (0, 8), lambda: _figure("b"), group=group)
+    cache.get_or_build(("bar", "L", "en", 0, 8), lambda: _figure("other"), group=("bar", "L", "en"))
+    assert cache.latest(group)["layout"]["title"]["text"] == "b"
+    # 命中也会更新最近使用顺序
+    cache.get(group + (0, 4))
+    assert cache.latest(group)["layout"]["title"]["text"] == "a"
+    cache.invalidate(lambda k: k == group + (0, 4))
+    assert cache.latest(group)["layout"]["title"]["text"] == "b"
+
+
+def test_latest_follows_eviction():
+    cache = FigureCache(max_entries=2)
+    group = ("bar", "L", "zh")
+    cache.put(group + (0, 4), '{"a": 1}', group=group)
+    cache.put(("pie", "L", "zh", 0, 4), '{"b": 2}', group=("pie", "L", "zh"))
+    cache.put(("pie", "L", "zh", 0, 8), '{"c": 3}', group=("pie", "L", "zh"))
+    assert cache.latest(group) is None
+    assert cache.latest(("pie", "L", "zh")) == {"c": 3}
+    cache.invalidate()
+    assert cache.latest(("pie", "L", "zh")) is None
@@ -0,0 +1,27 @@
+"""图表骨架：进程级缓存中的骨架不能让已淘汰的数据集留在内存中"""
+import gc
+import weakref
+
+import portfolio_data
+from bench import synthetic
+from figure_templates import FigureTemplates
+from i18n import LANG
+from portfolio_dataset import PortfolioDataset
+
+
+def test_templates_do_not_retain_dataset(tmp_path):
+    src = tmp_path / "holdings.csv"
+    dest = tmp_path / "holdings.arrow"
+    synthetic.synthetic_holdings(20, 6, seed=2).to_csv(src, index=False)
+    portfolio_data.build_snapshot(str(src), str(dest))
+    dataset = PortfolioDataset(portfolio_data.open_snapshot(str(dest)))
+    templates = FigureTemplates(dataset, "en", LANG["English"])
+    spec = templates.client_spec()
+    timeline = templates.sector_timeline(dataset.cube)
+
+    ref = weakref.ref(dataset)
+    del dataset
+    gc.collect()
+    assert ref() is None
+    assert set(spec) == {"area", "bar", "sector", "pie"}
+    assert timeline.frames
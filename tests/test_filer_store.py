@@ -0,0 +1,105 @@
+"""多机构数据：两个组合的持仓重叠，以及刷新时保留未变化的季度前缀 / 退回整体重建"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import portfolio_data
+from bench import synthetic
+from filer_store import plan_refresh, portfolio_overlap
+from portfolio_dataset import PortfolioDataset
+
+
+def _holdings(rows):
+    df = pd.DataFrame(rows, columns=['Quarter', 'Ticker', 'Shares_Millions', 'Value_Billions'])
+    df['Percent_Portfolio'] = df['Value_Billions'] / df.groupby('Quarter')['Value_Billions'].transform('sum') * 100
+    return df
+
+
+def _dataset(snapshot, rows, name):
+    return PortfolioDataset(snapshot(_holdings(rows), name))
+
+
+@pytest.fixture
+def filers(snapshot):
+    a = _dataset(snapshot, [("2024 Q4", "AAPL", 10, 3.0), ("2024 Q4", "KO", 10, 1.0),
+                            ("2025 Q1", "AAPL", 10, 3.0)], "a")
+    b = _dataset(snapshot, [("2024 Q4", "AAPL", 5, 1.0), ("2024 Q4", "BAC", 10, 1.0),
+                            ("2025 Q1", "MA", 10, 2.0)], "b")
+    return a, b
+
+
+def test_identical_filers_overlap_fully(filers):
+    a, _ = filers
+    date = a.cube.dates[0]
+    summary, frame = portfolio_overlap(a, a, date, "en")
+    assert summary["overlap_pct"] == pytest.approx(100.0)
+    assert summary["common_positions"] == summary["positions_a"] == summary["positions_b"] == 2
+    assert list(frame['Ticker']) == ["AAPL", "KO"]
+    np.testing.assert_allclose(frame['Weight_A_Pct'], frame['Weight_B_Pct'])
+
+
+def test_disjoint_filers_do_not_overlap(filers):
+    a, b = filers
+    summary, frame = portfolio_overlap(a, b, a.cube.dates[1], "en")
+    assert summary == {"overlap_pct": 0.0, "common_positions": 0, "positions_a": 1, "positions_b": 1}
+    assert frame.empty
+
+
+def test_partial_overlap_is_sum_of_min_weights(filers):
+    a, b = filers
+    summary, frame = portfolio_overlap(a, b, a.cube.dates[0], "en")
+    # AAPL: A 75%，B 50%；KO 与 BAC 各自独有
+    assert summary["overlap_pct"] == pytest.approx(50.0)
+    assert list(frame['Ticker']) == ["AAPL"]
+    assert (frame['Weight_A_Pct'][0], frame['Weight_B_Pct'][0]) == pytest.approx((75.0, 50.0))
+
+
+@pytest.fixture
+def history(snapshot, tmp_path):
+    """10 个季度的数据集，以及按源 CSV 方式读回的修改后持仓表"""
+    full = synthetic.synthetic_holdings(30, 10, seed=5)
+    quarters = list(dict.fromkeys(full['Quarter']))
+    dataset = PortfolioDataset(snapshot(full, "base"))
+
+    def raw(df):
+        path = tmp_path / "raw.csv"
+        df.to_csv(path, index=False)
+        return portfolio_data.read_holdings(str(path))
+
+    return dataset, full, quarters, raw
+
+
+def test_unchanged_source_needs_no_refresh(history):
+    dataset, full, _, raw = history
+    assert plan_refresh(dataset, raw(full)) is None
+    # 行顺序不同不算变化
+    assert plan_refresh(dataset, raw(full.iloc[::-1])) is None
+
+
+def test_appended_quarter_keeps_every_existing_quarter(history):
+    dataset, full, quarters, raw = history
+    extra = full[full['Quarter'] == quarters[-1]].assign(Quarter="2025 Q4")
+    assert plan_refresh(dataset, raw(pd.concat([full, extra]))) == (10, ["2025 Q4"])
+
+
+def test_revision_keeps_the_unchanged_prefix(history):
+    dataset, full, quarters, raw = history
+    revised = full.copy()
+    revised.loc[revised['Quarter'] == quarters[7], 'Value_Billions'] *= 1.1
+    # 被修订的季度及之后的季度全部重新导入
+    assert plan_refresh(dataset, raw(revised)) == (7, quarters[7:])
+
+
+@pytest.mark.parametrize("change", ["first_quarter", "backfill", "drop_last"])
+def test_falls_back_to_full_rebuild(history, change):
+    dataset, full, quarters, raw = history
+    if change == "first_quarter":
+        df = full.copy()
+        df.loc[df['Quarter'] == quarters[0], 'Shares_Millions'] += 1
+    elif change == "backfill":
+        # 补录一个早于全部已有季度的季度：季度下标会移动
+        df = pd.concat([full[full['Quarter'] == quarters[0]].assign(Quarter="2000 Q1"), full])
+    else:
+        df = full[full['Quarter'] != quarters[-1]]
+    keep, _ = plan_refresh(dataset, raw(df))
+    assert keep == 0
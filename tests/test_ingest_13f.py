@@ -0,0 +1,127 @@
+"""13F 导入：XML / TSV 解析、VALUE 单位切换、同 CUSIP 合并、期权排除、数据集按 CIK 筛选"""
+import pytest
+
+import ingest_13f
+
+CUSIP_MAP = {"037833100": "AAPL", "191216100": "KO"}
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<informationTable xmlns="http://www.sec.gov/edgar/document/thirteenf/informationtable">
+  <infoTable>
+    <nameOfIssuer>APPLE INC</nameOfIssuer><cusip>037833100</cusip><value>600</value>
+    <shrsOrPrnAmt><sshPrnamt>3000</sshPrnamt><sshPrnamtType>SH</sshPrnamtType></shrsOrPrnAmt>
+  </infoTable>
+  <infoTable>
+    <nameOfIssuer>APPLE INC</nameOfIssuer><cusip>037833100</cusip><value>200</value>
+    <shrsOrPrnAmt><sshPrnamt>1000</sshPrnamt><sshPrnamtType>SH</sshPrnamtType></shrsOrPrnAmt>
+  </infoTable>
+  <infoTable>
+    <nameOfIssuer>COCA COLA CO</nameOfIssuer><cusip>191216100</cusip><value>100</value>
+    <shrsOrPrnAmt><sshPrnamt>2000</sshPrnamt><sshPrnamtType>SH</sshPrnamtType></shrsOrPrnAmt>
+  </infoTable>
+  <infoTable>
+    <nameOfIssuer>COCA COLA CO</nameOfIssuer><cusip>191216100</cusip><value>100</value>
+    <shrsOrPrnAmt><sshPrnamt>500</sshPrnamt><sshPrnamtType>SH</sshPrnamtType></shrsOrPrnAmt>
+    <putCall>Put</putCall>
+  </infoTable>
+</informationTable>
+"""
+
+INFOTABLE_HEADER = "ACCESSION_NUMBER\tNAMEOFISSUER\tCUSIP\tVALUE\tSSHPRNAMT\tSSHPRNAMTTYPE\tPUTCALL\n"
+
+
+def _tsv(path, rows, header=INFOTABLE_HEADER):
+    path.write_text(header + "".join("\t".join(map(str, row)) + "\n" for row in rows))
+    return str(path)
+
+
+def test_xml_parsing(tmp_path):
+    path = tmp_path / "2024Q4.xml"
+    path.write_text(XML)
+    rows = list(ingest_13f.iter_rows(str(path)))
+    assert [r["cusip"] for r in rows] == ["037833100", "037833100", "191216100", "191216100"]
+    assert rows[0] == {"issuer": "APPLE INC", "cusip": "037833100", "value": 600.0, "shares": 3000.0,
+                       "type": "SH", "putcall": ""}
+    assert rows[3]["putcall"] == "PUT"
+
+
+def test_tsv_parsing(tmp_path):
+    path = _tsv(tmp_path / "2024Q4.tsv", [
+        ("0001-24-1", "APPLE INC", "037833100", 600, 3000, "SH", ""),
+        ("0001-24-1", "COCA COLA CO", "191216100", 100, 500, "SH", "Call"),
+    ])
+    rows = list(ingest_13f.iter_rows(path))
+    assert rows[0] == {"issuer": "APPLE INC", "cusip": "037833100", "value": 600.0, "shares": 3000.0,
+                       "type": "SH", "putcall": ""}
+    assert rows[1]["putcall"] == "CALL"
+
+
+def test_single_file_with_several_filings_is_rejected(tmp_path):
+    path = _tsv(tmp_path / "2024Q4.tsv", [
+        ("0001-24-1", "APPLE INC", "037833100", 600, 3000, "SH", ""),
+        ("0002-24-9", "APPLE INC", "037833100", 900, 4500, "SH", ""),
+    ])
+    with pytest.raises(ValueError, match="more than one filing"):
+        list(ingest_13f.iter_rows(path))
+
+
+def test_value_multiplier_cutover():
+    assert ingest_13f.value_multiplier("2022 Q3") == 1000.0
+    assert ingest_13f.value_multiplier("2022 Q4") == 1.0
+    assert ingest_13f.value_multiplier("2023 Q1") == 1.0
+    assert ingest_13f.value_multiplier("2019 Q4") == 1000.0
+
+
+def test_aggregate_merges_cusip_and_excludes_options(tmp_path):
+    path = tmp_path / "2022Q3.xml"
+    path.write_text(XML)
+    rows, unmapped = ingest_13f.aggregate_quarter("2022 Q3", str(path), CUSIP_MAP)
+    assert unmapped == []
+    # 2022 Q3 之前 VALUE 为千美元；期权只计入总市值 (1000)，不计入持仓
+    assert rows == [
+        ("2022 Q3", "AAPL", 0.004, 0.0008, 80.0),
+        ("2022 Q3", "KO", 0.002, 0.0001, 10.0),
+    ]
+    rows, _ = ingest_13f.aggregate_quarter("2022 Q4", str(path), CUSIP_MAP)
+    assert rows[0] == ("2022 Q4", "AAPL", 0.004, 0.0, 80.0)
+
+
+@pytest.fixture
+def bulk_dir(tmp_path):
+    """两家机构、同一家的原申报 + 新增持仓修订，以及上一报告期的申报"""
+    root = tmp_path / "2024Q4"
+    root.mkdir()
+    _tsv(root / "INFOTABLE.tsv", [
+        ("A-1", "APPLE INC", "037833100", 600, 3000, "SH", ""),
+        ("A-2", "COCA COLA CO", "191216100", 200, 1000, "SH", ""),
+        ("B-1", "APPLE INC", "037833100", 5000, 25000, "SH", ""),
+        ("A-0", "APPLE INC", "037833100", 999, 9999, "SH", ""),
+    ])
+    _tsv(root / "SUBMISSION.tsv", [
+        ("A-1", "14-FEB-2025", "13F-HR", "0001067983", "31-DEC-2024"),
+        ("A-2", "01-MAR-2025", "13F-HR/A", "0001067983", "31-DEC-2024"),
+        ("B-1", "14-FEB-2025", "13F-HR", "0001336528", "31-DEC-2024"),
+        ("A-0", "14-NOV-2024", "13F-HR", "0001067983", "30-SEP-2024"),
+    ], header="ACCESSION_NUMBER\tFILING_DATE\tSUBMISSIONTYPE\tCIK\tPERIODOFREPORT\n")
+    _tsv(root / "COVERPAGE.tsv", [
+        ("A-1", "N", ""),
+        ("A-2", "Y", "NEW HOLDINGS"),
+        ("B-1", "N", ""),
+        ("A-0", "N", ""),
+    ], header="ACCESSION_NUMBER\tISAMENDMENT\tAMENDMENTTYPE\n")
+    return root
+
+
+def test_bulk_data_set_keeps_only_the_filer(bulk_dir):
+    assert ingest_13f.discover_sources(str(bulk_dir.parent)) == {"2024 Q4": str(bulk_dir)}
+    assert ingest_13f.select_accessions(str(bulk_dir), "1067983", "2024 Q4") == ["A-1", "A-2"]
+    rows, _ = ingest_13f.aggregate_quarter("2024 Q4", str(bulk_dir), CUSIP_MAP, cik="0001067983")
+    assert [(r[1], r[3], r[4]) for r in rows] == [("AAPL", 0.0, 75.0), ("KO", 0.0, 25.0)]
+    with pytest.raises(ValueError, match="CIK"):
+        ingest_13f.aggregate_quarter("2024 Q4", str(bulk_dir), CUSIP_MAP)
+
+
+def test_restatement_replaces_original(bulk_dir):
+    cover = bulk_dir / "COVERPAGE.tsv"
+    cover.write_text(cover.read_text().replace("Y\tNEW HOLDINGS", "Y\tRESTATEMENT"))
+    assert ingest_13f.select_accessions(str(bulk_dir), "0001067983", "2024 Q4") == ["A-2"]
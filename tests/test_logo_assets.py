@@ -0,0 +1,71 @@
+"""Logo 资源包：构建结果确定、源文件变化时哈希变化、按域名命名的文件映射到 Ticker、构建时下载"""
+import io
+
+import logo_assets
+
+DOMAINS = {"AAPL": "apple.com", "KO": "coca-colacompany.com"}
+
+
+def _write(path, data):
+    path.write_bytes(data)
+
+
+def test_bundle_is_deterministic(tmp_path):
+    src = tmp_path / "logos"
+    src.mkdir()
+    _write(src / "apple.com.png", b"\x89PNG apple")
+    _write(src / "KO.svg", b"<svg/>")
+    first = logo_assets.build_logo_bundle(str(src), str(tmp_path / "a.json"), DOMAINS)
+    second = logo_assets.build_logo_bundle(str(src), str(tmp_path / "b.json"), DOMAINS)
+    assert first == second
+    assert (tmp_path / "a.json").read_bytes() == (tmp_path / "b.json").read_bytes()
+    assert sorted(first["logos"]) == ["AAPL", "KO"]
+    assert first["logos"]["KO"].startswith("data:image/svg+xml;base64,")
+    assert logo_assets.load_logo_bundle(str(tmp_path / "a.json")) == first
+
+
+def test_hash_changes_with_source(tmp_path):
+    src = tmp_path / "logos"
+    src.mkdir()
+    _write(src / "AAPL.png", b"v1")
+    before = logo_assets.build_logo_bundle(str(src), str(tmp_path / "bundle.json"))["hash"]
+    _write(src / "AAPL.png", b"v2")
+    after = logo_assets.build_logo_bundle(str(src), str(tmp_path / "bundle.json"))["hash"]
+    assert before != after
+    _write(src / "AAPL.png", b"v1")
+    assert logo_assets.build_logo_bundle(str(src), str(tmp_path / "bundle.json"))["hash"] == before
+
+
+def test_ticker_named_file_wins_over_domain(tmp_path):
+    src = tmp_path / "logos"
+    src.mkdir()
+    _write(src / "AAPL.png", b"ticker")
+    _write(src / "apple.com.png", b"domain")
+    bundle = logo_assets.build_logo_bundle(str(src), str(tmp_path / "bundle.json"), DOMAINS)
+    assert bundle["logos"]["AAPL"] == "data:image/png;base64,dGlja2Vy"
+
+
+def test_missing_logo_falls_back_to_initials():
+    bundle = {"hash": "0", "logos": {"AAPL": "data:image/png;base64,"}}
+    assert logo_assets.css_class("AAPL") in logo_assets.logo_html("AAPL", bundle)
+    assert "ref-logo-fallback" in logo_assets.logo_html("KO", bundle)
+
+
+def test_fetch_skips_existing_and_reports_failures(tmp_path, monkeypatch):
+    src = tmp_path / "logos"
+    src.mkdir()
+    _write(src / "AAPL.png", b"local")
+    requested = []
+
+    def fake_urlopen(url, timeout):
+        requested.append(url)
+        if "coca-cola" in url:
+            return io.BytesIO(b"icon")
+        raise logo_assets.urllib.error.URLError("offline")
+
+    monkeypatch.setattr(logo_assets.urllib.request, "urlopen", fake_urlopen)
+    fetched, failed = logo_assets.fetch_logos(dict(DOMAINS, MCO="moodys.com"), str(src))
+    assert (fetched, failed) == (1, ["moodys.com"])
+    assert len(requested) == 2
+    assert (src / "coca-colacompany.com.png").read_bytes() == b"icon"
+    assert (src / "AAPL.png").read_bytes() == b"local"
@@ -0,0 +1,65 @@
+"""持仓变动分析：手工构造的三个季度上检查新建仓 / 加仓 / 减仓 / 清仓、估计金额、换手率与集中度"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_dataset import PortfolioDataset
+
+# 价格 = 市值 / 持股数（十亿美元 / 百万股）：AAPL 0.1 -> 0.12 -> 0.1，KO 0.05，BAC 0.1 -> 0.12
+HOLDINGS = [
+    ("2024 Q1", "AAPL", 10, 1.0),
+    ("2024 Q1", "KO", 20, 1.0),
+    ("2024 Q2", "AAPL", 12, 1.44),
+    ("2024 Q2", "BAC", 5, 0.5),
+    ("2024 Q3", "AAPL", 6, 0.6),
+    ("2024 Q3", "BAC", 5, 0.6),
+]
+
+
+@pytest.fixture
+def changes(snapshot):
+    df = pd.DataFrame(HOLDINGS, columns=['Quarter', 'Ticker', 'Shares_Millions', 'Value_Billions'])
+    df['Percent_Portfolio'] = df['Value_Billions'] / df.groupby('Quarter')['Value_Billions'].transform('sum') * 100
+    return PortfolioDataset(snapshot(df)).changes
+
+
+def _col(changes, ticker):
+    return list(changes.cube.tickers).index(ticker)
+
+
+def test_actions_and_flows(changes):
+    aapl, ko, bac = (_col(changes, tk) for tk in ("AAPL", "KO", "BAC"))
+    # 第一个季度没有上一期可比
+    assert not changes.action[0].any() and not changes.flow[0].any()
+    assert [changes.action[1, j] for j in (aapl, ko, bac)] == [2, 4, 1]     # add, exit, new
+    assert [changes.action[2, j] for j in (aapl, bac)] == [3, 0]            # trim, hold
+    # 加仓按两期均价、清仓按上期价格、新建仓按本期价格估计
+    np.testing.assert_allclose([changes.flow[1, j] for j in (aapl, ko, bac)], [2 * 0.11, -1.0, 0.5])
+    np.testing.assert_allclose(changes.flow[2, aapl], -6 * 0.11)
+    assert changes.share_change_pct[1, aapl] == pytest.approx(20.0)
+    assert np.isnan(changes.share_change_pct[1, bac])
+
+
+def test_quarterly_summary(changes):
+    q = changes.quarterly
+    np.testing.assert_allclose(q['Buys_Billions'], [0.0, 0.72, 0.0])
+    np.testing.assert_allclose(q['Sells_Billions'], [0.0, 1.0, 0.66])
+    assert np.isnan(q['Turnover_Pct'][0])
+    # 换手率 = min(买入, 卖出) / 两期组合市值均值
+    assert q['Turnover_Pct'][1] == pytest.approx(0.72 / ((2.0 + 1.94) / 2) * 100)
+    assert q['Turnover_Pct'][2] == pytest.approx(0.0)
+    assert q['HHI'][0] == pytest.approx(0.5)
+    assert list(q['Positions']) == [2, 2, 2]
+    assert list(q['New_Positions']) == [0, 1, 0] and list(q['Exited_Positions']) == [0, 1, 0]
+
+
+def test_ticker_and_activity_frames(changes):
+    ko = changes.ticker_frame("KO", 0, 3)
+    assert list(ko['Action']) == ['hold', 'exit']
+    names = np.asarray(changes.cube.tickers, dtype=object)
+    activity = changes.activity_frame(1, names)
+    # 按估计金额绝对值降序
+    assert list(activity['Ticker']) == ["KO", "BAC", "AAPL"]
+    assert list(activity['Action']) == ['exit', 'new', 'add']
+    mask = changes.cube.tickers != "KO"
+    assert list(changes.activity_frame(1, names, mask)['Ticker']) == ["BAC", "AAPL"]
@@ -0,0 +1,27 @@
+"""持仓变动：追加季度时的增量计算与完整重建一致（逐股票矩阵、买入 / 卖出 / 新建仓 / 清仓、换手率）"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_changes import PortfolioChanges
+
+
+@pytest.mark.parametrize("drop, revise", [(1, False), (1, True), (3, False), (3, True)])
+def test_incremental_matches_full_rebuild(extended_and_rebuilt, drop, revise):
+    ext, ref = extended_and_rebuilt(drop, revise)
+    assert list(ext.cube.tickers) == list(ref.cube.tickers)
+    for name in PortfolioChanges.MATRICES:
+        np.testing.assert_array_equal(getattr(ext.changes, name), getattr(ref.changes, name), err_msg=name)
+    pd.testing.assert_frame_equal(ext.changes.quarterly, ref.changes.quarterly)
+
+
+def test_rebuilt_rows_cover_every_flow(extended_and_rebuilt):
+    ext, _ = extended_and_rebuilt(3, True)
+    changes = ext.changes
+    tail = slice(len(ext.cube.dates) - 4, None)
+    # 重算的季度里买入、卖出、新建仓、清仓都出现过，上面的一致性检查才覆盖到这些分支
+    assert set(changes.action[tail].ravel()) == {0, 1, 2, 3, 4}
+    assert (changes.quarterly['Buys_Billions'].iloc[tail] > 0).all()
+    assert (changes.quarterly['Sells_Billions'].iloc[tail] > 0).all()
+    assert changes.quarterly['Turnover_Pct'].iloc[tail].notna().all()
+    assert np.isnan(changes.quarterly['Turnover_Pct'].iloc[0])
@@ -0,0 +1,76 @@
+"""公司搜索：前缀 / 单词前缀 / 包含 / 模糊的排序，模糊匹配不跨行，未安装 pypinyin 时退回代码与名称"""
+import numpy as np
+import pytest
+
+import search_index
+from search_index import SearchIndex
+
+COMPANIES = [
+    ("AAPL", "Apple Inc", "苹果公司"),
+    ("AMZN", "Amazon.com Inc", "亚马逊"),
+    ("BRK.B", "Berkshire Hathaway Inc", "伯克希尔·哈撒韦"),
+    ("BAC", "Bank of America Corp", "美国银行"),
+    ("KO", "Coca-Cola Co", "可口可乐"),
+    ("AXP", "American Express Co", "美国运通"),
+    ("MA", "Mastercard Inc", "万事达卡"),
+    ("ADM", "Archer-Daniels-Midland Co", "阿彻丹尼尔斯米德兰"),
+]
+
+
+def _index():
+    tickers, en, zh = zip(*COMPANIES)
+    return SearchIndex(np.array(tickers, dtype=object), {"en": list(en), "zh": list(zh)})
+
+
+def test_prefix_tiers_rank_before_contains():
+    index = _index()
+    # 代码前缀 (AMZN) > 英文名前缀 (American Express) > 英文单词前缀 (Bank of America) > 模糊 (ADM)
+    assert list(index.search("am", "en")) == ["AMZN", "AXP", "BAC", "ADM"]
+    # 代码完全匹配排在包含该字符串的名称之前
+    assert list(index.search("ma", "en")) == ["MA", "AMZN"]
+    assert list(index.search("", "en", limit=3)) == ["AMZN", "AXP", "AAPL"]
+
+
+def test_ties_follow_the_current_language():
+    index = _index()
+    scores = index.scores("a")
+    assert scores[0] == scores[1] == scores[5] == 90
+    assert list(index.search("a", "en"))[:3] == ["AMZN", "AXP", "AAPL"]
+    assert list(index.search("", "en")) == ["AMZN", "AXP", "AAPL", "ADM", "BAC", "BRK.B", "KO", "MA"]
+    assert list(index.search("", "zh")) == ["MA", "AMZN", "BRK.B", "KO", "AXP", "BAC", "AAPL", "ADM"]
+
+
+def test_fuzzy_matches_subsequences_only():
+    index = _index()
+    assert list(index.search("brkb", "en")) == ["BRK.B"]
+    assert list(index.search("boa", "en")) == ["BAC"]
+    assert index.scores("boa")[3] == 40
+    # 各字段按行拼接：查询字符不能从一只股票的末尾接到下一只的开头 ("aapl" + "amzn", "amzn" + "brk.b")
+    assert list(index.search("lam", "en")) == []
+    assert list(index.search("nb", "en")) == []
+
+
+def test_mask_and_limit():
+    index = _index()
+    mask = np.array([tk != "AMZN" for tk, _, _ in COMPANIES])
+    assert list(index.search("am", "en", mask=mask)) == ["AXP", "BAC", "ADM"]
+    assert len(index.search("a", "en", limit=2)) == 2
+
+
+def test_pinyin_matches_when_available():
+    pytest.importorskip("pypinyin")
+    index = _index()
+    assert list(index.search("pingguo", "zh")) == ["AAPL"]
+    assert list(index.search("pg", "zh")) == ["AAPL"]
+    assert list(index.search("mgyh", "zh")) == ["BAC"]
+
+
+def test_without_pypinyin_falls_back_to_codes_and_names(monkeypatch):
+    monkeypatch.setattr(search_index, "lazy_pinyin", None)
+    index = _index()
+    assert list(index.search("pingguo", "zh")) == []
+    assert list(index.search("苹果", "zh")) == ["AAPL"]
+    assert list(index.search("apple", "en")) == ["AAPL"]
+    assert list(index.search("ko", "en")) == ["KO"]
+    # 拼音首字母字段全为空行，模糊匹配的行号仍与股票对应
+    assert list(index.search("boa", "en")) == ["BAC"]
@@ -0,0 +1,20 @@
+import shared_cache
+
+
+def test_cache_is_opt_in(monkeypatch, tmp_path):
+    monkeypatch.delenv("PORTFOLIO_CACHE_URL", raising=False)
+    assert shared_cache.open_cache() is None
+    assert shared_cache.open_cache("") is None
+    assert shared_cache.open_cache("off") is None
+    assert isinstance(shared_cache.open_cache(str(tmp_path)), shared_cache.DiskCache)
+
+
+def test_overwrite_does_not_inflate_size(tmp_path):
+    cache = shared_cache.DiskCache(str(tmp_path), max_bytes=1000)
+    for _ in range(5):
+        cache.put("fig:a", b"x" * 300)
+    cache.put("fig:b", b"y" * 300)
+    stats = cache.stats()
+    assert stats["bytes"] == 600
+    assert stats["evictions"] == 0
+    assert cache.get("fig:a") == b"x" * 300
@@ -0,0 +1,69 @@
+"""时间轴回放：帧按季度顺序排列并与滑块一致，每帧只含前 N 大持仓且按市值降序"""
+import numpy as np
+import pytest
+
+import timeline_frames
+from bench import synthetic
+from i18n import LANG
+from portfolio_dataset import PortfolioDataset
+
+T = LANG["English"]
+TOP_N = 5
+
+
+@pytest.fixture
+def dataset(snapshot):
+    return PortfolioDataset(snapshot(synthetic.synthetic_holdings(40, 8, seed=7)))
+
+
+def _holdings(dataset, top_n=TOP_N):
+    return timeline_frames.holdings_timeline(
+        dataset.cube, dataset.logo_names["en"], {}, {'template': 'plotly_white'}, T, top_n
+    )
+
+
+def test_frames_follow_quarter_order(dataset):
+    cube = dataset.cube
+    fig = _holdings(dataset)
+    labels = list(cube.quarters)
+    assert np.all(np.diff(cube.dates) > np.timedelta64(0))
+    assert [frame['name'] for frame in fig['frames']] == labels
+    assert [step['label'] for step in fig['layout']['sliders'][0]['steps']] == labels
+    assert [step['args'][0] for step in fig['layout']['sliders'][0]['steps']] == [[q] for q in labels]
+    assert fig['frames'][-1]['layout']['title']['text'] == T["playback_holdings_title"].format(quarter=labels[-1])
+    # 基础图表显示第一帧
+    assert fig['data'][0]['ids'] == fig['frames'][0]['data'][0]['ids']
+
+
+def test_each_frame_is_the_capped_top_n(dataset):
+    cube = dataset.cube
+    fig = _holdings(dataset)
+    for q, frame in enumerate(fig['frames']):
+        data = frame['data'][0]
+        held = np.flatnonzero(cube.held[q])
+        expected = held[np.argsort(-cube.value[q, held], kind='stable')][:TOP_N]
+        assert len(data['ids']) == min(TOP_N, len(held))
+        assert set(data['ids']) == set(cube.tickers[expected])
+        assert np.all(np.diff(data['x']) <= 0)
+        assert data['x'].dtype == np.float32
+    # 坐标轴按全部季度的最大值固定
+    assert fig['layout']['xaxis']['range'][1] == pytest.approx(float(cube.value.max()) * 1.05)
+
+
+def test_quarters_with_fewer_positions_than_n(dataset):
+    cube = dataset.cube
+    top_n = int(cube.held.sum(axis=1).max()) + 3
+    fig = _holdings(dataset, top_n)
+    # 未持有的股票不出现在帧中
+    assert [len(frame['data'][0]['ids']) for frame in fig['frames']] == cube.held.sum(axis=1).tolist()
+
+
+def test_sector_frames_keep_category_order(dataset):
+    cube = dataset.cube
+    names = list(cube.sector_labels["en"])[::-1]
+    colors = {name: '#000000' for name in names}
+    fig = timeline_frames.sector_timeline(cube, names, "en", colors, {}, T)
+    assert fig['data'][0]['x'] == names
+    assert [frame['name'] for frame in fig['frames']] == list(cube.quarters)
+    for q, frame in enumerate(fig['frames']):
+        np.testing.assert_allclose(frame['data'][0]['y'], cube.sector_value[q, ::-1], rtol=1e-6)
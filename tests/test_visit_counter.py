@@ -0,0 +1,117 @@
+"""访问计数：内存聚合、批量写库、失败重试、多进程累加、按天历史"""
+import datetime
+import multiprocessing
+import sqlite3
+
+import pytest
+
+from visit_counter import VisitCounter
+
+DAY = datetime.date.today().isoformat()
+
+
+def _counter(path):
+    # 不让后台线程在测试中途刷新
+    return VisitCounter(str(path), flush_interval=3600)
+
+
+def _record(path, n):
+    counter = _counter(path)
+    for _ in range(n):
+        counter.record_visit()
+    counter.close()
+
+
+def test_visits_aggregate_in_memory(tmp_path):
+    counter = _counter(tmp_path / "visits.db")
+    for _ in range(3):
+        counter.record_visit()
+    assert counter.count() == 3
+    assert counter.stats()["pending"] == 3
+    assert counter.stats()["flushes"] == 0
+    counter.close()
+
+
+def test_flush_writes_and_reloads(tmp_path):
+    path = tmp_path / "visits.db"
+    counter = _counter(path)
+    counter.record_visit()
+    counter.record_visit()
+    counter.flush()
+    assert counter.stats()["pending"] == 0 and counter.stats()["flushes"] == 1
+    assert counter.count() == 2
+    counter.close()
+    assert _counter(path).count() == 2
+
+
+def test_failed_flush_is_retried_without_loss(tmp_path, monkeypatch):
+    counter = _counter(tmp_path / "visits.db")
+    counter.record_visit()
+    real_connect = counter._connect
+
+    def broken():
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(counter, "_connect", broken)
+    counter.flush()
+    # 失败的增量放回待写队列，计数不丢也不重复
+    assert counter.stats()["flush_failures"] == 1
+    assert counter.count() == 1
+    counter.record_visit()
+    monkeypatch.setattr(counter, "_connect", real_connect)
+    counter.flush()
+    assert counter.count() == 2
+    assert counter.stats()["pending"] == 0
+    counter.close()
+
+
+def test_flush_closes_connections(tmp_path, monkeypatch):
+    opened = []
+    real_connect = sqlite3.connect
+
+    def tracking_connect(*args, **kwargs):
+        conn = real_connect(*args, **kwargs)
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(sqlite3, "connect", tracking_connect)
+    counter = _counter(tmp_path / "visits.db")
+    for _ in range(3):
+        counter.record_visit()
+        counter.flush()
+    assert len(opened) >= 4
+    for conn in opened:
+        # 已关闭的连接上执行语句会抛出 ProgrammingError
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+    counter.close()
+
+
+def test_processes_add_up(tmp_path):
+    path = tmp_path / "visits.db"
+    _counter(path).close()  # 先建表，避免子进程并发建表
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=_record, args=(str(path), n)) for n in (3, 5, 7)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+    assert _counter(path).count() == 15
+
+
+def test_history_is_per_day_and_windowed(tmp_path):
+    path = tmp_path / "visits.db"
+    today = datetime.date.today()
+    yesterday = (today - datetime.timedelta(days=1)).isoformat()
+    old = (today - datetime.timedelta(days=40)).isoformat()
+    counter = _counter(path)
+    for day, n in ((DAY, 2), (yesterday, 4), (old, 9)):
+        for _ in range(n):
+            counter.record_visit(day)
+    counter.flush()
+    counter.record_visit()  # 未落盘的增量也计入
+    assert counter.history() == [(yesterday, 4), (DAY, 3)]
+    assert counter.count(yesterday) == 4
+    counter.close()
+    assert _counter(path).history() == [(yesterday, 4), (DAY, 3)]
@@ -0,0 +1,96 @@
+"""
+时间轴回放：把每个季度的持仓 / 行业快照预先生成为 Plotly 动画帧 (frames)，一次性发给浏览器，
+由 plotly.js 在客户端播放（播放 / 暂停按钮 + 季度滑块），播放过程中不触发任何服务端重跑。
+
+- 每个 数据集 × 语言 只生成一次（序列化结果存入进程级图表缓存，所有会话共享）
+- 帧中只包含随季度变化的数组：持仓为前 N 大的名称 / 市值 / 颜色，行业为固定类别顺序下的市值；
+  市值以 float32 存放（orjson / Plotly 序列化为二进制数据块），样式、坐标轴、模板只在基础图表中出现一次
+- 坐标轴范围按全部季度的最大值固定，播放时刻度不跳动；ids 使用股票代码，同一只股票在帧间平滑移动
+- 回放覆盖全部季度和全部行业，不受侧边栏筛选影响
+"""
+import numpy as np
+
+FRAME_DURATION_MS = 500
+TRANSITION_MS = 300
+
+
+def _controls(labels, t):
+    """播放 / 暂停按钮和季度滑块（切换帧均在浏览器端完成）"""
+    play = {'frame': {'duration': FRAME_DURATION_MS, 'redraw': False}, 'fromcurrent': True,
+            'transition': {'duration': TRANSITION_MS, 'easing': 'linear'}}
+    jump = {'mode': 'immediate', 'frame': {'duration': 0, 'redraw': False}, 'transition': {'duration': 0}}
+    updatemenus = [{
+        'type': 'buttons', 'direction': 'left', 'showactive': False,
+        'x': 0, 'y': -0.12, 'xanchor': 'left', 'yanchor': 'top', 'pad': {'r': 10, 't': 10},
+        'buttons': [
+            {'label': t["playback_play"], 'method': 'animate', 'args': [None, play]},
+            {'label': t["playback_pause"], 'method': 'animate', 'args': [[None], jump]},
+        ],
+    }]
+    sliders = [{
+        'active': 0, 'x': 0.15, 'y': -0.12, 'len': 0.85, 'xanchor': 'left', 'yanchor': 'top', 'pad': {'t': 10},
+        'currentvalue': {'prefix': t["playback_quarter"], 'visible': True},
+        'transition': {'duration': TRANSITION_MS},
+        'steps': [{'label': label, 'method': 'animate', 'args': [[label], jump]} for label in labels],
+    }]
+    return updatemenus, sliders
+
+
+def _figure(base_trace, frame_data, titles, labels, layout, t):
+    updatemenus, sliders = _controls(labels, t)
+    frames = [
+        {'name': label, 'data': [data], 'layout': {'title': {'text': title}}}
+        for label, data, title in zip(labels, frame_data, titles)
+    ]
+    layout = dict(layout, title={'text': titles[0]}, updatemenus=updatemenus, sliders=sliders)
+    return {'data': [dict(base_trace, **frame_data[0])], 'layout': layout, 'frames': frames}
+
+
+def holdings_timeline(cube, logo_names, colors, layout, t, top_n):
+    """每个季度前 top_n 大持仓的横向条形图（按市值降序），colors 为 Logo_Name -> 颜色"""
+    k = min(top_n, len(cube.tickers))
+    # 每行先取前 k 列（无序），再按市值降序排列
+    top = np.argpartition(-cube.value, k - 1, axis=1)[:, :k]
+    top = np.take_along_axis(top, np.argsort(-np.take_along_axis(cube.value, top, axis=1), axis=1), axis=1)
+    frame_data = []
+    for q, cols in enumerate(top):
+        cols = cols[cube.held[q, cols]]
+        names = logo_names[cols]
+        frame_data.append({
+            'x': cube.value[q, cols].astype(np.float32),
+            'y': names.tolist(),
+            'ids': cube.tickers[cols].tolist(),
+            'marker': {'color': [colors.get(name, '#94a3b8') for name in names]},
+        })
+    base_trace = {
+        'type': 'bar', 'orientation': 'h',
+        'hovertemplate': '%{y}<br>' + t["playback_value"] + '=%{x:.2f}<extra></extra>',
+    }
+    layout = dict(
+        layout,
+        xaxis={'title': {'text': t["playback_value"]}, 'range': [0, float(cube.value.max(initial=0)) * 1.05]},
+        yaxis={'autorange': 'reversed', 'title': {'text': ''}},
+        showlegend=False, height=560, margin={'l': 10, 'b': 120},
+    )
+    titles = [t["playback_holdings_title"].format(quarter=q) for q in cube.quarters]
+    return _figure(base_trace, frame_data, titles, list(cube.quarters), layout, t)
+
+
+def sector_timeline(cube, sector_names, lang_key, colors, layout, t):
+    """每个季度各行业市值的柱状图；类别顺序固定为 sector_names（与面积图颜色一致）"""
+    pos = {label: i for i, label in enumerate(cube.sector_labels[lang_key])}
+    cols = np.array([pos[name] for name in sector_names])
+    frame_data = [{'y': cube.sector_value[q, cols].astype(np.float32)} for q in range(len(cube.dates))]
+    base_trace = {
+        'type': 'bar', 'x': list(sector_names),
+        'marker': {'color': [colors[name] for name in sector_names]},
+        'hovertemplate': '%{x}<br>' + t["playback_value"] + '=%{y:.2f}<extra></extra>',
+    }
+    layout = dict(
+        layout,
+        xaxis={'title': {'text': ''}},
+        yaxis={'title': {'text': t["playback_value"]}, 'range': [0, float(cube.sector_value.max(initial=0)) * 1.05]},
+        showlegend=False, height=560, margin={'b': 140},
+    )
+    titles = [t["playback_sector_title"].format(quarter=q) for q in cube.quarters]
+    return _figure(base_trace, frame_data, titles, list(cube.quarters), layout, t)
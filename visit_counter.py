@@ -0,0 +1,159 @@
+"""
+访问计数：进程内内存聚合 + 后台线程定时批量写入 SQLite (WAL 模式)。
+
+- 页面重跑只做内存加减，不做任何同步文件 I/O
+- 多个 worker 进程写同一个数据库，SQLite 事务内 UPSERT 累加，计数精确不丢失
+- 按天保存，可查询历史
+"""
+import atexit
+import contextlib
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = "CREATE TABLE IF NOT EXISTS daily_visits (day TEXT PRIMARY KEY, count INTEGER NOT NULL DEFAULT 0)"
+
+
+class VisitCounter:
+    def __init__(self, db_path, flush_interval=5.0, history_days=30, legacy_json=None):
+        # 绝对路径：后台线程 / atexit 写库时不受当前工作目录变化影响
+        self.db_path = os.path.abspath(db_path)
+        self.flush_interval = flush_interval
+        self.history_days = history_days
+        self._pending = {}
+        self._inflight = {}
+        self._totals = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        # 写库争用统计（多个 worker 进程写同一个文件时，刷新耗时 / 失败次数会上升）
+        self.flushes = 0
+        self.flush_failures = 0
+        self.flush_ms_total = 0.0
+        self.flush_ms_max = 0.0
+
+        self._init_db(legacy_json)
+        self._refresh_totals()
+        self._thread = threading.Thread(target=self._run, name="visit-counter-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ------------------------------------------------------------------ 存储
+    @contextlib.contextmanager
+    def _connect(self):
+        """
+        事务连接：正常结束时提交、异常时回滚，并且总是关闭。
+        sqlite3.Connection 自身的 with 只管事务不关连接，每次刷新都会留下一个未关闭的 WAL 连接
+        """
+        with contextlib.closing(sqlite3.connect(self.db_path, timeout=10)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+
+    def _init_db(self, legacy_json):
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+            empty = conn.execute("SELECT COUNT(*) FROM daily_visits").fetchone()[0] == 0
+            # 首次启用时导入旧版 visit_stats.json 的当日计数
+            if empty and legacy_json and os.path.exists(legacy_json):
+                try:
+                    with open(legacy_json, "r") as f:
+                        legacy = json.load(f)
+                    conn.execute(
+                        "INSERT OR IGNORE INTO daily_visits (day, count) VALUES (?, ?)",
+                        (str(legacy["date"]), int(legacy["count"])),
+                    )
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    logger.warning("ignoring unreadable legacy counter file %s: %s", legacy_json, e)
+
+    def _refresh_totals(self):
+        since = (datetime.date.today() - datetime.timedelta(days=self.history_days)).isoformat()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT day, count FROM daily_visits WHERE day >= ? ORDER BY day", (since,)
+            ).fetchall()
+        with self._lock:
+            self._totals = dict(rows)
+            self._inflight = {}
+
+    def flush(self):
+        """把内存中的增量写入数据库，并刷新缓存的每日总数"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._inflight = pending
+            if pending:
+                t0 = time.perf_counter()
+                try:
+                    with self._connect() as conn:
+                        conn.executemany(
+                            "INSERT INTO daily_visits (day, count) VALUES (?, ?) "
+                            "ON CONFLICT(day) DO UPDATE SET count = count + excluded.count",
+                            sorted(pending.items()),
+                        )
+                except sqlite3.Error:
+                    # 写入失败时把增量放回，下次再试
+                    with self._lock:
+                        for day, n in pending.items():
+                            self._pending[day] = self._pending.get(day, 0) + n
+                        self._inflight = {}
+                        self.flush_failures += 1
+                    logger.exception("visit counter flush failed; will retry")
+                    return
+                elapsed_ms = (time.perf_counter() - t0) * 1000
+                with self._lock:
+                    self.flushes += 1
+                    self.flush_ms_total += elapsed_ms
+                    self.flush_ms_max = max(self.flush_ms_max, elapsed_ms)
+            self._refresh_totals()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("visit counter background flush failed")
+
+    def close(self):
+        if not self._stop.is_set():
+            self._stop.set()
+            self.flush()
+
+    # ------------------------------------------------------------------ 计数（纯内存）
+    def record_visit(self, day=None):
+        day = day or datetime.date.today().isoformat()
+        with self._lock:
+            self._pending[day] = self._pending.get(day, 0) + 1
+
+    def count(self, day=None):
+        """已落盘总数（含其他进程，截至上次刷新）+ 本进程未落盘的增量"""
+        day = day or datetime.date.today().isoformat()
+        with self._lock:
+            return self._totals.get(day, 0) + self._inflight.get(day, 0) + self._pending.get(day, 0)
+
+    def stats(self):
+        """批量写库的次数、失败次数与耗时（毫秒），以及尚未落盘的增量"""
+        with self._lock:
+            return {
+                "flushes": self.flushes,
+                "flush_failures": self.flush_failures,
+                "flush_ms_mean": self.flush_ms_total / self.flushes if self.flushes else 0.0,
+                "flush_ms_max": self.flush_ms_max,
+                "pending": sum(self._pending.values()),
+            }
+
+    def history(self):
+        """最近 history_days 天的 [(day, count), ...]"""
+        with self._lock:
+            merged = dict(self._totals)
+            for delta in (self._inflight, self._pending):
+                for day, n in delta.items():
+                    merged[day] = merged.get(day, 0) + n
+        return sorted(merged.items())